@@ -0,0 +1,92 @@
+# bench/bench_agent_sql.py
+# SQL агента: як було (duckdb.connect + register відфільтрованої копії на кожен запит)
+# vs довгоживуча сесія src/sql_session.py (перший запит і повтор з LRU-кешу)
+# + автоаналіз: усі AUTO_SLICES по черзі vs query_many (паралельно, свіжа сесія без кешу для кожного)
+#   python -m bench.bench_agent_sql --orders 1000000 --workers 4
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+
+import duckdb
+import pandas as pd
+
+from bench.common import Timer, make_dataset
+from src.data import load_facts, slice_period
+from src.sql_session import AUTO_SLICES, SQL_WORKERS, FactsSession, facts_session
+
+QUERIES = [
+    "SELECT payment_type, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1 ORDER BY revenue DESC LIMIT 10",
+    "SELECT customer_state, AVG(CASE WHEN on_time THEN 1 ELSE 0 END) AS on_time_rate, COUNT(*) AS orders FROM facts GROUP BY 1 HAVING COUNT(*)>100 ORDER BY on_time_rate ASC LIMIT 10",
+    "SELECT strftime(purchase_dt, '%Y-%m') AS ym, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1 ORDER BY 1",
+]
+
+
+def legacy_query(sql: str, view) -> pd.DataFrame:
+    """Як було в tool_sql_query: нове з'єднання і register на кожен виклик."""
+    con = duckdb.connect()
+    con.register("facts", view)
+    out = con.execute(sql).fetch_df()
+    con.close()
+    return out
+
+
+def _same(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    """Однакові значення з допуском для float: паралельні SUM/AVG у DuckDB складають у різному порядку.
+
+    Категорії через register(pandas) приходять як category, через Arrow — як рядки: порівнюємо як object.
+    """
+    try:
+        pd.testing.assert_frame_equal(a.astype(object), b.astype(object), check_exact=False)
+    except AssertionError:
+        return False
+    return True
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="agent SQL: per-call connection vs persistent session")
+    ap.add_argument("--orders", type=int, nargs="+", default=[1_000_000])
+    ap.add_argument("--workers", type=int, default=SQL_WORKERS)
+    ap.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "olist_bench"))
+    args = ap.parse_args()
+
+    rows = []
+    print(f"{'orders':>10} {'legacy, s':>10} {'session cold, s':>16} {'cached, s':>10} {'same':>5}")
+    for n in args.orders:
+        data_dir = os.path.join(args.data_root, f"n{n}")
+        if not os.path.exists(os.path.join(data_dir, "olist_orders_dataset.parquet")):
+            make_dataset(n, data_dir)
+        facts = load_facts(data_dir, None)
+        d1, d2 = facts["purchase_date"].iloc[len(facts) // 4], facts["purchase_date"].iloc[-1]
+        session = facts_session(data_dir, None)  # реєстрація facts — один раз на версію датасету
+        with Timer() as t:
+            old = [legacy_query(q, slice_period(facts, d1, d2)) for q in QUERIES]
+        t_old = t.seconds
+        with Timer() as t:
+            new = [session.query(q, d1, d2) for q in QUERIES]
+        t_cold = t.seconds
+        with Timer() as t:
+            [session.query(q, d1, d2) for q in QUERIES]
+        same = all(_same(a, b) for a, b in zip(old, new))
+        print(f"{n:>10,} {t_old:>10.3f} {t_cold:>16.3f} {t.seconds:>10.4f} {'yes' if same else 'NO':>5}")
+        rows.append((n, facts, d1, d2))
+
+    print(f"\nauto-analysis, {len(AUTO_SLICES)} slices, {args.workers} workers, {os.cpu_count()} CPU")
+    print(f"{'orders':>10} {'sequential, s':>14} {'concurrent, s':>14} {'speedup':>8} {'same':>5}")
+    sqls = list(AUTO_SLICES.values())
+    for n, facts, d1, d2 in rows:
+        seq = FactsSession(facts, "bench-seq")
+        with Timer() as t:
+            old = [seq.query(q, d1, d2) for q in sqls]
+        t_seq = t.seconds
+        par = FactsSession(facts, "bench-par")
+        with Timer() as t:
+            new = dict(par.query_many(sqls, d1, d2, max_workers=args.workers))
+        same = all(_same(old[i], new[i]) for i in range(len(sqls)))
+        print(f"{n:>10,} {t_seq:>14.3f} {t.seconds:>14.3f} {t_seq / t.seconds:>7.1f}x {'yes' if same else 'NO':>5}")
+        seq.close()
+        par.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/bench_charts.py
+# скільки байтів JSON іде в браузер: px.histogram / px.box по сирих рядках vs підсумки з src/charts.py,
+# і довгий часовий ряд (погодинно за роки): усі точки vs LTTB / min-max до CHART_MAX_POINTS
+#   python -m bench.bench_charts --rows 10000 200000 1000000 --series 17520 87600
+from __future__ import annotations
+import argparse
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from bench.common import Timer
+from src.charts import (CHART_MAX_POINTS, box_figure, box_stats, downsample, figure_payload_bytes,
+                        histogram_bins, histogram_figure)
+
+
+def make_view(n: int, seed: int = 42) -> pd.DataFrame:
+    """Рядки як у facts: delivery_time_h, delay_h, review_score."""
+    rng = np.random.default_rng(seed)
+    delivery = rng.gamma(3.0, 84.0, n)
+    return pd.DataFrame({
+        "delivery_time_h": delivery,
+        "delay_h": delivery - rng.normal(576, 120, n),
+        "review_score": rng.choice([1, 2, 3, 4, 5], n, p=[.115, .032, .082, .193, .578]),
+    })
+
+
+def make_series(n: int, seed: int = 42) -> pd.DataFrame:
+    """Погодинний ряд виручки: тренд + добова сезонність + шум + кілька різких піків."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    y = 100 + t / 500 + 40 * np.sin(2 * np.pi * t / 24) + rng.normal(0, 8, n)
+    y[rng.integers(0, n, 10)] += 400
+    return pd.DataFrame({"ts": pd.date_range("2016-01-01", periods=n, freq="h"), "revenue": y})
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="chart payload: raw rows vs server-side summaries")
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000, 200_000, 1_000_000])
+    ap.add_argument("--series", type=int, nargs="+", default=[17_520, 87_600],
+                    help="довжина погодинного ряду (17 520 = 2 роки, 87 600 = 10 років)")
+    args = ap.parse_args()
+
+    print(f"{'rows':>10} {'chart':>10} {'raw, KB':>10} {'binned, KB':>11} {'raw, s':>7} {'binned, s':>10}")
+    for n in args.rows:
+        view = make_view(n)
+        cases = {
+            "histogram": (lambda: px.histogram(view, x="delivery_time_h", nbins=40),
+                          lambda: histogram_figure(histogram_bins(view["delivery_time_h"]))),
+            "box": (lambda: px.box(view, x="review_score", y="delivery_time_h", points=False),
+                    lambda: box_figure(box_stats(view, "delivery_time_h", by="review_score"), "review_score")),
+        }
+        for chart, (raw, binned) in cases.items():
+            with Timer() as t:
+                raw_bytes = figure_payload_bytes(raw())
+            t_raw = t.seconds
+            with Timer() as t:
+                binned_bytes = figure_payload_bytes(binned())
+            print(f"{n:>10,} {chart:>10} {raw_bytes / 1024:>10,.0f} {binned_bytes / 1024:>11,.1f} "
+                  f"{t_raw:>7.2f} {t.seconds:>10.3f}")
+
+    print(f"\n{'points':>10} {'method':>8} {'kept':>6} {'raw, KB':>9} {'down, KB':>9} {'peaks kept':>11} {'s':>7}")
+    for n in args.series:
+        ts = make_series(n)
+        raw = figure_payload_bytes(go.Figure(go.Scatter(x=ts["ts"], y=ts["revenue"], mode="lines")))
+        for method in ("lttb", "minmax"):
+            with Timer() as t:
+                pts = downsample(ts, "ts", "revenue", CHART_MAX_POINTS, method)
+            down = figure_payload_bytes(go.Figure(go.Scatter(x=pts["ts"], y=pts["revenue"], mode="lines")))
+            peaks = ts["revenue"].nlargest(10).index.isin(pts.index).sum()
+            print(f"{n:>10,} {method:>8} {len(pts):>6,} {raw / 1024:>9,.0f} {down / 1024:>9,.1f} "
+                  f"{peaks:>8}/10 {t.seconds:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
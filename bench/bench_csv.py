@@ -0,0 +1,72 @@
+# bench/bench_csv.py
+# читання CSV: старий _read_csv (pandas utf-8, при помилці — весь файл ще раз як latin1)
+# vs новий (pyarrow.csv багатопотоково, типи з TABLE_SCHEMAS, кодування — за вибіркою)
+# два випадки: чистий utf-8 і той самий файл з одним latin1-байтом у самому кінці
+#   python -m bench.bench_csv --orders 1000000 2000000
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+import pyarrow as pa
+
+from bench.common import make_dataset, write_csv, Timer
+from src.data import CSV_FILES, _coerce_to_schema, _read_csv, _to_arrow, detect_encoding
+
+
+def legacy_read_csv(path: str, name: str | None = None, usecols=None) -> pd.DataFrame:
+    """Як було в src/data.py до pyarrow.csv."""
+    if usecols is not None and not callable(usecols):
+        usecols = set(usecols).__contains__
+    try:
+        df = pd.read_csv(path, usecols=usecols, encoding="utf-8", low_memory=False)
+    except Exception:
+        df = pd.read_csv(path, usecols=usecols, encoding="latin1", low_memory=False)
+    return _coerce_to_schema(df, name) if name else df
+
+
+def _decoded(df: pd.DataFrame, name: str) -> pa.Table:
+    """Таблиця за схемою з dictionary → string (порядок категорій у pandas і Arrow різний)."""
+    t = _to_arrow(df, name)
+    return t.cast(pa.schema([(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+                             for f in t.schema]))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CSV reader: pandas two-attempt vs pyarrow.csv")
+    ap.add_argument("--orders", type=int, nargs="+", default=[1_000_000])
+    ap.add_argument("--tables", nargs="+", default=["orders", "items"])
+    args = ap.parse_args()
+
+    print(f"{'orders':>10} {'table':>8} {'case':>10} {'MB':>6} {'pandas, s':>10} {'arrow, s':>9} "
+          f"{'speedup':>8} {'encoding':>18} {'same':>5}")
+    for n in args.orders:
+        with tempfile.TemporaryDirectory() as tmp:
+            make_dataset(n, tmp)
+            for name in args.tables:
+                path = os.path.join(tmp, CSV_FILES[name])
+                write_csv(path.replace(".csv", ".parquet"), path)
+                for case in ("utf-8", "late-bad"):
+                    if case == "late-bad":
+                        # останній рядок — копія першого з байтом 0xE3 («ã» у latin1) в id
+                        with open(path, "rb") as fh:
+                            fh.readline()
+                            row = fh.readline()
+                        with open(path, "ab") as fh:
+                            fh.write(row.replace(b'"', b'"\xe3', 1))
+                    with Timer() as t:
+                        old = legacy_read_csv(path, name)
+                    t_old = t.seconds
+                    with Timer() as t:
+                        new = _read_csv(path, name)
+                    t_new = t.seconds
+                    same = _decoded(old, name).equals(_decoded(new, name))
+                    print(f"{n:>10,} {name:>8} {case:>10} {os.path.getsize(path) / 1e6:>6.0f} {t_old:>10.2f} "
+                          f"{t_new:>9.2f} {t_old / t_new:>7.1f}x {detect_encoding(path):>18} "
+                          f"{'yes' if same else 'NO':>5}")
+                    del old, new
+
+
+if __name__ == "__main__":
+    main()
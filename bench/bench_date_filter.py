@@ -0,0 +1,55 @@
+# bench/bench_date_filter.py
+# Фільтр періоду на facts: старий шлях (Python date-об'єкти, маска + .copy()) vs slice_period (searchsorted).
+#   python -m bench.bench_date_filter --orders 1000000
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import tempfile
+
+import numpy as np
+
+from bench.common import Timer, make_dataset
+from src.data import load_facts, slice_period
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="date filter: object dates vs searchsorted")
+    ap.add_argument("--orders", type=int, default=1_000_000)
+    ap.add_argument("--reruns", type=int, default=50, help="скільки «змін дати» імітувати")
+    ap.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "olist_bench"))
+    args = ap.parse_args()
+
+    data_dir = os.path.join(args.data_root, f"n{args.orders}")
+    if not os.path.exists(os.path.join(data_dir, "olist_orders_dataset.parquet")):
+        make_dataset(args.orders, data_dir)
+    facts = load_facts(data_dir)
+    legacy_dates = facts["purchase_dt"].dt.date  # як було: object-колонка з datetime.date
+
+    days = facts["purchase_date"].drop_duplicates().to_numpy()
+    rng = np.random.default_rng(0)
+    ranges = []
+    for _ in range(args.reruns):
+        a, b = sorted(rng.choice(len(days), 2, replace=False))
+        ranges.append((days[a].astype("datetime64[D]").item(), days[b].astype("datetime64[D]").item()))
+
+    old, new = [], []
+    for d1, d2 in ranges:
+        with Timer() as t:
+            v_old = facts.loc[(legacy_dates >= d1) & (legacy_dates <= d2)].copy()
+        old.append(t.seconds)
+        with Timer() as t:
+            v_new = slice_period(facts, d1, d2)
+        new.append(t.seconds)
+        assert len(v_old) == len(v_new)
+
+    print(f"facts: {len(facts):,} рядків, {args.reruns} змін періоду")
+    print(f"{'path':>14} {'median, ms':>11} {'p95, ms':>9}")
+    for name, times in (("object+copy", old), ("searchsorted", new)):
+        ms = sorted(x * 1000 for x in times)
+        print(f"{name:>14} {statistics.median(ms):>11.3f} {ms[int(len(ms) * 0.95) - 1]:>9.3f}")
+    print(f"speedup (median): {statistics.median(old) / statistics.median(new):,.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# bench/bench_engines.py
+# Порівняння рушіїв get_facts (pandas vs DuckDB) на синтетичних даних 100k / 1M / 10M замовлень.
+#   python -m bench.bench_engines                       # усі розміри
+#   python -m bench.bench_engines --sizes 100000 1000000 --repeat 3
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+
+from bench.common import Timer, make_dataset
+from src.data import get_facts, FACTS_ENGINES
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="get_facts: pandas vs DuckDB")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--max-orders", type=int, default=None, help="ліміт як на титулці (None = всі)")
+    ap.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "olist_bench"))
+    args = ap.parse_args()
+
+    print(f"{'orders':>12} {'engine':>8} {'best, s':>9} {'rows':>10}")
+    for n in args.sizes:
+        data_dir = os.path.join(args.data_root, f"n{n}")
+        if not os.path.exists(os.path.join(data_dir, "olist_orders_dataset.parquet")):
+            with Timer() as t:
+                make_dataset(n, data_dir)
+            print(f"{n:>12,} {'gen':>8} {t.seconds:>9.2f}")
+        best = {}
+        for engine in FACTS_ENGINES:
+            times = []
+            for _ in range(args.repeat):
+                with Timer() as t:
+                    df = get_facts(data_dir, max_orders=args.max_orders, engine=engine)
+                times.append(t.seconds)
+            best[engine] = min(times)
+            print(f"{n:>12,} {engine:>8} {best[engine]:>9.3f} {len(df):>10,}")
+            del df
+        print(f"{n:>12,} {'speedup':>8} {best['pandas'] / best['duckdb']:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
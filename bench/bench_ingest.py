@@ -0,0 +1,105 @@
+# bench/bench_ingest.py
+# холодний старт: старий шлях (r.content → BytesIO → extractall → pandas на всю таблицю) vs src/ingest.py
+# ZIP віддає локальний http.server (замість GitHub Release); кожен варіант — в окремому процесі,
+# щоб пік RSS був чесним (ru_maxrss рахується від старту процесу).
+#   python -m bench.bench_ingest --orders 200000 1000000
+from __future__ import annotations
+import argparse
+import functools
+import http.server
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import zipfile
+
+import requests
+
+from bench.common import make_dataset, write_csv, Timer
+from bench.bench_csv import legacy_read_csv
+from src.data import CSV_FILES, _to_arrow, write_table_parquet
+from src.ingest import ingest_release, peak_rss_mb
+
+
+def make_zip(n_orders: int, out_dir: str) -> str:
+    """Синтетичні таблиці → CSV → ZIP у папці olist/ (+ зайвий файл, який розпаковувати не треба)."""
+    pq_dir = make_dataset(n_orders, os.path.join(out_dir, "pq"))
+    zip_path = os.path.join(out_dir, "olist.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as z:
+        for fn in CSV_FILES.values():
+            src = os.path.join(pq_dir, fn.replace(".csv", ".parquet"))
+            if not os.path.exists(src):
+                continue
+            with z.open(f"olist/{fn}", "w", force_zip64=True) as dst:
+                write_csv(src, dst)
+        z.writestr("olist/README.txt", "not a table")
+    return zip_path
+
+
+def legacy_ingest(url: str, data_dir: str) -> None:
+    """Як було в ensure_data + старий _build_parquet: все в пам'яті."""
+    r = requests.get(url, allow_redirects=True, timeout=60)
+    r.raise_for_status()
+    with zipfile.ZipFile(io.BytesIO(r.content)) as z:
+        z.extractall(data_dir)
+    base = os.path.join(data_dir, "olist")
+    for name, fn in CSV_FILES.items():
+        csv_path = os.path.join(base, fn)
+        if os.path.exists(csv_path):
+            table = _to_arrow(legacy_read_csv(csv_path), name)
+            write_table_parquet(table, os.path.join(base, fn.replace(".csv", ".parquet")), name)
+
+
+def worker(mode: str, url: str, data_dir: str) -> None:
+    with Timer() as t:
+        if mode == "legacy":
+            legacy_ingest(url, data_dir)
+        else:
+            ingest_release(url, data_dir)
+    print(json.dumps({"seconds": t.seconds, "peak_rss_mb": peak_rss_mb()}))
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(directory: str) -> tuple[http.server.ThreadingHTTPServer, str]:
+    """Локальний «Release»: http.server на випадковому порту у фоновому потоці."""
+    handler = functools.partial(_QuietHandler, directory=directory)
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="cold-start ingest: legacy vs streaming")
+    ap.add_argument("--orders", type=int, nargs="+", default=[200_000, 1_000_000])
+    ap.add_argument("--worker", nargs=3, metavar=("MODE", "URL", "DIR"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker:
+        worker(*args.worker)
+        return
+
+    print(f"{'orders':>10} {'zip, MB':>8} {'legacy s':>9} {'legacy RSS':>11} {'stream s':>9} {'stream RSS':>11}")
+    for n in args.orders:
+        with tempfile.TemporaryDirectory() as tmp:
+            zip_path = make_zip(n, tmp)
+            httpd, base = serve(tmp)
+            res = {}
+            for mode in ("legacy", "streaming"):
+                out = subprocess.run([sys.executable, "-m", "bench.bench_ingest", "--worker", mode,
+                                      f"{base}/olist.zip", os.path.join(tmp, mode)],
+                                     capture_output=True, text=True, check=True)
+                res[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+            httpd.shutdown()
+            lg, sm = res["legacy"], res["streaming"]
+            print(f"{n:>10,} {os.path.getsize(zip_path) / 1e6:>8.1f} {lg['seconds']:>9.2f} "
+                  f"{lg['peak_rss_mb']:>8.0f} MB {sm['seconds']:>9.2f} {sm['peak_rss_mb']:>8.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
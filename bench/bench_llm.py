@@ -0,0 +1,63 @@
+# bench/bench_llm.py
+# відповідь LLM на stub-сервері (src/llm_stub.py, без мережі й ключа):
+# як було (чекаємо всю відповідь) vs потік (час до першого токена) vs повтор з дискового кешу
+#   python -m bench.bench_llm --prompts 5 --delay 0.02
+from __future__ import annotations
+import argparse
+import tempfile
+import time
+
+import requests
+
+from bench.common import Timer
+from src.llm import LLMCache, StubBackend, chat_messages, stream_answer
+from src.llm_stub import serve_stub
+
+
+def blocking_answer(base_url: str, prompt: str) -> str:
+    """Як було: один запит без stream — сторінка стоїть, доки не прийде весь текст."""
+    r = requests.post(f"{base_url}/v1/chat/completions", timeout=60,
+                      json={"model": "stub", "messages": chat_messages(prompt)})
+    r.raise_for_status()
+    return r.json()["choices"][0]["message"]["content"]
+
+
+def timed_stream(gen) -> tuple[float, float, str]:
+    """(секунд до першого шматка, секунд усього, текст)."""
+    t0 = time.perf_counter()
+    first, parts = None, []
+    for piece in gen:
+        if first is None:
+            first = time.perf_counter() - t0
+        parts.append(piece)
+    return first or 0.0, time.perf_counter() - t0, "".join(parts)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="LLM answer: blocking vs streaming vs disk cache (stub server)")
+    ap.add_argument("--prompts", type=int, default=5)
+    ap.add_argument("--delay", type=float, default=0.02, help="stub: seconds between tokens")
+    ap.add_argument("--first-token", type=float, default=0.3, help="stub: seconds before the first token")
+    args = ap.parse_args()
+
+    httpd, url = serve_stub(token_delay=args.delay, first_token=args.first_token)
+    backend = StubBackend(url)
+    prompts = [f"які типи оплати дають найбільше виручки? (варіант {i})" for i in range(args.prompts)]
+    print(f"{'prompt':>6} {'blocking, s':>12} {'stream first, s':>16} {'stream all, s':>14} "
+          f"{'cached, s':>10} {'same':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMCache(tmp)
+        for i, p in enumerate(prompts):
+            with Timer() as t:
+                old = blocking_answer(url, p)
+            first, total, new = timed_stream(stream_answer(backend, p, cache, "2017-01-01", "2018-08-31", "bench"))
+            _, cached, again = timed_stream(stream_answer(backend, p, cache, "2017-01-01", "2018-08-31", "bench"))
+            same = old == new.strip() == again
+            print(f"{i:>6} {t.seconds:>12.3f} {first:>16.3f} {total:>14.3f} {cached:>10.4f} "
+                  f"{'yes' if same else 'NO':>5}")
+        print(f"cache: {cache.hits} hits / {cache.misses} misses")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# bench/bench_pages.py
+# скільки сторінка «думає» після зміни віджета — як це відчуває користувач, а не окремі функції.
+# streamlit AppTest без браузера й мережі: кожна сторінка — окремий процес (порожні кеші процесу),
+# холодне завантаження, далі скриптові зміни віджетів (період, поріг Delay Risk, повзунки ROI, чат агента)
+# → перцентилі warm rerun, частка влучань і витіснення в кеші процесу (src.cache.cache_stats).
+#   python -m bench.bench_pages                                    # синтетичні 50k замовлень, ліміт 10k як на титулці
+#   python -m bench.bench_pages --orders 200000 --max-orders 0 --pages 7_ROI 9_Delay_Risk --rounds 5
+#   python -m bench.bench_pages --data data                        # свої дані (напр. розпакований Release)
+#   python -m bench.bench_pages --llm-stub                         # чат агента з локальним stub-LLM (src/llm_stub.py)
+from __future__ import annotations
+import argparse
+import datetime as dt
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+from bench.common import Timer
+from src.ingest import peak_rss_mb
+from src.synth import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_TIMEOUT_S = 600   # один rerun (холодний Delay Risk на великих даних — навчання моделі)
+# похідні дискові кеші в синтетичній папці: без них холодний старт — справді перший запуск
+DISK_CACHES = ["models", "scores", "_customer_months.parquet", "_customer_months.json", "_llm_cache"]
+
+
+# --- кроки сценарію: step(at, init) змінює віджет; init — значення з холодного запуску (повний період)
+def _period(days: int | None):
+    """Останні days днів вихідного періоду (None — весь період)."""
+    def step(at, init):
+        lo, hi = init["period"]
+        at.date_input[0].set_value((lo if days is None else max(lo, hi - dt.timedelta(days=days)), hi))
+    return step
+
+
+def _set(kind: str, label: str, value):
+    """Віджет kind, чия назва починається з label → value."""
+    def step(at, init):
+        next(w for w in getattr(at, kind) if w.label.startswith(label)).set_value(value)
+    return step
+
+
+def _chat(text: str):
+    def step(at, init):
+        at.chat_input[0].set_value(text)
+    return step
+
+
+PERIODS = [_period(30), _period(90), _period(365), _period(None)]
+
+PAGE_STEPS = {
+    "streamlit_app": [_set("number_input", "К-сть записів", 20_000), _set("number_input", "К-сть записів", 10_000),
+                      _set("checkbox", "Порахувати звіт", True), _set("checkbox", "Порахувати звіт", False)],
+    "0_AI_Agent": PERIODS + [_set("number_input", "Валова маржа", 40), _chat("kpi за період"),
+                             _chat("тренд по днях"), _chat("rfm сегменти"),
+                             _chat("SELECT payment_type, count(*) AS n FROM facts GROUP BY 1")],
+    "1_KPI_Trends": PERIODS + [_set("radio", "Деталізація", "Година"), _set("radio", "Деталізація", "День"),
+                               _set("checkbox", "Тільки останній рік", True),
+                               _set("checkbox", "Тільки останній рік", False)],
+    "2_SLA_Delivery": PERIODS + [_set("slider", "Скорочення", 10.0), _set("slider", "Скорочення", 5.0)],
+    "3_Payments": PERIODS,
+    "4_Reviews": PERIODS,
+    "5_RFM": PERIODS,
+    "7_ROI": PERIODS + [_set("slider", "Маржа", 40), _set("slider", "Зменшити частку late", 10),
+                        _set("slider", "Win-back coverage", 30), _set("slider", "Win-back uplift", 15),
+                        _set("slider", "Cross-sell coverage", 30), _set("slider", "Cross-sell uplift", 8)],
+    "8_Geo_SLA": PERIODS + [_set("selectbox", "Агрегувати", "(опційно) seller_state"),
+                            _set("selectbox", "Агрегувати", "customer_state")],
+    # поріг лише перераховує матрицю; інше C — нова модель (перший раз навчання, далі з реєстру)
+    "9_Delay_Risk": [_set("slider", "Поріг", v) for v in (0.3, 0.4, 0.6, 0.7, 0.5)]
+                    + [_set("select_slider", "Регуляризація", 0.1), _set("select_slider", "Регуляризація", 1.0)],
+}
+
+
+def _page_name(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def all_pages() -> list[str]:
+    pages = sorted(f"pages/{fn}" for fn in os.listdir(os.path.join(ROOT, "pages")) if fn.endswith(".py"))
+    return ["streamlit_app.py"] + pages
+
+
+def make_app_dir(data_dir: str) -> str:
+    """Тимчасова «копія» застосунку: симлінки на код + data → потрібні дані (сторінки читають відносне data/)."""
+    app_dir = tempfile.mkdtemp(prefix="bench_pages_")
+    for name in ("streamlit_app.py", "pages", "src"):
+        os.symlink(os.path.join(ROOT, name), os.path.join(app_dir, name))
+    os.symlink(os.path.abspath(data_dir), os.path.join(app_dir, "data"))
+    return app_dir
+
+
+def _hit_ratio(stats: dict) -> float | None:
+    hits = sum(s["hits"] for s in stats.values())
+    total = hits + sum(s["misses"] for s in stats.values())
+    return hits / total if total else None
+
+
+def _evictions(stats: dict) -> int:
+    return sum(s.get("evictions", 0) for s in stats.values())
+
+
+def worker(page: str, app_dir: str, rounds: int, max_orders: int) -> None:
+    os.chdir(app_dir)
+    sys.path.insert(0, app_dir)
+    from streamlit.testing.v1 import AppTest
+    from src.data import cache_stats, reset_cache_stats
+
+    at = AppTest.from_file(os.path.join(app_dir, page), default_timeout=PAGE_TIMEOUT_S)
+    at.secrets["DATA_RELEASE_ZIP"] = ""  # офлайн: титулка не піде качати Release, і secrets.toml не потрібен
+    if max_orders:
+        at.session_state["max_orders"] = max_orders  # як після титулки
+    with Timer() as t:
+        at.run()
+    if at.exception:
+        raise RuntimeError(f"cold run: {at.exception[0].value}")
+    cold, cold_stats = t.seconds, cache_stats()
+    init = {"period": at.date_input[0].value if len(at.date_input) else None}
+    reset_cache_stats()
+
+    warm = []
+    for _ in range(rounds):
+        for step in PAGE_STEPS.get(_page_name(page), []):
+            step(at, init)
+            with Timer() as t:
+                at.run()
+            if at.exception:
+                raise RuntimeError(f"rerun: {at.exception[0].value}")
+            warm.append(t.seconds)
+    print(json.dumps({"cold_s": cold, "warm_s": warm, "cache_cold": cold_stats,
+                      "cache_warm": cache_stats(), "peak_rss_mb": peak_rss_mb()}))
+
+
+def run_page(page: str, app_dir: str, rounds: int, max_orders: int, llm_stub: bool) -> dict:
+    env = {**os.environ, "OLIST_LLM_BACKEND": "stub" if llm_stub else ""}  # ніяких запитів в OpenAI
+    for name in ("OLIST_LLM_STUB_URL", "OLIST_LLM_CACHE_DIR"):  # stub — у процесі сторінки, кеш — data/_llm_cache
+        env.pop(name, None)
+    out = subprocess.run([sys.executable, "-m", "bench.bench_pages", "--worker", page, app_dir,
+                          str(rounds), str(max_orders)], capture_output=True, text=True, cwd=ROOT, env=env)
+    if out.returncode != 0:
+        return {"error": (out.stderr.strip().splitlines() or ["?"])[-1]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def clear_disk_caches(data_dir: str) -> None:
+    for name in DISK_CACHES:
+        path = os.path.join(data_dir, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="per-page cold / warm rerun latency (streamlit AppTest, offline)")
+    ap.add_argument("--orders", type=int, default=50_000, help="розмір синтетичного датасету")
+    ap.add_argument("--data", help="папка з CSV/Parquet замість синтетики (дискові кеші в ній не чистимо)")
+    ap.add_argument("--max-orders", type=int, default=10_000, help="ліміт як на титулці (0 — всі замовлення)")
+    ap.add_argument("--pages", nargs="+", help="лише ці сторінки (за назвою: 7_ROI, streamlit_app, ...)")
+    ap.add_argument("--rounds", type=int, default=3, help="скільки разів пройти сценарій віджетів")
+    ap.add_argument("--keep-disk", action="store_true",
+                    help="не чистити моделі/вимір клієнтів перед сторінкою (рестарт, а не перший запуск)")
+    ap.add_argument("--llm-stub", action="store_true", help="чат агента через локальний stub-LLM")
+    ap.add_argument("--json", help="зберегти сирі результати (JSON)")
+    ap.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "olist_bench"))
+    ap.add_argument("--worker", nargs=4, metavar=("PAGE", "APP", "ROUNDS", "MAX"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker:
+        worker(args.worker[0], args.worker[1], int(args.worker[2]), int(args.worker[3]))
+        return
+
+    if args.data:
+        data_dir, synthetic = args.data, False
+    else:
+        data_dir, synthetic = os.path.join(args.data_root, f"pages_n{args.orders}"), True
+        if not os.path.exists(os.path.join(data_dir, "olist_orders_dataset.csv")):
+            generate(args.orders, data_dir)
+    pages = [p for p in all_pages() if not args.pages or _page_name(p) in args.pages]
+    app_dir = make_app_dir(data_dir)
+
+    results = {}
+    print(f"{'page':<16} {'cold s':>7} {'reruns':>6} {'p50 s':>7} {'p90 s':>7} {'p99 s':>7} {'max s':>7} "
+          f"{'hit% cold':>9} {'hit% warm':>9} {'evict':>5} {'peak RSS':>9}")
+    try:
+        for page in pages:
+            if synthetic and not args.keep_disk:
+                clear_disk_caches(data_dir)
+            res = run_page(page, app_dir, args.rounds, args.max_orders, args.llm_stub)
+            results[_page_name(page)] = res
+            if "error" in res:
+                print(f"{_page_name(page):<16} ERROR: {res['error']}")
+                continue
+            warm = np.asarray(res["warm_s"])
+            p50, p90, p99 = np.percentile(warm, [50, 90, 99]) if len(warm) else (np.nan,) * 3
+            hc, hw = _hit_ratio(res["cache_cold"]), _hit_ratio(res["cache_warm"])
+            print(f"{_page_name(page):<16} {res['cold_s']:>7.2f} {len(warm):>6} {p50:>7.3f} {p90:>7.3f} "
+                  f"{p99:>7.3f} {warm.max() if len(warm) else np.nan:>7.3f} "
+                  f"{'—' if hc is None else f'{hc:.0%}':>9} {'—' if hw is None else f'{hw:.0%}':>9} "
+                  f"{_evictions(res['cache_cold']) + _evictions(res['cache_warm']):>5} "
+                  f"{res['peak_rss_mb'] or 0:>6.0f} MB")
+    finally:
+        shutil.rmtree(app_dir, ignore_errors=True)  # лише симлінки — самі дані лишаються
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"orders": None if args.data else args.orders, "max_orders": args.max_orders,
+                       "rounds": args.rounds, "pages": results}, fh, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# bench/bench_rfm.py
+# RFM: старий шлях сторінки (lambda в groupby.agg + qcut + apply(axis=1)) vs src/rfm.py (векторно)
+#   python -m bench.bench_rfm --customers 100000 1000000 2000000
+#   python -m bench.bench_rfm --customers 1000000 --legacy-max 0      # лише новий рушій
+from __future__ import annotations
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from bench.common import Timer
+from src.rfm import compute_rfm, segment_of
+
+
+def make_orders(n_customers: int, orders_per_customer: float = 1.2, seed: int = 42) -> pd.DataFrame:
+    """Рядки замовлень як у facts: customer_id (32 символи), purchase_dt, gross_revenue."""
+    rng = np.random.default_rng(seed)
+    n = int(n_customers * orders_per_customer)
+    cust = np.concatenate([np.arange(n_customers), rng.integers(0, n_customers, n - n_customers)])
+    ts = pd.Timestamp("2016-09-01") + pd.to_timedelta(rng.integers(0, 760 * 86400, n), unit="s")
+    return pd.DataFrame({
+        "order_id": np.arange(n),
+        "customer_id": pd.Series(cust).map("{:032x}".format),
+        "purchase_dt": ts,
+        "gross_revenue": rng.gamma(2.0, 60.0, n).round(2),
+    })
+
+
+def legacy_rfm(view: pd.DataFrame) -> pd.DataFrame:
+    """Як було на сторінці RFM до src/rfm.py."""
+    snapshot = view["purchase_dt"].max() + pd.Timedelta(days=1)
+    rfm = (view.groupby("customer_id").agg(
+        Recency=("purchase_dt", lambda s: (snapshot - pd.to_datetime(s).max()).days),
+        Frequency=("order_id", "count"),
+        Monetary=("gross_revenue", "sum"),
+    ).reset_index())
+
+    def qscore(series, asc):
+        try:
+            lab = [5, 4, 3, 2, 1] if asc else [1, 2, 3, 4, 5]
+            return pd.qcut(series.rank(method="first"), 5, labels=lab).astype(int)
+        except Exception:
+            return pd.Series([3] * len(series), index=series.index)
+
+    rfm["R"] = qscore(rfm["Recency"], True)
+    rfm["F"] = qscore(rfm["Frequency"], False)
+    rfm["M"] = qscore(rfm["Monetary"], False)
+    rfm["RFM"] = rfm["R"] + rfm["F"] + rfm["M"]
+    rfm["Segment"] = rfm.apply(lambda r: segment_of(r["R"], r["F"], r["M"]), axis=1)
+    return rfm
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="RFM: legacy vs vectorized")
+    ap.add_argument("--customers", type=int, nargs="+", default=[100_000, 1_000_000, 2_000_000])
+    ap.add_argument("--legacy-max", type=int, default=1_000_000,
+                    help="старий шлях міряємо лише до стількох клієнтів (0 — не міряти; на 1M він іде ~4 хв)")
+    args = ap.parse_args()
+
+    print(f"{'customers':>12} {'rows':>12} {'legacy, s':>10} {'vector, s':>10} {'speedup':>8} {'same':>5}")
+    for n in args.customers:
+        df = make_orders(n)
+        with Timer() as t:
+            new = compute_rfm(df)
+        t_new = t.seconds
+        t_old, same = float("nan"), "—"
+        if n <= args.legacy_max:
+            with Timer() as t:
+                old = legacy_rfm(df)
+            t_old = t.seconds
+            same = "yes" if (old["Segment"].to_numpy() == new["Segment"].astype(str).to_numpy()).all() else "NO"
+        speedup = f"{t_old / t_new:>7.1f}x" if t_old == t_old else f"{'—':>8}"
+        print(f"{n:>12,} {len(df):>12,} {t_old:>10.2f} {t_new:>10.2f} {speedup} {same:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# bench/common.py
+# спільне для бенчмарків: синтетичний Olist-подібний датасет (src/synth.py) у Parquet-кеш, вивантаження в CSV + таймер
+from __future__ import annotations
+import time
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from src.synth import generate
+
+
+def make_dataset(n_orders: int, out_dir: str, seed: int = 42) -> str:
+    """Синтетичний датасет (src/synth.py) у out_dir одразу як типізований Parquet-кеш (без CSV)."""
+    generate(n_orders, out_dir, seed, csv=False)
+    return out_dir
+
+
+def write_csv(pq_path: str, dest) -> None:
+    """Parquet-таблицю → CSV (dest — шлях або файловий об'єкт) батчами, без читання всієї таблиці."""
+    f = pq.ParquetFile(pq_path)
+    with pacsv.CSVWriter(dest, f.schema_arrow) as w:
+        for batch in f.iter_batches():
+            w.write_batch(batch)
+
+
+class Timer:
+    """with Timer() as t: ...  →  t.seconds"""
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._t0
@@ -0,0 +1,279 @@
+# bench/suite.py
+# набір бенчмарків шару даних і обчислень кожної сторінки (asv-подібно): кейс = підготовка + замір,
+# кожен кейс × розмір — в окремому процесі (чесний пік RSS), результат порівнюється з baseline.json.
+#   python -m bench.suite                                        # усі кейси на 10k / 100k / 1M, порівняння з baseline
+#   python -m bench.suite --sizes 100000 --cases rfm geo_sla --repeat 5
+#   python -m bench.suite --save-baseline                        # записати поточні цифри як нову базу
+#   python -m bench.suite --threshold 0.10 --rss-threshold 0.20   # допуск регресії (частка від бази)
+# Код виходу 1 — є регресія (зручно для CI). База залежить від машини: після зміни заліза її перезаписують.
+from __future__ import annotations
+import argparse
+import atexit
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench.common import Timer
+from src.ingest import peak_rss_mb
+from src.synth import generate
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = [10_000, 100_000, 1_000_000]
+THRESHOLD = 0.25       # +25% часу від бази — регресія
+RSS_THRESHOLD = 0.25   # +25% піку RSS від бази — регресія
+MIN_DELTA_S = 0.05     # різниці менші за це — шум (планувальник, GC), не регресія
+MIN_DELTA_MB = 16.0    # те саме для пам'яті
+# кейси, які на великих розмірах йдуть хвилинами: вище ліміту пропускаємо (--all-sizes — міряти все).
+# saga-регресія на 1 CPU: 100k рядків ≈ 50 с на одне навчання, 1M — ~10 хв.
+CASE_MAX_SIZE = {"model_fit": 100_000}
+
+
+# --- кейси: setup(data_dir) готує вхід (не міряється) і повертає run() — те, що міряємо
+def _facts(data_dir: str):
+    from src.data import get_facts
+    return get_facts(data_dir)
+
+
+def case_get_facts_pandas(data_dir: str):
+    from src.data import get_facts
+    return lambda: get_facts(data_dir, engine="pandas")
+
+
+def case_get_facts_duckdb(data_dir: str):
+    from src.data import get_facts
+    return lambda: get_facts(data_dir, engine="duckdb")
+
+
+def case_ensure_parquet_cache(data_dir: str):
+    """CSV → Parquet-кеш з нуля: CSV (симлінки) в окремій папці, перед кожним прогоном кеш видаляємо."""
+    from src.data import ensure_parquet_cache
+    work = tempfile.mkdtemp(prefix="suite_pq_")
+    atexit.register(shutil.rmtree, work, True)
+    for path in glob.glob(os.path.join(data_dir, "*.csv")):
+        os.symlink(os.path.abspath(path), os.path.join(work, os.path.basename(path)))
+
+    def run():
+        for path in os.listdir(work):
+            if not path.endswith(".csv"):
+                os.remove(os.path.join(work, path))
+        return ensure_parquet_cache(work)
+    return run
+
+
+def case_rfm(data_dir: str):
+    from src.customers import customer_rfm, load_customer_months
+    facts = _facts(data_dir)
+    load_customer_months(data_dir)  # агрегати клієнтів будуються один раз на версію — міряємо саме вікно
+    return lambda: customer_rfm(facts, data_dir)
+
+
+def case_geo_sla(data_dir: str):
+    from src.features import seller_states
+    from src.geo import state_sla
+    facts = _facts(data_dir).copy(deep=False)
+    facts["seller_state"] = facts["order_id"].map(seller_states(data_dir))
+    return lambda: (state_sla(facts, "customer_state"), state_sla(facts, "seller_state"))
+
+
+def case_training_table(data_dir: str):
+    from src.features import training_table
+    return lambda: training_table(data_dir)
+
+
+def case_model_fit(data_dir: str):
+    from src.delay_model import train_model
+    from src.features import training_table
+    data = training_table(data_dir)
+    return lambda: train_model(data)
+
+
+def case_agent_tools(data_dir: str):
+    """Усі локальні інструменти агента по черзі (як натискання всіх підказок у чаті)."""
+    from src.agent_tools import (tool_kpis, tool_trend, tool_payments_breakdown, tool_reviews_summary,
+                                 tool_rfm, tool_roi_reduce_late)
+    from src.customers import load_customer_months
+    facts = _facts(data_dir)
+    load_customer_months(data_dir)  # агрегати клієнтів будуються один раз на версію — це не частина інструмента
+
+    def run():
+        tool_kpis(facts)
+        tool_trend(facts, rolling_days=7)
+        tool_payments_breakdown(facts)
+        tool_reviews_summary(facts)
+        tool_rfm(facts, data_dir)
+        tool_roi_reduce_late(facts, 5.0, 55, 1.2)
+    return run
+
+
+def case_agent_sql(data_dir: str):
+    """Автоаналіз (AUTO_DEFAULT) на свіжій DuckDB-сесії: без LRU-кешу, щоб міряти самі запити."""
+    from src.sql_session import AUTO_DEFAULT, AUTO_SLICES, FactsSession
+    facts = _facts(data_dir)
+
+    def run():
+        session = FactsSession(facts, "bench")
+        try:
+            return [session.query(AUTO_SLICES[name]) for name in AUTO_DEFAULT]
+        finally:
+            session.close()
+    return run
+
+
+CASES = {
+    "get_facts[pandas]": case_get_facts_pandas,
+    "get_facts[duckdb]": case_get_facts_duckdb,
+    "ensure_parquet_cache": case_ensure_parquet_cache,
+    "rfm": case_rfm,
+    "geo_sla": case_geo_sla,
+    "training_table": case_training_table,
+    "model_fit": case_model_fit,
+    "agent_tools": case_agent_tools,
+    "agent_sql": case_agent_sql,
+}
+
+
+def _cold() -> None:
+    """Скидає кеші процесу між повторами (ознаки замовлень у src.features), щоб кожен прогін був «холодним»."""
+    from src.cache import CACHE
+    for store in ("features.order_features", "features.training"):
+        CACHE.clear(store)
+
+
+def _reset_peak_rss() -> float | None:
+    """Обнуляє VmHWM (Linux: запис «5» у /proc/self/clear_refs) — пік далі рахується лише для заміру."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        return None
+    return peak_rss_mb()
+
+
+def worker(case: str, data_dir: str, repeat: int) -> None:
+    run = CASES[case](data_dir)
+    base_rss = _reset_peak_rss()
+    times = []
+    for _ in range(repeat):
+        _cold()
+        with Timer() as t:
+            run()
+        times.append(t.seconds)
+    print(json.dumps({"seconds": times, "peak_rss_mb": peak_rss_mb(), "setup_rss_mb": base_rss}))
+
+
+def run_case(case: str, data_dir: str, repeat: int) -> dict:
+    out = subprocess.run([sys.executable, "-m", "bench.suite", "--worker", case, data_dir, str(repeat)],
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"error": (out.stderr.strip().splitlines() or ["?"])[-1]}
+    res = json.loads(out.stdout.strip().splitlines()[-1])
+    return {"seconds": statistics.median(res["seconds"]), "best_s": min(res["seconds"]),
+            "peak_rss_mb": res["peak_rss_mb"], "setup_rss_mb": res["setup_rss_mb"]}
+
+
+def ensure_dataset(n: int, data_root: str) -> str:
+    """Синтетичний датасет n замовлень (CSV + Parquet) — генерується один раз і лишається в data_root."""
+    data_dir = os.path.join(data_root, f"suite_n{n}")
+    if not os.path.exists(os.path.join(data_dir, "olist_orders_dataset.csv")):
+        shutil.rmtree(data_dir, ignore_errors=True)
+        with Timer() as t:
+            generate(n, data_dir)
+        print(f"{n:>10,} {'(gen)':<22} {t.seconds:>8.2f}")
+    return data_dir
+
+
+def compare(cur: dict, base: dict | None, threshold: float, rss_threshold: float) -> list[str]:
+    """Список регресій (порожній — все добре). Малі абсолютні різниці — шум, не рахуються."""
+    if not base or "error" in cur or "error" in base:
+        return []
+    bad = []
+    dt = cur["seconds"] - base["seconds"]
+    if dt > MIN_DELTA_S and cur["seconds"] > base["seconds"] * (1 + threshold):
+        bad.append(f"time {base['seconds']:.3f} → {cur['seconds']:.3f} s")
+    if cur.get("peak_rss_mb") and base.get("peak_rss_mb"):
+        dm = cur["peak_rss_mb"] - base["peak_rss_mb"]
+        if dm > MIN_DELTA_MB and cur["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_threshold):
+            bad.append(f"RSS {base['peak_rss_mb']:.0f} → {cur['peak_rss_mb']:.0f} MB")
+    return bad
+
+
+def _change(cur: float, base: float | None) -> str:
+    return f"{(cur / base - 1) * 100:+.0f}%" if base else "—"
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="benchmark suite: data layer + page compute paths vs baseline")
+    ap.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    ap.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    ap.add_argument("--repeat", type=int, default=3, help="повторів на кейс; у звіт іде медіана")
+    ap.add_argument("--baseline", default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true", help="записати результати як нову базу")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD, help="допуск часу, частка (0.25 = +25%%)")
+    ap.add_argument("--rss-threshold", type=float, default=RSS_THRESHOLD, help="допуск піку RSS, частка")
+    ap.add_argument("--all-sizes", action="store_true", help="не пропускати повільні кейси (CASE_MAX_SIZE)")
+    ap.add_argument("--out", help="куди зберегти результати цього прогону (JSON)")
+    ap.add_argument("--data-root", default=os.path.join(tempfile.gettempdir(), "olist_bench"))
+    ap.add_argument("--worker", nargs=3, metavar=("CASE", "DIR", "REPEAT"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.worker:
+        worker(args.worker[0], args.worker[1], int(args.worker[2]))
+        return
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh).get("results", {})
+
+    results, regressions = {}, []
+    print(f"{'orders':>10} {'case':<22} {'median s':>8} {'best s':>8} {'vs base':>8} "
+          f"{'peak RSS':>9} {'vs base':>8}  status")
+    for n in args.sizes:
+        data_dir = ensure_dataset(n, args.data_root)
+        results[str(n)] = {}
+        for case in args.cases:
+            if not args.all_sizes and n > CASE_MAX_SIZE.get(case, n):
+                print(f"{n:>10,} {case:<22} skip (> {CASE_MAX_SIZE[case]:,}, див. --all-sizes)")
+                continue
+            cur = run_case(case, data_dir, args.repeat)
+            results[str(n)][case] = cur
+            if "error" in cur:
+                print(f"{n:>10,} {case:<22} ERROR: {cur['error']}")
+                continue
+            base = baseline.get(str(n), {}).get(case)
+            bad = compare(cur, base, args.threshold, args.rss_threshold)
+            regressions += [f"{n:,} {case}: {b}" for b in bad]
+            print(f"{n:>10,} {case:<22} {cur['seconds']:>8.3f} {cur['best_s']:>8.3f} "
+                  f"{_change(cur['seconds'], base and base.get('seconds')):>8} "
+                  f"{cur['peak_rss_mb'] or 0:>6.0f} MB {_change(cur['peak_rss_mb'] or 0, base and base.get('peak_rss_mb')):>8}  "
+                  f"{'REGRESSION' if bad else ('new' if not base else 'ok')}")
+
+    doc = {"meta": {"python": platform.python_version(), "machine": platform.machine(),
+                    "cpus": os.cpu_count(), "repeat": args.repeat},
+           "results": results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(doc, fh, indent=1)
+    if args.save_baseline:
+        # дописуємо в наявну базу: прогін лише частини кейсів/розмірів не стирає решту
+        merged = {k: dict(v) for k, v in baseline.items()}
+        for n, cases in results.items():
+            merged.setdefault(n, {}).update({c: r for c, r in cases.items() if "error" not in r})
+        doc["results"] = merged
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(doc, fh, indent=1, sort_keys=True)
+        print(f"baseline → {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} регресій (поріг: час +{args.threshold:.0%}, RSS +{args.rss_threshold:.0%}):")
+        for r in regressions:
+            print("  " + r)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,32 @@
-import duckdb
+import time
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 
-from src.data import get_facts
+from src.data import load_facts, slice_period, dataset_version, DATA_DIR
+from src.charts import downsample
+from src.agent_tools import (tool_kpis, tool_trend, tool_payments_breakdown, tool_reviews_summary,
+                             tool_rfm, tool_roi_reduce_late)
+from src.llm import make_backend, shared_cache, stream_answer
+from src.sql_session import AUTO_DEFAULT, AUTO_SLICES, SQL_WORKERS, facts_session
+from src.profiling import page_profile, finish_page
 
 # -----------------------------
 # Тайтл і опис сторінки
 # -----------------------------
 st.set_page_config(page_title="AI-Агент — Olist BI", layout="wide")
 st.title("🤖 AI-агент: ваш data-copilot")
+prof = page_profile(__file__)
 st.caption("Став ‘людські’ питання або пиши безпечний SELECT по таблиці facts.")
 
 # -----------------------------
-# Завантаження даних (кеш)
+# Завантаження даних (спільне сховище facts у src.data)
 # ліміт беремо лише з session_state['max_orders'].
-# Якщо його нема → get_facts(.., max_orders=None) то беруться ВСІ дані.
+# Якщо його нема → load_facts(.., max_orders=None) то беруться ВСІ дані.
 # -----------------------------
-@st.cache_data(show_spinner=False)
-def load_facts(data_dir: str, max_orders: int | None):
-    # src.data.get_facts уже робить усі потрібні поля (purchase_dt, purchase_date, ym, on_time тощо)
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховка від відсутніх колонок у кастомних наборах
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    for c in ["gross_revenue", "delivery_time_h", "delay_h"]:
-        if c in f.columns:
-            f[c] = pd.to_numeric(f[c], errors="coerce")
-    if "on_time" not in f.columns:
-        f["on_time"] = np.nan
-    return f
-
-facts = load_facts("data", st.session_state.get("max_orders"))
+facts = load_facts(DATA_DIR, st.session_state.get("max_orders"))
 
 if facts.empty:
     st.error("Дані не знайдені. Перевір на головній сторінці налаштування джерела/Release.")
@@ -45,141 +38,75 @@ if facts.empty:
 st.sidebar.header("Фільтри та припущення")
 min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
 d1, d2 = st.sidebar.date_input("Період", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-view = facts.loc[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+view = slice_period(facts, d1, d2)
 
 margin_pct = st.sidebar.number_input("Валова маржа, %", 1, 99, 55)
 pickpack_cost = st.sidebar.number_input("Витрати фулфілменту/замовлення, R$", 0.0, 20.0, 1.2, 0.1)
 
 # -----------------------------
 # Сервісні інструменти (тулзи агента)
+# KPI / тренд / оплати / відгуки / RFM / ROI — у src/agent_tools.py (без streamlit), тут лише SQL і рендер
 # -----------------------------
-def tool_kpis(df: pd.DataFrame) -> dict:
-    """Базові KPI: к-сть, виручка, AOV, on-time%."""
-    n = len(df)
-    rev = float(df["gross_revenue"].sum()) if "gross_revenue" in df else 0.0
-    aov = rev / n if n else 0.0
-    on_time = float(df["on_time"].mean()) if "on_time" in df and df["on_time"].notna().any() else None
-    return {"orders": n, "revenue": rev, "aov": aov, "on_time_rate": on_time}
-
-def tool_trend(df: pd.DataFrame, rolling_days: int = 7) -> pd.DataFrame:
-    """Тренд по днях + ковзна середня."""
-    by_day = df.groupby("purchase_date", as_index=False).agg(
-        orders=("order_id","count"),
-        revenue=("gross_revenue","sum")
-    )
-    if rolling_days and len(by_day) >= rolling_days:
-        by_day["orders_ma"] = by_day["orders"].rolling(rolling_days).mean()
-        by_day["revenue_ma"] = by_day["revenue"].rolling(rolling_days).mean()
-    return by_day
-
-def tool_payments_breakdown(df: pd.DataFrame) -> pd.DataFrame:
-    """Розклад по оплатах: частки, виручка, AOV."""
-    if "payment_type" not in df.columns:
-        return pd.DataFrame()
-    g = (df.groupby("payment_type", dropna=False)
-           .agg(orders=("order_id","count"), revenue=("gross_revenue","sum"))
-           .reset_index().sort_values("revenue", ascending=False))
-    g["AOV"] = g["revenue"] / g["orders"]
-    g["share_%"] = 100 * g["orders"] / g["orders"].sum()
-    return g
-
-def tool_reviews_summary(df: pd.DataFrame) -> pd.DataFrame:
-    """Залежність оцінок від SLA."""
-    if "review_score" not in df.columns:
-        return pd.DataFrame()
-    g = (df.groupby("review_score", dropna=False)
-           .agg(orders=("order_id","count"),
-                on_time=("on_time","mean"),
-                delivery_time_h=("delivery_time_h","mean"),
-                delay_h=("delay_h","mean"))
-           .reset_index().sort_values("review_score"))
-    return g
-
-def tool_rfm(df: pd.DataFrame) -> pd.DataFrame:
-    """Простий RFM (якщо нема customer_id, використовуємо order_id як сурогат для демо)."""
-    if "customer_id" not in df.columns or df["customer_id"].isna().all():
-        df = df.copy()
-        df["customer_id"] = df["order_id"]
-    snapshot = pd.to_datetime(df["purchase_dt"] if "purchase_dt" in df else df["order_purchase_timestamp"]).max() + pd.Timedelta(days=1)
-    rfm = (df.groupby("customer_id").agg(
-        Recency=("purchase_dt" if "purchase_dt" in df else "order_purchase_timestamp",
-                 lambda s: (snapshot - pd.to_datetime(s).max()).days),
-        Frequency=("order_id","count"),
-        Monetary=("gross_revenue","sum")
-    ).reset_index())
+def tool_sql_query(sql: str, d1=None, d2=None) -> pd.DataFrame:
+    """Безпечний SELECT по таблиці facts за період [d1, d2].
 
-    # квінтильні бали (з запасом на вироджені розподіли) 
-    def qscore(series, asc):
-        try:
-            # rank() знімає проблему з дублікатами
-            q = pd.qcut(series.rank(method="first"), 5,
-                        labels=[5,4,3,2,1] if asc else [1,2,3,4,5])
-            return q.astype(int)
-        except Exception:
-            return pd.Series([3]*len(series), index=series.index)
-
-    rfm["R"] = qscore(rfm["Recency"], True)
-    rfm["F"] = qscore(rfm["Frequency"], False)
-    rfm["M"] = qscore(rfm["Monetary"], False)
-    rfm["RFM"] = rfm["R"] + rfm["F"] + rfm["M"]
-    return rfm
-
-def tool_roi_reduce_late(df: pd.DataFrame, reduce_pp: float, margin_pct: float, pickpack_cost: float) -> dict:
-    """Оцінка ефекту від скорочення частки 'late' на reduce_pp п.п."""
-    if "on_time" not in df.columns or df["on_time"].isna().all():
-        return {"note": "on_time недоступний у вибірці"}
-    late = df[df["on_time"] == False]
-    late_rev = float(late["gross_revenue"].sum())
-    recaptured_rev = late_rev * (reduce_pp / 100.0)
-    profit = recaptured_rev * (margin_pct / 100.0)
-    return {"recaptured_revenue": recaptured_rev, "profit": profit}
-
-def tool_sql_query(sql: str, df: pd.DataFrame) -> pd.DataFrame:
-    """Безпечний SELECT по таблиці facts (через DuckDB in-memory)."""
-    q = sql.strip().lower()
-    forbidden = ("drop", "update", "delete", "insert", "alter", "create", "replace")
-    if not q.startswith("select") or any(x in q for x in forbidden):
-        raise ValueError("Дозволені лише безпечні SELECT-запити.")
-    con = duckdb.connect()
-    con.register("facts", df)
-    out = con.execute(sql).fetch_df()
-    con.close()
-    return out
+    DuckDB-сесія живе весь процес (src/sql_session.py): facts зареєстровано один раз,
+    період і ліміт вибірки — параметри запиту, а однакові запити беруться з LRU-кешу сесії.
+    Сесія сама стежить за безпекою: лише один SELECT, ліміти пам'яті/потоків, таймаут,
+    не більше SQL_MAX_ROWS рядків (df.attrs["truncated"]).
+    """
+    max_orders = st.session_state.get("max_orders")
+    return facts_session(DATA_DIR, max_orders).query(sql, d1, d2, max_orders=max_orders)
+
+def looks_like_sql(text: str) -> bool:
+    """Повідомлення в чаті — це SQL, а не питання (SELECT/WITH/FROM на початку)."""
+    return text.lstrip().lower().startswith(("select", "with", "from"))
+
+def show_sql_result(res):
+    """Результат tool_sql_query (DataFrame або виняток) → таблиця + час/проскановані рядки / попередження."""
+    if isinstance(res, Exception):
+        st.warning(f"Не вдалось виконати: {res}")
+        return
+    st.dataframe(res, use_container_width=True)
+    a = res.attrs
+    st.caption(f"{a.get('seconds', 0):.2f} с · проскановано {a.get('rows_scanned', 0):,} рядків · "
+               f"результат {len(res):,} рядків")
+    if a.get("truncated"):
+        st.info(f"Показано перші {len(res):,} рядків — результат обрізано. Додайте LIMIT або агрегацію.")
+
+def render_sql(sql: str, d1=None, d2=None):
+    """SQL-запит → таблиця; помилки й обрізання показуємо, а не падаємо."""
+    try:
+        res = tool_sql_query(sql, d1, d2)
+    except Exception as e:
+        res = e
+    show_sql_result(res)
 
 # -----------------------------
 # LLM інтеграція (опціонально)
 # -----------------------------
-def have_openai() -> bool:
+def _secret(name: str):
     try:
-        import openai  # noqa: F401
-        return bool(st.secrets.get("OPENAI_API_KEY"))
+        return st.secrets.get(name)
     except Exception:
-        return False
+        return None
 
-def llm_answer(prompt: str, df: pd.DataFrame) -> str:
+def llm_backend():
+    """Бекенд LLM (src/llm.py): OpenAI за ключем, або stub (OLIST_LLM_BACKEND=stub / секрет LLM_BACKEND); None — без LLM."""
+    return make_backend(_secret("LLM_BACKEND"), api_key=_secret("OPENAI_API_KEY"), stub_url=_secret("LLM_STUB_URL"))
+
+def llm_answer(backend, prompt: str, d1=None, d2=None) -> str:
     """
     Легка консультація від LLM: коротка відповідь + порада дії.
+    Текст з'являється в чаті по токенах (st.write_stream); повтор того самого питання
+    за той самий період і версію даних береться з дискового кешу без звернення до LLM.
     Дані/графіки додаємо локально окремо (render_tool).
     """
-    from openai import OpenAI
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    system = (
-        "You are a business analytics copilot for an e-commerce dataset (Olist). "
-        "Be concise. When user asks for specific metrics or slices, pick the best tool: "
-        "kpis, trend, payments_breakdown, reviews_summary, rfm, roi_reduce_late. "
-        "Always include a practical recommendation (process optimization / marketing / SLA)."
-    )
-    messages = [{"role": "system", "content": system},
-                {"role": "user", "content": prompt}]
-    try:
-        resp = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.3,
-        )
-        return resp.choices[0].message.content.strip()
-    except Exception as e:
-        return f"(LLM недоступний) {e}"
+    cache = shared_cache()
+    text = st.write_stream(stream_answer(backend, prompt, cache, d1, d2,
+                                         dataset_version(DATA_DIR)))
+    st.caption(f"LLM: {backend.name} · кеш відповідей {cache.hits} влучань / {cache.misses} промахів")
+    return text
 
 # -----------------------------
 # Локальний «інтенто-рушій» (fallback без LLM, якщо раптом нема API або закінчилось фінансування)
@@ -215,11 +142,15 @@ def render_tool(tool_name: str, df: pd.DataFrame):
     elif tool_name == "trend":
         by_day = tool_trend(df, rolling_days=7)
         y_cols = [c for c in ["orders","revenue","orders_ma","revenue_ma"] if c in by_day.columns]
-        fig = px.line(by_day, x="purchase_date", y=y_cols, title="Тренди: замовлення/виручка (MA7 — пунктир)")
-        # робимо MA лінії пунктирними (якщо вони є)
-        for tr in fig.data:
-            if tr.name in ("orders_ma","revenue_ma"):
-                tr.update(line=dict(dash="dash"))
+        fig = go.Figure()
+        for c in y_cols:
+            # кожна лінія — не більше CHART_MAX_POINTS точок (LTTB), навіть якщо історія за роки
+            pts = downsample(by_day, "purchase_date", c)
+            fig.add_trace(go.Scatter(x=pts["purchase_date"], y=pts[c], name=c, mode="lines",
+                                     # робимо MA лінії пунктирними (якщо вони є)
+                                     line=dict(dash="dash") if c in ("orders_ma","revenue_ma") else None))
+        fig.update_layout(title="Тренди: замовлення/виручка (MA7 — пунктир)",
+                          xaxis_title="purchase_date", yaxis_title="value")
         st.plotly_chart(fig, use_container_width=True)
 
     elif tool_name == "payments_breakdown":
@@ -290,21 +221,29 @@ for m in st.session_state.chat:
         st.write(m["content"])
 
 # -----------------------------
-# Автоаналіз (3 корисні зрізи)
+# Автоаналіз (зрізи з AUTO_SLICES, виконуються паралельно)
 # -----------------------------
-if st.button("🔍 Автоаналіз (3 корисні зрізи)"):
-    candidates = [
-        "SELECT payment_type, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1 ORDER BY revenue DESC LIMIT 10",
-        "SELECT customer_state, AVG(CASE WHEN on_time THEN 1 ELSE 0 END) AS on_time_rate, COUNT(*) AS orders FROM facts GROUP BY 1 HAVING COUNT(*)>100 ORDER BY on_time_rate ASC LIMIT 10",
-        "SELECT strftime(order_purchase_timestamp, '%Y-%m') AS ym, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1 ORDER BY 1"
-    ]
-    for sql in candidates:
-        st.code(sql, language="sql")
-        try:
-            df_sql = tool_sql_query(sql, view)
-            st.dataframe(df_sql, use_container_width=True)
-        except Exception as e:
-            st.warning(f"Не вдалось виконати: {e}")
+slices = st.multiselect("Зрізи автоаналізу", list(AUTO_SLICES), default=AUTO_DEFAULT)
+if st.button(f"🔍 Автоаналіз ({len(slices)} зрізів)", disabled=not slices):
+    max_orders = st.session_state.get("max_orders")
+    session = facts_session(DATA_DIR, max_orders)
+    # місця під результати — у порядку вибору; заповнюємо в порядку завершення запитів
+    slots = []
+    for name in slices:
+        st.markdown(f"**{name}**")
+        st.code(AUTO_SLICES[name], language="sql")
+        slots.append(st.empty())
+        slots[-1].caption("виконується…")
+    with st.spinner("Виконуємо запити…"):
+        t0 = time.perf_counter()
+        for i, res in session.query_many([AUTO_SLICES[n] for n in slices], d1, d2, max_orders):
+            with slots[i].container():
+                show_sql_result(res)
+        wall = time.perf_counter() - t0
+    info = session.cache_info()
+    st.caption(f"{len(slices)} запитів за {wall:.2f} с (паралельно, до {SQL_WORKERS} одночасно). "
+               f"Кеш SQL-результатів: {info['hits']} влучань / {info['misses']} промахів, "
+               f"{info['size']} з {info['max']} записів ({info['MB']:.1f} MB).")
 
 # -----------------------------
 # Прийом повідомлення
@@ -315,17 +254,23 @@ if user_msg:
     with st.chat_message("user"):
         st.write(user_msg)
 
-    # 1) Якщо є ключ OpenAI — отримуємо «текстову консультацію»
-    answer_text = None
-    if have_openai():
-        answer_text = llm_answer(user_msg, view)
-
-    # 2) Визначаємо інструмент (LLM або локальний fallback)
-    tool = local_route(user_msg)
-    with st.chat_message("assistant"):
-        if answer_text:
-            st.write(answer_text)
-        render_tool(tool, view)
-
-    st.session_state.chat.append({"role": "assistant",
-                                  "content": answer_text or "(згенеровано локально) див. графіки/таблиці вище"})
+    # 0) SQL у чаті — одразу в керовану DuckDB-сесію, без LLM
+    if looks_like_sql(user_msg):
+        with st.chat_message("assistant"):
+            render_sql(user_msg, d1, d2)
+        st.session_state.chat.append({"role": "assistant", "content": "(SQL) див. таблицю вище"})
+    else:
+        # 1) Якщо налаштовано LLM — «текстова консультація» потоком (або з кешу)
+        # 2) Визначаємо інструмент (LLM або локальний fallback)
+        backend = llm_backend()
+        tool = local_route(user_msg)
+        answer_text = None
+        with st.chat_message("assistant"):
+            if backend is not None:
+                answer_text = llm_answer(backend, user_msg, d1, d2)
+            render_tool(tool, view)
+
+        st.session_state.chat.append({"role": "assistant",
+                                      "content": answer_text or "(згенеровано локально) див. графіки/таблиці вище"})
+
+finish_page(prof)
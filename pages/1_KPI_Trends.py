@@ -5,40 +5,25 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-from src.data import get_facts
+from src.data import load_rollup, rollup_period, rollup_summary, DATA_DIR
+from src.charts import CHART_MAX_POINTS, downsample, zoom
+from src.profiling import page_profile, finish_page, span
 
 st.set_page_config(page_title="KPI & Trends — Olist BI", layout="wide")
 st.title("📈 KPI та тренди")
+prof = page_profile(__file__)
 
-# --- завантаження фактів (кеш)
-# 
-@st.cache_data(show_spinner=False)
-def load_facts(data_dir: str, max_orders: int | None):
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховки: якщо з кастомним набором прийдуть інші поля, які нам не потрібні
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    if "purchase_dt" not in f.columns:
-        f["purchase_dt"] = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-    if "ym" not in f.columns:
-        f["ym"] = pd.to_datetime(f["purchase_dt"]).dt.to_period("M").astype(str)
-    # типи / заповнення
-    if "gross_revenue" in f.columns:
-        f["gross_revenue"] = pd.to_numeric(f["gross_revenue"], errors="coerce").fillna(0.0)
-    if "on_time" not in f.columns:
-        f["on_time"] = np.nan
-    return f
+# --- завантаження rollup-куба день × година (адитивні міри; будується один раз на версію датасету)
+# сторінці не потрібні рядки замовлень: KPI, тренди, місяці й теплова мапа — це суми по кубу
+cube = load_rollup(DATA_DIR, st.session_state.get("max_orders"), dims=("purchase_date", "hour"))
 
-facts = load_facts("data", st.session_state.get("max_orders"))
-
-if facts.empty:
+if cube.empty:
     st.info("Дані не знайдені. Зайди на титулку та перевір джерело/ліміт.")
     st.stop()
 
 # --- фільтри періоду + чекбокси
-min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
-c1, c2, c3 = st.columns([2,1,1])
+min_d, max_d = cube["purchase_date"].min(), cube["purchase_date"].max()
+c1, c2, c3, c4 = st.columns([2,1,1,1])
 with c1:
     d1, d2 = st.date_input("Період аналізу", value=(min_d, max_d),
                            min_value=min_d, max_value=max_d)
@@ -46,21 +31,24 @@ with c2:
     last_year_only = st.checkbox("Тільки останній рік у даних", value=False)
 with c3:
     use_rolling = st.checkbox("Показати 7-денне згладжування", value=True)
-# --- фільтрація
-view = facts.loc[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+with c4:
+    granularity = st.radio("Деталізація тренду", ["День", "Година"], horizontal=True)
+# --- фільтрація (по рядках куба, а не по замовленнях)
+view = rollup_period(cube, d1, d2)
 if last_year_only and not view.empty:
-    last_year = pd.to_datetime(view["purchase_dt"]).dt.year.max()
-    view = view[pd.to_datetime(view["purchase_dt"]).dt.year.eq(last_year)].copy()
+    years = pd.to_datetime(view["purchase_date"]).dt.year
+    view = view[years.eq(years.max())]
 
 if view.empty:
     st.info("Немає даних у вибраному періоді.")
     st.stop()
 
 # --- KPI (Orders, Revenue, AOV, On-time)
-orders_cnt = len(view)
-revenue = float(view["gross_revenue"].sum())
+tot = rollup_summary(view).iloc[0]
+orders_cnt = int(tot["orders"])
+revenue = float(tot["revenue"])
 aov = revenue / orders_cnt if orders_cnt else 0.0
-on_time_rate = view["on_time"].mean() if view["on_time"].notna().any() else np.nan
+on_time_rate = tot["on_time"]
 # --- вивід KPI
 k1, k2, k3, k4 = st.columns(4)
 k1.metric("Замовлення", f"{orders_cnt:,}")
@@ -68,40 +56,66 @@ k2.metric("Виручка", f"${revenue:,.0f}")
 k3.metric("Сер. чек (AOV)", f"${aov:,.2f}")
 k4.metric("On-time доставка", f"{on_time_rate*100:,.1f}%" if pd.notnull(on_time_rate) else "—")
 
-# --- Денний тренд: Orders (bar) + Revenue (line) + MA7 (пунктир) 
-by_day = (view.groupby("purchase_date", as_index=False)
-          .agg(orders=("order_id","count"),
-               revenue=("gross_revenue","sum")))
-if use_rolling and len(by_day) >= 7:
-    by_day["orders_ma7"] = by_day["orders"].rolling(7).mean()
-    by_day["revenue_ma7"] = by_day["revenue"].rolling(7).mean()
+# --- Тренд: Orders (bar) + Revenue (line) + MA7 (пунктир), по днях або по годинах
+if granularity == "День":
+    by_day = rollup_summary(view, "purchase_date")[["purchase_date", "orders", "revenue"]]
+    ma_window = 7
+else:
+    # по годинах: дата + година → мітка часу; години без замовлень — нулі (щоб MA7 = 7 × 24 годин)
+    by_day = rollup_summary(view, ["purchase_date", "hour"])
+    by_day["purchase_date"] = pd.to_datetime(by_day["purchase_date"]) + pd.to_timedelta(by_day["hour"], unit="h")
+    full = pd.date_range(by_day["purchase_date"].min(), by_day["purchase_date"].max(), freq="h")
+    by_day = (by_day.set_index("purchase_date")[["orders", "revenue"]]
+              .reindex(full, fill_value=0).rename_axis("purchase_date").reset_index())
+    ma_window = 7 * 24
+if use_rolling and len(by_day) >= ma_window:
+    by_day["orders_ma7"] = by_day["orders"].rolling(ma_window).mean()
+    by_day["revenue_ma7"] = by_day["revenue"].rolling(ma_window).mean()
+
+# довгий ряд (роки по днях, години) проріджуємо до ~ширини графіка в пікселях (src/charts.py):
+# стовпці — min/max по кошиках (піки не губляться), лінії — LTTB; повзунок «Масштаб» звужує
+# видимий діапазон, і проріджування рахується заново вже для нього — деталей стає більше
+n_points = len(by_day)
+if n_points > CHART_MAX_POINTS:
+    x_min, x_max = by_day["purchase_date"].min().to_pydatetime(), by_day["purchase_date"].max().to_pydatetime()
+    z1, z2 = st.slider("Масштаб графіка", min_value=x_min, max_value=x_max, value=(x_min, x_max),
+                       format="YYYY-MM-DD HH:mm" if granularity == "Година" else "YYYY-MM-DD")
+    by_day = zoom(by_day, "purchase_date", z1, z2)
+orders_pts = downsample(by_day, "purchase_date", "orders", method="minmax")
+
 # --- Комбінований графік з двома осями Y
 fig = make_subplots(specs=[[{"secondary_y": True}]])
-fig.add_trace(go.Bar(x=by_day["purchase_date"], y=by_day["orders"], name="Замовлення"),
+fig.add_trace(go.Bar(x=orders_pts["purchase_date"], y=orders_pts["orders"], name="Замовлення"),
               secondary_y=False)
-fig.add_trace(go.Scatter(x=by_day["purchase_date"], y=by_day["revenue"],
+revenue_pts = downsample(by_day, "purchase_date", "revenue")
+fig.add_trace(go.Scatter(x=revenue_pts["purchase_date"], y=revenue_pts["revenue"],
                          name="Виручка", mode="lines"),
               secondary_y=True)
 if use_rolling and "orders_ma7" in by_day:
-    fig.add_trace(go.Scatter(x=by_day["purchase_date"], y=by_day["orders_ma7"],
+    pts = downsample(by_day, "purchase_date", "orders_ma7")
+    fig.add_trace(go.Scatter(x=pts["purchase_date"], y=pts["orders_ma7"],
                              name="Замовлення • MA7", mode="lines",
                              line=dict(dash="dot")), secondary_y=False)
 if use_rolling and "revenue_ma7" in by_day:
-    fig.add_trace(go.Scatter(x=by_day["purchase_date"], y=by_day["revenue_ma7"],
+    pts = downsample(by_day, "purchase_date", "revenue_ma7")
+    fig.add_trace(go.Scatter(x=pts["purchase_date"], y=pts["revenue_ma7"],
                              name="Виручка • MA7", mode="lines",
                              line=dict(dash="dot")), secondary_y=True)
-fig.update_layout(title_text="Денні тренди: замовлення (стовпці) та виручка (лінія)",
+title = "Денні тренди" if granularity == "День" else "Погодинні тренди"
+fig.update_layout(title_text=f"{title}: замовлення (стовпці) та виручка (лінія)",
                   margin=dict(t=60, b=40))
 fig.update_xaxes(title_text="Дата")
 fig.update_yaxes(title_text="Замовлення", secondary_y=False)
 fig.update_yaxes(title_text="Виручка, $", secondary_y=True)
 st.plotly_chart(fig, use_container_width=True)
+if n_points > CHART_MAX_POINTS:
+    st.caption(f"Показано ≤ {CHART_MAX_POINTS:,} точок на лінію з {len(by_day):,} у видимому діапазоні "
+               f"(всього {n_points:,}). Звузь «Масштаб», щоб побачити деталі.")
 
 # --- Місячні підсумки: Revenue / Orders / AOV 
-by_month = (view.groupby("ym", as_index=False)
-            .agg(orders=("order_id","count"),
-                 revenue=("gross_revenue","sum")))
-by_month["AOV"] = by_month["revenue"] / by_month["orders"]
+by_month = rollup_summary(
+    view.assign(ym=pd.to_datetime(view["purchase_date"]).dt.to_period("M").astype(str)), "ym"
+)[["ym", "orders", "revenue", "AOV"]]
 # --- Два графіки в ряд
 c1, c2 = st.columns(2)
 with c1:
@@ -117,9 +131,9 @@ with c2:
     st.plotly_chart(fig_aov, use_container_width=True)
 
 # --- Теплова мапа: день тижня × година (активність) 
-view["dow"] = pd.to_datetime(view["purchase_dt"]).dt.day_name()
-view["hour"] = pd.to_datetime(view["purchase_dt"]).dt.hour
-heat = (view.groupby(["dow","hour"]).size().reset_index(name="orders"))
+with span("groupby dow × hour"):
+    heat = (view.assign(dow=pd.to_datetime(view["purchase_date"]).dt.day_name())
+            .groupby(["dow","hour"], as_index=False)["orders"].sum())
 # класичний порядок днів тижня 
 dow_order = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
 heat["dow"] = pd.Categorical(heat["dow"], categories=dow_order, ordered=True)
@@ -133,3 +147,5 @@ heatmap.update_layout(xaxis_title="Година", yaxis_title="День тижн
 st.plotly_chart(heatmap, use_container_width=True)
 
 st.caption("Порада: використовуйте пікові години для промо; стежте за AOV і on-time під час піків.")
+
+finish_page(prof)
@@ -3,48 +3,34 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 
-from src.data import get_facts
+from src.data import load_rollup, rollup_period, rollup_summary, DATA_DIR
+from src.profiling import page_profile, finish_page, span
 
 st.set_page_config(page_title="Payments — Olist BI", layout="wide")
 st.title("💳 Payments — структура оплат та їх вплив")
+prof = page_profile(__file__)
 
 
-@st.cache_data(show_spinner=False)
-def load_facts(data_dir: str, max_orders: int | None):
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховки на випадок кастомних даних
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    # заповнюємо критичні поля
-    if "payment_type" not in f.columns:
-        f["payment_type"] = "unknown"
-    if "installments" not in f.columns:
-        f["installments"] = 1
-    if "gross_revenue" in f.columns:
-        f["gross_revenue"] = pd.to_numeric(f["gross_revenue"], errors="coerce").fillna(0.0)
-    else:
-        f["gross_revenue"] = 0.0
-    return f
-
-facts = load_facts("data", st.session_state.get("max_orders"))
-
-if facts.empty:
+# rollup-куб (день × тип оплати × розстрочка × ...): уся сторінка — суми по ньому
+cube = load_rollup(DATA_DIR, st.session_state.get("max_orders"))
+
+if cube.empty:
     st.info("Дані не знайдені. Зайди на титулку та перевір джерело/ліміт.")
     st.stop()
 
 # --- Фільтри періоду
-min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
+min_d, max_d = cube["purchase_date"].min(), cube["purchase_date"].max()
 d1, d2 = st.date_input("Період аналізу", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-view = facts.loc[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+view = rollup_period(cube, d1, d2)
 
 if view.empty:
     st.info("Немає даних у вибраному періоді.")
     st.stop()
 
 # --- KPI
-orders_cnt = len(view)
-revenue = float(view["gross_revenue"].sum())
+tot = rollup_summary(view).iloc[0]
+orders_cnt = int(tot["orders"])
+revenue = float(tot["revenue"])
 aov = revenue / orders_cnt if orders_cnt else 0.0
 
 k1, k2, k3 = st.columns(3)
@@ -55,13 +41,18 @@ k3.metric("Сер. чек (AOV)", f"${aov:,.2f}")
 # --- Аналіз типів оплат
 st.markdown("#### 1) Тип оплати → внесок у виручку та чек")
 
-pt = (view
-      .groupby("payment_type", dropna=False)
-      .agg(orders=("order_id", "count"),
-           revenue=("gross_revenue", "sum"),
-           installments_avg=("installments", "mean"),
-           installments_max=("installments", "max"))
-      .reset_index())
+# середня к-сть платежів = Σ(installments × orders) / Σ orders; максимум — серед непорожніх комбінацій
+with span("groupby payment_type"):
+    pt = (view
+          .assign(installments_sum=view["installments"] * view["orders"])
+          .groupby("payment_type", dropna=False, observed=True)
+          .agg(orders=("orders", "sum"),
+               revenue=("revenue", "sum"),
+               installments_sum=("installments_sum", "sum"),
+               installments_max=("installments", "max"))
+          .reset_index())
+pt["installments_avg"] = pt["installments_sum"] / pt["orders"]
+pt = pt[["payment_type", "orders", "revenue", "installments_avg", "installments_max"]]
 
 if not pt.empty:
     # сортуємо за виручкою, щоб не скакало на графіку
@@ -107,12 +98,13 @@ if not pt.empty:
 
 st.markdown("#### 2) Розстрочки (installments) → скільки замовлень і який чек")
 
-inst = (view
-        .groupby("installments", dropna=False)
-        .agg(orders=("order_id", "count"),
-             revenue=("gross_revenue", "sum"))
-        .reset_index()
-        .sort_values("orders", ascending=False))
+with span("groupby installments"):
+    inst = (view
+            .groupby("installments", dropna=False)
+            .agg(orders=("orders", "sum"),
+                 revenue=("revenue", "sum"))
+            .reset_index()
+            .sort_values("orders", ascending=False))
 if not inst.empty:
     inst["AOV"] = inst["revenue"] / inst["orders"]
     inst["share_%"] = 100 * inst["orders"] / inst["orders"].sum()
@@ -150,3 +142,5 @@ if not inst.empty:
         st.plotly_chart(fig2, use_container_width=True)
 
 st.caption("Пояснення: installments — кількість платежів (1 = повна оплата, >1 = розстрочка). AOV = виручка / замовлення.")
+
+finish_page(prof)
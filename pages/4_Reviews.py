@@ -3,30 +3,17 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 
-from src.data import get_facts
+from src.data import load_facts, load_rollup, rollup_period, rollup_summary, slice_period, DATA_DIR
+from src.charts import box_stats, box_figure
+from src.profiling import page_profile, finish_page
 
 st.set_page_config(page_title="Reviews — Olist BI", layout="wide")
 st.title("⭐ Reviews — якість сервісу та вплив доставки")
+prof = page_profile(__file__)
 
-@st.cache_data(show_spinner=False)
-def load_facts(data_dir: str, max_orders: int | None):
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховки на випадок кастомних даних
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    # типи/заповнення
-    f["review_score"] = pd.to_numeric(f.get("review_score", np.nan), errors="coerce")
-    if "on_time" not in f.columns:
-        f["on_time"] = np.nan
-    for col in ["delivery_time_h", "delay_h"]:
-        if col in f.columns:
-            f[col] = pd.to_numeric(f[col], errors="coerce")
-        else:
-            f[col] = np.nan
-    return f
-
-facts = load_facts("data", st.session_state.get("max_orders"))
+facts = load_facts(DATA_DIR, st.session_state.get("max_orders"))
+# rollup-куб: розподіл оцінок і зв'язок з доставкою — суми по ньому; рядки потрібні лише для бокс-плоту
+cube = load_rollup(DATA_DIR, st.session_state.get("max_orders"))
 
 if facts.empty:
     st.info("Дані не знайдені. Зайди на титулку та перевір джерело/ліміт.")
@@ -35,16 +22,19 @@ if facts.empty:
 # --- Фільтри періоду 
 min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
 d1, d2 = st.date_input("Період аналізу", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-view = facts.loc[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+view = slice_period(facts, d1, d2)
+cube_view = rollup_period(cube, d1, d2)
 
 if view.empty:
     st.info("Немає даних у вибраному періоді.")
     st.stop()
 
 # --- KPI 
-avg_score = view["review_score"].mean()
-on_time_rate = view["on_time"].mean() if view["on_time"].notna().any() else np.nan
-avg_delay = view["delay_h"].mean()
+tot = rollup_summary(cube_view).iloc[0]
+rated = cube_view[cube_view["review_score"].notna()]
+avg_score = (rated["review_score"] * rated["orders"]).sum() / rated["orders"].sum() if not rated.empty else np.nan
+on_time_rate = tot["on_time"]
+avg_delay = tot["delay_h"]
 
 k1, k2, k3 = st.columns(3)
 k1.metric("Середня оцінка", f"{avg_score:,.2f}" if pd.notnull(avg_score) else "—")
@@ -53,10 +43,8 @@ k3.metric("Сер. запізнення (год)", f"{avg_delay:,.1f}" if pd.not
 
 # --- 1) Розподіл оцінок (кількість та частка) 
 st.markdown("#### 1) Розподіл оцінок (кількість та частка)")
-dist = (view["review_score"]
-        .value_counts(dropna=False)
-        .sort_index()
-        .reset_index())
+by_score = rollup_summary(cube_view, "review_score")
+dist = by_score[["review_score", "orders"]].copy()
 dist.columns = ["score", "orders"]
 dist["share_%"] = 100 * dist["orders"] / dist["orders"].sum()
 # --- графіки + табличка 
@@ -78,15 +66,7 @@ st.dataframe(dist_disp, use_container_width=True)
 
 # --- 2) Доставка vs Оцінки (on-time та часи) 
 st.markdown("#### 2) Доставка vs Оцінки (on-time та часи)")
-by_score = (view
-            .groupby("review_score", dropna=False)
-            .agg(orders=("order_id", "count"),
-                 on_time=("on_time", "mean"),
-                 delivery_time_h=("delivery_time_h", "mean"),
-                 delay_h=("delay_h", "mean"))
-            .reset_index()
-            .sort_values("review_score"))
-
+by_score = by_score[["review_score", "orders", "on_time", "delivery_time_h", "delay_h"]].copy()
 by_score["on_time_%"] = (by_score["on_time"] * 100).round(1)
 # --- табличка 
 tbl = by_score[["review_score", "orders", "on_time_%", "delivery_time_h", "delay_h"]].copy()
@@ -105,11 +85,14 @@ fig2.update_layout(xaxis_title="Оцінка", yaxis_title="On-time, %", margin=
 st.plotly_chart(fig2, use_container_width=True)
 
 # бокс-плоти часу доставки по оцінках — показують розкид часів 
+# квартилі й «вуса» рахуються тут (src/charts.py), у браузер — 5 боксів по 7 чисел замість усіх рядків
 if view["delivery_time_h"].notna().any():
-    fig3 = px.box(view.dropna(subset=["delivery_time_h", "review_score"]),
-                  x="review_score", y="delivery_time_h",
-                  points=False, title="Розподіл часу доставки (год) за оцінками")
-    fig3.update_layout(xaxis_title="Оцінка", yaxis_title="Час доставки (год)", margin=dict(t=60, b=40))
+    stats = box_stats(view, "delivery_time_h", by="review_score")
+    fig3 = box_figure(stats, "review_score", title="Розподіл часу доставки (год) за оцінками",
+                      x_title="Оцінка", y_title="Час доставки (год)")
+    fig3.update_layout(margin=dict(t=60, b=40))
     st.plotly_chart(fig3, use_container_width=True)
 
 st.caption("Зазвичай нижчі оцінки корелюють з більшим часом доставки і нижчим on-time.")
+
+finish_page(prof)
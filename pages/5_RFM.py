@@ -3,98 +3,52 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 
-from src.data import get_facts
+from src.data import load_facts, slice_period, DATA_DIR
+from src.customers import customer_rfm, lifetime_orders
+from src.profiling import page_profile, finish_page, span
 
 st.set_page_config(page_title="RFM — Olist BI", layout="wide")
 st.title("👥 RFM — сегментація клієнтів")
+prof = page_profile(__file__)
 
-@st.cache_data(show_spinner=False)
-def load_facts(data_dir: str, max_orders: int | None):
-    
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховки на випадок кастомних даних
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    if "gross_revenue" in f.columns:
-        f["gross_revenue"] = pd.to_numeric(f["gross_revenue"], errors="coerce").fillna(0.0)
-    else:
-        f["gross_revenue"] = 0.0
-    # якщо немає customer_id — використовуємо order_id як сурогат (демо)
-    if "customer_id" not in f.columns or f["customer_id"].isna().all():
-        f["customer_id"] = f["order_id"]
-        st.warning("У facts відсутній або порожній customer_id — використовую order_id як сурогат для демо.")
-    return f
-
-facts = load_facts("data", st.session_state.get("max_orders"))
+facts = load_facts(DATA_DIR, st.session_state.get("max_orders"))
 
 if facts.empty:
     st.info("Дані не знайдені. Зайди на титулку та перевір джерело/ліміт.")
     st.stop()
+if facts.attrs.get("customer_id_surrogate"):
+    st.warning("У facts відсутній або порожній customer_id — використовую order_id як сурогат для демо.")
 
 # --- Фільтри періоду 
 min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
 d1, d2 = st.date_input("Період аналізу", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-view = facts.loc[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+view = slice_period(facts, d1, d2)
 
 if view.empty:
     st.info("Немає даних у вибраному періоді.")
     st.stop()
 
-# --- RFM-розрахунок (Recency, Frequency, Monetary)
-# snapshot — точка відліку для Recency (наступний день після останнього замовлення) 
-
-snapshot = pd.to_datetime(view.get("purchase_dt", view["order_purchase_timestamp"])).max() + pd.Timedelta(days=1)
-
-rfm = (view.groupby("customer_id").agg(
-    Recency=("purchase_dt" if "purchase_dt" in view.columns else "order_purchase_timestamp",
-             lambda s: (snapshot - pd.to_datetime(s).max()).days),
-    Frequency=("order_id", "count"),
-    Monetary=("gross_revenue", "sum"),
-).reset_index())
-
-def qscore(series: pd.Series, asc: bool) -> pd.Series:
-    """
-    Перетворюємо показник у квінтильний бал 1..5.
-    Використовую rank(), щоб зняти зв’язки; якщо розподіл «плоский» — повертаємо 3.
-    """
-    try:
-        lab = [5,4,3,2,1] if asc else [1,2,3,4,5]
-        q = pd.qcut(series.rank(method="first"), 5, labels=lab)
-        return q.astype(int)
-    except Exception:
-        return pd.Series([3] * len(series), index=series.index)
-
-rfm["R"] = qscore(rfm["Recency"], asc=True)     # менше днів — кращий бал (5)
-rfm["F"] = qscore(rfm["Frequency"], asc=False)  # більше частота — кращий бал (5)
-rfm["M"] = qscore(rfm["Monetary"], asc=False)   # більше витрати — кращий бал (5)
-rfm["RFM"] = rfm["R"] + rfm["F"] + rfm["M"]
-# --- Сегментація (демо-логіка) 
-def segment(row) -> str:
-    """Проста, зрозуміла рубрикація сегментів (демо-логіка)."""
-    r, f, m = row["R"], row["F"], row["M"]
-    if r >= 4 and f >= 4 and m >= 4:  return "Champions"
-    if r >= 4 and f >= 3:             return "Loyal"
-    if r <= 2 and f >= 3:             return "At Risk"
-    if r <= 2 and f <= 2 and m <= 2:  return "Hibernating"
-    if r >= 4 and f <= 2:             return "New"
-    return "Others"
-
-rfm["Segment"] = rfm.apply(segment, axis=1)
+# --- RFM-розрахунок (Recency, Frequency, Monetary) по customer_unique_id — src/rfm.py, без Python-циклів:
+# groupby max/count/sum → квінтильні бали 1..5 через ранги → сегмент з таблиці на 125 комбінацій (R,F,M)
+# snapshot — точка відліку для Recency (наступний день після останнього замовлення)
+# агрегати клієнт × місяць (src/customers.py) зберігаються на диску: повні місяці періоду — з них,
+# по рядках рахуються лише два крайні місяці
+rfm = customer_rfm(view, DATA_DIR)
 
 # --- KPI (к-сть клієнтів, замовлень, виручка)
 k1, k2, k3 = st.columns(3)
-k1.metric("Клієнтів", f"{rfm['customer_id'].nunique():,}")
+k1.metric("Клієнтів", f"{len(rfm):,}")
 k2.metric("Замовлень (сума F)", f"{int(rfm['Frequency'].sum()):,}")
 k3.metric("Сумарна виручка (Monetary)", f"${rfm['Monetary'].sum():,.0f}")
 
 # --- Підсумки по сегментах 
-seg = (rfm.groupby("Segment", as_index=False)
-       .agg(customers=("customer_id", "nunique"),
-            orders=("Frequency", "sum"),
-            monetary=("Monetary", "sum"),
-            avg_monetary=("Monetary", "mean"))
-       .sort_values("monetary", ascending=False))
+with span("groupby Segment"):
+    seg = (rfm.groupby("Segment", as_index=False, observed=True)
+           .agg(customers=("customer_unique_id", "size"),
+                orders=("Frequency", "sum"),
+                monetary=("Monetary", "sum"),
+                avg_monetary=("Monetary", "mean"))
+           .sort_values("monetary", ascending=False))
 seg["share_customers_%"] = 100 * seg["customers"] / seg["customers"].sum()
 
 st.markdown("#### Розподіл сегментів та внесок у виручку")
@@ -124,12 +78,17 @@ with c2:
 # --- ТОП клієнти за цінністю 
 st.markdown("#### ТОП-клієнти за цінністю")
 top = rfm.sort_values(["Monetary", "Frequency"], ascending=False).head(50).copy()
-top_disp = top[["customer_id", "Recency", "Frequency", "Monetary", "RFM", "Segment"]].rename(
-    columns={"customer_id": "Клієнт", "Recency": "Recency (днів)", "Frequency": "Frequency (замовл.)",
-             "Monetary": "Monetary ($)", "RFM": "RFM сума", "Segment": "Сегмент"}
+# скільки замовлень у клієнта за весь час (з місячних агрегатів, не лише в періоді)
+top["lifetime_orders"] = lifetime_orders(top["customer_unique_id"], DATA_DIR).to_numpy()
+top_disp = top[["customer_unique_id", "Recency", "Frequency", "Monetary", "RFM", "Segment", "lifetime_orders"]].rename(
+    columns={"customer_unique_id": "Клієнт", "Recency": "Recency (днів)", "Frequency": "Frequency (замовл.)",
+             "Monetary": "Monetary ($)", "RFM": "RFM сума", "Segment": "Сегмент",
+             "lifetime_orders": "Замовлень за весь час"}
 )
 top_disp["Monetary ($)"] = top_disp["Monetary ($)"].map(lambda x: f"${x:,.2f}")
 st.dataframe(top_disp, use_container_width=True)
 
 st.caption("RFM: Recency — давність останньої покупки (менше — краще), Frequency — частота, Monetary — загальна грошова цінність.")
- 
\ No newline at end of file
+ 
+
+finish_page(prof)
@@ -2,48 +2,32 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 
-from src.data import get_facts
+from src.data import load_facts, slice_period, DATA_DIR
+from src.customers import window_customers
+from src.profiling import page_profile, finish_page
 
 st.set_page_config(page_title="ROI — Olist BI", layout="wide")
 st.title("💵 ROI / Unit Economics")
+prof = page_profile(__file__)
 st.markdown(
     "> Навіщо: порахувати гроші від покращень.\n"
     "> Що дивимось: 3 сценарії — менше запізнень (SLA), win-back «at risk», cross-sell.\n"
     "> Як використати: підставляю параметри й бачу очікуваний ефект у грошах (груба, але корисна оцінка)."
 )
 
-@st.cache_data(show_spinner=False)
-def load_facts(data_dir: str, max_orders: int | None):
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховки (щоб сторінка не падала на кастомних наборах)
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    # числові поля
-    for col in ["gross_revenue", "delivery_time_h", "delay_h"]:
-        if col in f.columns:
-            f[col] = pd.to_numeric(f[col], errors="coerce").fillna(0.0)
-        else:
-            f[col] = 0.0
-    if "on_time" not in f.columns:
-        f["on_time"] = np.nan
-    # customer_id (для win-back); якщо його нема — сурогат (демо) 
-    if "customer_id" not in f.columns or f["customer_id"].isna().all():
-        f["customer_id"] = f["order_id"]
-        st.warning("У facts відсутній/порожній customer_id — використовую order_id як сурогат (демо).")
-    return f
-
-facts = load_facts("data", st.session_state.get("max_orders"))
+facts = load_facts(DATA_DIR, st.session_state.get("max_orders"))
 if facts.empty:
     st.info("Дані не знайдені. Зайди на титулку та перевір джерело/ліміт.")
     st.stop()
+if facts.attrs.get("customer_id_surrogate"):
+    st.warning("У facts відсутній/порожній customer_id — використовую order_id як сурогат (демо).")
 
 # -----------------------------
 # Фільтр періоду 
 # -----------------------------
 min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
 d1, d2 = st.date_input("Період аналізу", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-base = facts[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+base = slice_period(facts, d1, d2)
 
 if base.empty:
     st.info("Немає даних у вибраному періоді.")
@@ -114,8 +98,8 @@ st.divider()
 # -----------------------------
 st.subheader("2) Win-back клієнтів «At risk»")
 
-# частота замовлень на клієнта
-freq = base.groupby("customer_id")["order_id"].count().rename("orders_per_cust")
+# частота замовлень на клієнта (customer_unique_id; повні місяці — з місячних агрегатів клієнтів)
+freq = window_customers(base, DATA_DIR)["orders"].rename("orders_per_cust")
 if not freq.empty:
     q1 = freq.quantile(0.25)
     at_risk = freq[freq <= q1]
@@ -157,4 +141,6 @@ st.success(f"Сумарний очікуваний прибуток: **≈ ${tot
 st.caption(
     "Це приблизні оцінки для демонстрації ефекту. Для точності можна додати витрати на ініціативи, "
     "деталізувати RFM, і зробити аналіз чутливості (sensitivity)."
-)
\ No newline at end of file
+)
+
+finish_page(prof)
@@ -1,92 +1,31 @@
-import os
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
 
-from src.data import get_facts
+from src.data import load_facts, slice_period, DATA_DIR
+from src.features import seller_states
+from src.geo import state_sla
+from src.profiling import page_profile, finish_page
 
 st.set_page_config(page_title="Geo-SLA — Olist BI", layout="wide")
 st.title("🌎 Geo-SLA — доставка за штатами Бразилії (on-time %, затримки)")
+prof = page_profile(__file__)
 
-DATA_DIR = "data"
-
-# Координати столиць штатів Бразилії (приблизні)
-BR_STATE_CENTERS = {
-    "AC": (-9.975, -67.824), "AL": (-9.649, -35.708), "AP": (0.035, -51.070),
-    "AM": (-3.118, -60.021), "BA": (-12.971, -38.501), "CE": (-3.732, -38.526),
-    "DF": (-15.793, -47.882), "ES": (-20.315, -40.312), "GO": (-16.686, -49.264),
-    "MA": (-2.530, -44.306), "MT": (-15.601, -56.097), "MS": (-20.469, -54.620),
-    "MG": (-19.916, -43.934), "PA": (-1.456, -48.503), "PB": (-7.115, -34.861),
-    "PR": (-25.428, -49.273), "PE": (-8.047, -34.877), "PI": (-5.094, -42.804),
-    "RJ": (-22.906, -43.172), "RN": (-5.794, -35.199), "RS": (-30.034, -51.230),
-    "RO": (-8.761, -63.903), "RR": (2.823, -60.675), "SC": (-27.595, -48.548),
-    "SP": (-23.550, -46.633), "SE": (-10.911, -37.071), "TO": (-10.184, -48.333)
-}
-
-# -----------------------------
-# Завантаження фактів (кеш)
-# -----------------------------
-@st.cache_data(show_spinner=False)
-def _safe_read_csv(path: str, usecols=None):
-    if not os.path.exists(path):
-        return pd.DataFrame()
-    try:
-        return pd.read_csv(path, usecols=usecols, encoding="utf-8", low_memory=False)
-    except Exception:
-        return pd.read_csv(path, usecols=usecols, encoding="latin1", low_memory=False)
-# --- мапа order_id → seller_state (опційно)
-@st.cache_data(show_spinner=False)
-def _order_to_seller_state(data_dir: str) -> pd.DataFrame:
-
-    items = _safe_read_csv(os.path.join(data_dir, "olist_order_items_dataset.csv"),
-                           usecols=["order_id", "seller_id"])
-    sellers = _safe_read_csv(os.path.join(data_dir, "olist_sellers_dataset.csv"),
-                             usecols=["seller_id", "seller_state"])
-    if items.empty or sellers.empty:
-        return pd.DataFrame(columns=["order_id", "seller_state"])
-    m = items.merge(sellers, on="seller_id", how="left")
-    m = (m.groupby("order_id", as_index=False)
-           .agg(seller_state=("seller_state", "first")))
-    return m
-
-# --- завантаження фактів з додатковими колонками
-@st.cache_data(show_spinner=False)
-def load_facts_for_geo(data_dir: str, max_orders: int | None) -> pd.DataFrame:
-    f = get_facts(data_dir, max_orders=max_orders).copy()
-    # страховки/типи
-    if "purchase_date" not in f.columns:
-        ts = pd.to_datetime(f["order_purchase_timestamp"], errors="coerce")
-        f["purchase_date"] = ts.dt.date
-    for col in ["on_time", "delivery_time_h", "delay_h"]:
-        if col not in f.columns:
-            f[col] = np.nan
-        else:
-            f[col] = pd.to_numeric(f[col], errors="coerce")
-    if "customer_state" not in f.columns:
-        f["customer_state"] = "NA"
-    # дні з годин (для наочності)
-    f["delivery_days"] = f["delivery_time_h"] / 24.0
-    f["delay_days"] = f["delay_h"] / 24.0
-    return f
-
-facts = load_facts_for_geo(DATA_DIR, st.session_state.get("max_orders"))
+# --- завантаження фактів (спільна таблиця — лише читаємо)
+max_orders = st.session_state.get("max_orders")
+facts = load_facts(DATA_DIR, max_orders)
 
 if facts.empty:
     st.warning("Дані не знайдені. Перевір, чи є CSV у `data/` або налаштований Release на титулці.")
     st.stop()
 
-# Опційне збагачення seller_state (через order_items + sellers)
-seller_map = _order_to_seller_state(DATA_DIR)
-if not seller_map.empty:
-    facts = facts.merge(seller_map, on="order_id", how="left")
-
 # -----------------------------
 # Фільтр періоду (дата покупки)
 # -----------------------------
 min_d, max_d = facts["purchase_date"].min(), facts["purchase_date"].max()
 d1, d2 = st.date_input("Період", value=(min_d, max_d), min_value=min_d, max_value=max_d)
-view = facts[(facts["purchase_date"] >= d1) & (facts["purchase_date"] <= d2)].copy()
+view = slice_period(facts, d1, d2)
 
 if view.empty:
     st.info("Немає даних у вибраному періоді.")
@@ -96,29 +35,24 @@ if view.empty:
 # Вибір поля агрегації (customer_state / seller_state) 
 # -----------------------------
 opt = st.selectbox("Агрегувати за:", ["customer_state", "(опційно) seller_state"], index=0)
-if opt.startswith("(") or "seller_state" not in view.columns or view["seller_state"].isna().all():
-    if opt.startswith("("):
+group_col = "customer_state"
+if opt.startswith("("):
+    # seller_state (через order_items + sellers): найчастіший штат продавця в замовленні,
+    # лише для замовлень вибірки; мапимо на зріз періоду — без merge і копії всієї таблиці
+    seller_map = seller_states(DATA_DIR, max_orders)
+    if seller_map.empty:
         st.info("За замовчуванням використовується customer_state. "
                 "Щоб увімкнути seller_state, додайте `olist_order_items_dataset.csv` і `olist_sellers_dataset.csv` у `data/`.")
-    group_col = "customer_state"
-else:
-    group_col = "seller_state"
+    else:
+        view = view.copy(deep=False)
+        view["seller_state"] = view["order_id"].map(seller_map)
+        group_col = "seller_state"
 
 # -----------------------------
 # Агрегація по штатах 
 # -----------------------------
-agg = (view.groupby(group_col, dropna=False)
-       .agg(orders=("order_id", "count"),
-            on_time_rate=("on_time", "mean"),
-            avg_delivery_days=("delivery_days", "mean"),
-            avg_delay_days=("delay_days", "mean"))
-       .reset_index()
-       .rename(columns={group_col: "state"}))
-
-# Координати для карти 
-agg["lat"] = agg["state"].map(lambda s: BR_STATE_CENTERS.get(s, (None, None))[0])
-agg["lon"] = agg["state"].map(lambda s: BR_STATE_CENTERS.get(s, (None, None))[1])
-agg = agg.dropna(subset=["lat", "lon"])
+# дні замість годин і координати для карти — src/geo.py (state_sla)
+agg = state_sla(view, group_col)
 
 if agg.empty:
     st.info("Немає геокодованих штатів для відображення.")
@@ -171,3 +105,5 @@ st.info(
     "Як читати: червоні точки — проблемні штати з низьким on-time%. "
     "Починай покращення з них (логістика, партнерські служби, SLA)."
 )
+
+finish_page(prof)
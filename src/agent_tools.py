@@ -0,0 +1,79 @@
+# src/agent_tools.py
+# інструменти AI-агента (сторінка pages/0_AI_Agent.py): KPI, тренд, оплати, відгуки, RFM, ROI
+# без streamlit — щоб сторінка лише малювала, а бенч (bench/suite.py) міряв ці ж функції напряму.
+# SQL-інструмент — src/sql_session.py.
+from __future__ import annotations
+import pandas as pd
+
+from src.data import DATA_DIR
+from src.customers import customer_rfm
+from src.profiling import profiled
+
+
+@profiled()
+def tool_kpis(df: pd.DataFrame) -> dict:
+    """Базові KPI: к-сть, виручка, AOV, on-time%."""
+    n = len(df)
+    rev = float(df["gross_revenue"].sum()) if "gross_revenue" in df else 0.0
+    aov = rev / n if n else 0.0
+    on_time = float(df["on_time"].mean()) if "on_time" in df and df["on_time"].notna().any() else None
+    return {"orders": n, "revenue": rev, "aov": aov, "on_time_rate": on_time}
+
+
+@profiled()
+def tool_trend(df: pd.DataFrame, rolling_days: int = 7) -> pd.DataFrame:
+    """Тренд по днях + ковзна середня."""
+    by_day = df.groupby("purchase_date", as_index=False).agg(
+        orders=("order_id","count"),
+        revenue=("gross_revenue","sum")
+    )
+    if rolling_days and len(by_day) >= rolling_days:
+        by_day["orders_ma"] = by_day["orders"].rolling(rolling_days).mean()
+        by_day["revenue_ma"] = by_day["revenue"].rolling(rolling_days).mean()
+    return by_day
+
+
+@profiled()
+def tool_payments_breakdown(df: pd.DataFrame) -> pd.DataFrame:
+    """Розклад по оплатах: частки, виручка, AOV."""
+    if "payment_type" not in df.columns:
+        return pd.DataFrame()
+    g = (df.groupby("payment_type", dropna=False)
+           .agg(orders=("order_id","count"), revenue=("gross_revenue","sum"))
+           .reset_index().sort_values("revenue", ascending=False))
+    g["AOV"] = g["revenue"] / g["orders"]
+    g["share_%"] = 100 * g["orders"] / g["orders"].sum()
+    return g
+
+
+@profiled()
+def tool_reviews_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Залежність оцінок від SLA."""
+    if "review_score" not in df.columns:
+        return pd.DataFrame()
+    g = (df.groupby("review_score", dropna=False)
+           .agg(orders=("order_id","count"),
+                on_time=("on_time","mean"),
+                delivery_time_h=("delivery_time_h","mean"),
+                delay_h=("delay_h","mean"))
+           .reset_index().sort_values("review_score"))
+    return g
+
+
+@profiled()
+def tool_rfm(df: pd.DataFrame, data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """RFM по customer_unique_id (якщо нема customer_id — сурогат order_id, див. apply_schema_defaults)."""
+    # квінтильні бали через ранги + сегменти — src/rfm.py; агрегати клієнтів — src/customers.py
+    return customer_rfm(df, data_dir)
+
+
+@profiled()
+def tool_roi_reduce_late(df: pd.DataFrame, reduce_pp: float, margin_pct: float, pickpack_cost: float) -> dict:
+    """Оцінка ефекту від скорочення частки 'late' на reduce_pp п.п."""
+    if "on_time" not in df.columns or df["on_time"].isna().all():
+        return {"note": "on_time недоступний у вибірці"}
+    late = df[df["on_time"] == False]
+    late_rev = float(late["gross_revenue"].sum())
+    recaptured_rev = late_rev * (reduce_pp / 100.0)
+    profit = recaptured_rev * (margin_pct / 100.0)
+    return {"recaptured_revenue": recaptured_rev, "profit": profit}
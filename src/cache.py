@@ -0,0 +1,187 @@
+# src/cache.py
+# спільний бюджет пам'яті для кешів процесу: facts, rollup-куби, ознаки, вимір клієнтів, моделі, SQL-сесії.
+# Кожен запис знає свій розмір у байтах; коли сума більша за CACHE_BUDGET_MB, витісняємо
+# найдавніше вживані записи (LRU) з будь-якого сховища — а не лише з того, куди щойно писали.
+#   OLIST_CACHE_MB=2048 streamlit run streamlit_app.py      # 0 — без ліміту
+# Витіснення лише відпускає посилання кешу: зріз, який сторінка вже отримала, живе до кінця її rerun.
+from __future__ import annotations
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CACHE_BUDGET_MB = float(os.environ.get("OLIST_CACHE_MB", "1024"))
+
+# --- лічильники: назва сховища → [влучання, промахи, витіснення]
+# Рахують сховища на ArtifactCache нижче і count_cache() там, де кеш свій (SQL-сесія);
+# читає bench/bench_pages.py (частка влучань на rerun сторінки) і титулка (таблиця кешів).
+_CACHE_STATS: dict[str, list[int]] = {}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(name: str, slot: int) -> None:
+    with _STATS_LOCK:
+        _CACHE_STATS.setdefault(name, [0, 0, 0])[slot] += 1
+
+
+def count_cache(name: str, hit: bool) -> None:
+    _count(name, 0 if hit else 1)
+
+
+def cache_stats() -> dict[str, dict]:
+    """{сховище: {hits, misses, evictions}} з моменту старту процесу (або reset_cache_stats)."""
+    with _STATS_LOCK:
+        return {name: {"hits": h, "misses": m, "evictions": e} for name, (h, m, e) in _CACHE_STATS.items()}
+
+
+def reset_cache_stats() -> None:
+    with _STATS_LOCK:
+        _CACHE_STATS.clear()
+
+
+# --- розмір запису
+def nbytes(obj, _depth: int = 0) -> int:
+    """Оцінка пам'яті об'єкта в байтах.
+
+    DataFrame/Series — memory_usage(deep=True) (з рядками), масиви — nbytes, кортежі/словники — сума
+    елементів, інші об'єкти (моделі sklearn) — сума їхніх атрибутів на кілька рівнів углиб.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if _depth > 4:
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(nbytes(v, _depth + 1) for v in obj.values())
+    if isinstance(obj, (tuple, list)):
+        return sys.getsizeof(obj) + sum(nbytes(v, _depth + 1) for v in obj)
+    if hasattr(obj, "__dict__") and not isinstance(obj, type):
+        return sys.getsizeof(obj) + nbytes(vars(obj), _depth + 1)
+    return sys.getsizeof(obj)
+
+
+def _release(items: list) -> None:
+    for value, _, on_evict in items:
+        if on_evict is not None:
+            on_evict(value)
+
+
+class ArtifactCache:
+    """Один LRU на весь процес: ключ (сховище, ключ) → (значення, байти, on_evict).
+
+    get(store, key, valid) — влучання лише якщо запис є і valid(значення) (версія датасету, ліміт тощо);
+    put(...) — додає запис і витісняє найдавніше вживані, доки сума не вкладеться в бюджет.
+    Щойно доданий запис не витісняється ніколи: навіть більший за бюджет він лишається (інакше кожен
+    rerun будував би його заново), а бюджет звільняється за рахунок решти.
+    on_evict(значення) — що зробити із записом, який пішов з кешу (витіснення, заміна, discard/clear),
+    напр. закрити DuckDB-сесію; викликається вже поза замком кешу.
+    """
+
+    def __init__(self, budget_mb: float = CACHE_BUDGET_MB):
+        self.budget = int(budget_mb * 2**20) if budget_mb and budget_mb > 0 else None
+        self._items: OrderedDict[tuple, tuple[object, int, object]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+    def get(self, store: str, key, valid=None, count: bool = True):
+        """Значення або None (промах). Влучання переносить запис у «свіжий» кінець LRU."""
+        with self._lock:
+            item = self._items.get((store, key))
+            if item is not None and (valid is None or valid(item[0])):
+                self._items.move_to_end((store, key))
+                if count:
+                    _count(store, 0)
+                return item[0]
+        if count:
+            _count(store, 1)
+        return None
+
+    def peek(self, store: str, key):
+        """Значення без підрахунку й без зміни порядку LRU (звіти, діагностика)."""
+        with self._lock:
+            item = self._items.get((store, key))
+        return None if item is None else item[0]
+
+    def put(self, store: str, key, value, size: int | None = None, on_evict=None):
+        size = nbytes(value) if size is None else int(size)
+        gone = []
+        with self._lock:
+            old = self._items.pop((store, key), None)
+            if old is not None:
+                self.bytes -= old[1]
+                if old[0] is not value:
+                    gone.append(old)
+            self._items[(store, key)] = (value, size, on_evict)
+            self.bytes += size
+            if self.budget is not None:
+                while self.bytes > self.budget and len(self._items) > 1:
+                    (ev_store, _), item = self._items.popitem(last=False)
+                    self.bytes -= item[1]
+                    _count(ev_store, 2)
+                    gone.append(item)
+        _release(gone)
+        return value
+
+    def resize(self, store: str, key, value, size: int) -> bool:
+        """Новий розмір запису, що росте на місці (напр. кеш результатів SQL-сесії) + витіснення понад бюджет.
+
+        Лише якщо під ключем досі саме value: уже витіснений запис назад не повертається. Порядок LRU не міняє.
+        """
+        gone = []
+        with self._lock:
+            item = self._items.get((store, key))
+            if item is None or item[0] is not value:
+                return False
+            self._items[(store, key)] = (value, int(size), item[2])
+            self.bytes += int(size) - item[1]
+            if self.budget is not None:
+                for k in list(self._items):
+                    if self.bytes <= self.budget:
+                        break
+                    if k == (store, key):
+                        continue
+                    ev = self._items.pop(k)
+                    self.bytes -= ev[1]
+                    _count(k[0], 2)
+                    gone.append(ev)
+        _release(gone)
+        return True
+
+    def discard(self, store: str, pred) -> int:
+        """Прибирає записи сховища, для яких pred(ключ, значення) — напр. старі версії датасету."""
+        with self._lock:
+            keys = [k for k, item in self._items.items() if k[0] == store and pred(k[1], item[0])]
+            gone = [self._items.pop(k) for k in keys]
+            self.bytes -= sum(item[1] for item in gone)
+        _release(gone)
+        return len(gone)
+
+    def clear(self, store: str | None = None) -> None:
+        with self._lock:
+            keys = [k for k in self._items if store is None or k[0] == store]
+            gone = [self._items.pop(k) for k in keys]
+            self.bytes -= sum(item[1] for item in gone)
+        _release(gone)
+
+    def info(self) -> pd.DataFrame:
+        """По сховищах: записів, MB у кеші + влучання/промахи/витіснення (для титулки й бенчів)."""
+        with self._lock:
+            sizes: dict[str, list] = {}
+            for (store, _), (_, size, _) in self._items.items():
+                s = sizes.setdefault(store, [0, 0])
+                s[0] += 1
+                s[1] += size
+        stats = cache_stats()
+        rows = [{"store": name, "entries": sizes.get(name, [0, 0])[0], "MB": sizes.get(name, [0, 0])[1] / 2**20,
+                 **stats.get(name, {"hits": 0, "misses": 0, "evictions": 0})}
+                for name in sorted(set(sizes) | set(stats))]
+        return pd.DataFrame(rows, columns=["store", "entries", "MB", "hits", "misses", "evictions"])
+
+
+CACHE = ArtifactCache()
@@ -0,0 +1,146 @@
+# src/charts.py
+# графіки з підсумків, порахованих на сервері: у браузер їде кілька десятків чисел, а не всі рядки
+# гістограма = лічильники по кошиках (numpy), бокс-плот = квартилі й «вуса» по групах
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from src.profiling import profiled
+
+HIST_BINS = 40
+
+
+@profiled()
+def histogram_bins(values, nbins: int = HIST_BINS, value_range: tuple[float, float] | None = None) -> pd.DataFrame:
+    """Лічильники гістограми: left, right, count (nbins однакових кошиків; NaN/inf не рахуються)."""
+    v = np.asarray(values, dtype=np.float64)
+    v = v[np.isfinite(v)]
+    if v.size == 0:
+        return pd.DataFrame({"left": [], "right": [], "count": []})
+    counts, edges = np.histogram(v, bins=nbins, range=value_range)
+    return pd.DataFrame({"left": edges[:-1], "right": edges[1:], "count": counts})
+
+
+@profiled()
+def box_stats(df: pd.DataFrame, value_col: str, by: str) -> pd.DataFrame:
+    """Підсумки бокс-плоту по групах by: q1, median, q3, mean, n і «вуса» за Тьюкі.
+
+    Квартилі — лінійна інтерполяція (як quartilemethod="linear" у plotly). Вуса — крайні
+    значення в межах [q1 − 1.5·IQR, q3 + 1.5·IQR], тобто той самий бокс, що малює px.box.
+    """
+    d = df.loc[df[value_col].notna() & df[by].notna(), [by, value_col]]
+    if d.empty:
+        return pd.DataFrame(columns=[by, "q1", "median", "q3", "mean", "n", "lowerfence", "upperfence"])
+    g = d.groupby(by, observed=True, sort=True)[value_col]
+    out = pd.DataFrame({
+        "q1": g.quantile(0.25), "median": g.median(), "q3": g.quantile(0.75),
+        "mean": g.mean(), "n": g.size(),
+    })
+    iqr = out["q3"] - out["q1"]
+    lo = d[by].map(out["q1"] - 1.5 * iqr).astype(np.float64)
+    hi = d[by].map(out["q3"] + 1.5 * iqr).astype(np.float64)
+    inside = d[(d[value_col] >= lo) & (d[value_col] <= hi)].groupby(by, observed=True, sort=True)[value_col]
+    out["lowerfence"] = inside.min()
+    out["upperfence"] = inside.max()
+    return out.rename_axis(by).reset_index()
+
+
+@profiled()
+def histogram_figure(bins: pd.DataFrame, title: str = "", x_title: str = "", y_title: str = "") -> go.Figure:
+    """Гістограма з готових лічильників (стовпці впритул, ширина = ширина кошика)."""
+    fig = go.Figure(go.Bar(
+        x=(bins["left"] + bins["right"]) / 2, y=bins["count"], width=bins["right"] - bins["left"],
+        customdata=np.column_stack([bins["left"], bins["right"]]) if len(bins) else None,
+        hovertemplate="%{customdata[0]:,.1f} – %{customdata[1]:,.1f}<br>К-сть: %{y:,}<extra></extra>",
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, bargap=0)
+    return fig
+
+
+@profiled()
+def box_figure(stats: pd.DataFrame, by: str, title: str = "", x_title: str = "", y_title: str = "") -> go.Figure:
+    """Бокс-плот з готових квартилів (go.Box з q1/median/q3/fences — без сирих точок)."""
+    fig = go.Figure(go.Box(
+        x=stats[by], q1=stats["q1"], median=stats["median"], q3=stats["q3"], mean=stats["mean"],
+        lowerfence=stats["lowerfence"], upperfence=stats["upperfence"], boxpoints=False,
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title)
+    return fig
+
+
+def figure_payload_bytes(fig: go.Figure) -> int:
+    """Скільки байтів JSON фігури піде в браузер (те, що серіалізує st.plotly_chart)."""
+    return len(fig.to_json().encode("utf-8"))
+
+
+# --- проріджування довгих часових рядів: на лінію не більше max_points точок
+# LTTB (largest-triangle-three-buckets) зберігає форму лінії; min/max — піки й провали (для стовпців)
+CHART_MAX_POINTS = 1200  # ≈ ширина графіка в пікселях у wide-layout: більше точок екран однаково не покаже
+
+
+def _numeric_x(x: pd.Series) -> np.ndarray:
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.to_numpy("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return pd.to_numeric(x, errors="coerce").to_numpy(np.float64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Індекси n_out точок за LTTB: перша й остання + по одній з кожного з n_out − 2 кошиків.
+
+    З кошика беремо точку, що утворює найбільший трикутник з попередньою вибраною точкою
+    і середнім наступного кошика. Цикл — по кошиках (≤ n_out), всередині — numpy.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nhi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:nhi].mean(), y[hi:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Індекси мінімуму й максимуму в кожному з n_out / 2 кошиків (обгортка ряду) + перша й остання точки."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    edges = np.linspace(0, n, (n_out - 2) // 2 + 1).astype(np.int64)  # 2 точки на кошик + краї ≤ n_out
+    idx = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        idx += [lo + int(y[lo:hi].argmin()), lo + int(y[lo:hi].argmax())]
+    return np.unique(idx)
+
+
+@profiled()
+def downsample(df: pd.DataFrame, x: str, y: str, max_points: int = CHART_MAX_POINTS,
+               method: str = "lttb") -> pd.DataFrame:
+    """Рядки [x, y] для однієї лінії графіка: без NaN і не більше ≈ max_points (method: "lttb" або "minmax").
+
+    Ряд має бути відсортований за x. Короткі ряди повертаються як є.
+    """
+    d = df.loc[df[y].notna(), [x, y]]
+    if len(d) <= max_points:
+        return d
+    yv = d[y].to_numpy(np.float64)
+    idx = (lttb_indices(_numeric_x(d[x]), yv, max_points) if method == "lttb"
+           else minmax_indices(yv, max_points))
+    return d.iloc[idx]
+
+
+def zoom(df: pd.DataFrame, x: str, lo, hi) -> pd.DataFrame:
+    """Рядки з x у [lo, hi] — видимий діапазон; проріджуємо вже його, тож при наближенні деталей більше."""
+    xs = df[x]
+    if pd.api.types.is_datetime64_any_dtype(xs):
+        lo, hi = pd.Timestamp(lo), pd.Timestamp(hi)
+        if hi == hi.normalize():
+            hi = hi + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")  # дата «по» — включно весь день
+    return df[(xs >= lo) & (xs <= hi)]
@@ -0,0 +1,329 @@
+# src/customers.py
+# клієнти по customer_unique_id (customer_id в Olist — новий на кожне замовлення!)
+# На диску — місячні агрегати клієнт × місяць: перше/останнє замовлення в місяці, к-сть замовлень, виручка,
+# останній штат (data/_customer_months.parquet, дораховуються лише по нових замовленнях).
+# З них складається будь-яке вікно дат: повні місяці — з агрегатів, два крайні місяці — з рядків facts.
+from __future__ import annotations
+import os
+import json
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from src.cache import CACHE
+from src.data import DATA_DIR, CSV_FILES, ORDERS_SORT_KEY, _maybe_read, _ensure_tables, dataset_version
+from src.profiling import profiled
+from src.rfm import rfm_score
+
+MONTHS_FILE = "_customer_months.parquet"
+MONTHS_STATE_FILE = "_customer_months.json"
+# версія формату агрегатів (змінили колонки/логіку → піднімаємо, і вони перебудуються)
+MONTHS_VERSION = 1
+MONTH_COLUMNS = ["customer_unique_id", "month", "first_purchase", "last_purchase", "orders", "revenue", "last_state"]
+# агрегати клієнтів у вікні (те, що повертає window_customers)
+DIM_COLUMNS = ["customer_unique_id", "first_purchase", "last_purchase", "orders", "revenue", "last_state"]
+
+_MONTHS_LOCK = threading.Lock()
+
+
+def _empty_dim() -> pd.DataFrame:
+    return pd.DataFrame({
+        "customer_unique_id": pd.Series(dtype=str),
+        "first_purchase": pd.Series(dtype="datetime64[ns]"),
+        "last_purchase": pd.Series(dtype="datetime64[ns]"),
+        "orders": pd.Series(dtype=np.int64),
+        "revenue": pd.Series(dtype=np.float64),
+        "last_state": pd.Series(dtype=str),
+    })
+
+
+def _month_start(ts) -> np.ndarray:
+    """Початок місяця для кожного часу (datetime64[ns])."""
+    return np.asarray(ts, dtype="datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]")
+
+
+def _orders_to_months(data_dir: str, orders: pd.DataFrame, sliced: bool) -> pd.DataFrame:
+    """orders (order_id, customer_id, час) → агрегати клієнт × місяць (лише для цих замовлень)."""
+    if orders.empty:
+        return pd.DataFrame(columns=MONTH_COLUMNS)
+    by_order = ("order_id", orders["order_id"].to_numpy()) if sliced else None
+    by_customer = ("customer_id", orders["customer_id"].dropna().to_numpy()) if sliced else None
+    items = _maybe_read(data_dir, "items", usecols=["order_id", "price"], semi_join=by_order)
+    customers = _maybe_read(data_dir, "customers",
+                            usecols=["customer_id", "customer_unique_id", "customer_state"],
+                            semi_join=by_customer)
+
+    rev = (items.groupby("order_id", sort=False)["price"].sum().rename("revenue")
+           if not items.empty else pd.Series(dtype=np.float64, name="revenue"))
+    df = orders.merge(rev, left_on="order_id", right_index=True, how="left")
+    if not customers.empty:
+        df = df.merge(customers, on="customer_id", how="left")
+    uid = df["customer_unique_id"] if "customer_unique_id" in df.columns else None
+    df["customer_unique_id"] = (df["customer_id"] if uid is None else uid.fillna(df["customer_id"])).astype(str)
+    df["customer_state"] = (df["customer_state"].astype(object).fillna("NA")
+                            if "customer_state" in df.columns else "NA")
+    df["revenue"] = pd.to_numeric(df["revenue"], errors="coerce").fillna(0.0)
+    return _aggregate_months(df.rename(columns={ORDERS_SORT_KEY: "ts"}))
+
+
+def _aggregate_months(df: pd.DataFrame) -> pd.DataFrame:
+    """Рядки (customer_unique_id, ts, revenue, customer_state) → клієнт × місяць; штат — з найсвіжішого рядка."""
+    df = df.sort_values("ts", kind="stable")
+    df["month"] = _month_start(df["ts"])
+    g = df.groupby(["customer_unique_id", "month"], sort=True)
+    return pd.DataFrame({
+        "first_purchase": g["ts"].min(),
+        "last_purchase":  g["ts"].max(),
+        "orders":         g["ts"].size().astype(np.int64),
+        "revenue":        g["revenue"].sum(),
+        "last_state":     g["customer_state"].last(),
+    }).reset_index()[MONTH_COLUMNS]
+
+
+def _merge_months(months: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """Додає агрегати нових замовлень: той самий клієнт × місяць зливається (min/max дат, суми, пізніший штат)."""
+    if delta.empty:
+        return months
+    both = pd.concat([months, delta], ignore_index=True)
+    g = both.sort_values("last_purchase", kind="stable").groupby(["customer_unique_id", "month"], sort=True)
+    return pd.DataFrame({
+        "first_purchase": g["first_purchase"].min(),
+        "last_purchase":  g["last_purchase"].max(),
+        "orders":         g["orders"].sum(),
+        "revenue":        g["revenue"].sum(),
+        "last_state":     g["last_state"].last(),
+    }).reset_index()[MONTH_COLUMNS]
+
+
+def _read_state(data_dir: str) -> dict:
+    try:
+        with open(os.path.join(data_dir, MONTHS_STATE_FILE), encoding="utf-8") as fh:
+            state = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+    return state if state.get("months_version") == MONTHS_VERSION else {}
+
+
+def _save(data_dir: str, months: pd.DataFrame, state: dict) -> None:
+    """Атомарний запис агрегатів і стану (.tmp → os.replace); data/ лише для читання — тільки пам'ять."""
+    if not os.access(data_dir, os.W_OK):
+        return
+    path = os.path.join(data_dir, MONTHS_FILE)
+    months.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+    spath = os.path.join(data_dir, MONTHS_STATE_FILE)
+    with open(spath + ".tmp", "w", encoding="utf-8") as fh:
+        json.dump(state, fh, indent=2)
+    os.replace(spath + ".tmp", spath)
+
+
+@profiled()
+def update_customer_months(data_dir: str = DATA_DIR) -> tuple[pd.DataFrame, dict]:
+    """Актуалізує місячні агрегати клієнтів і повертає (агрегати, статистика).
+
+    Нові замовлення = з часом покупки, пізнішим за watermark попереднього запуску. Якщо
+    к-сть замовлень зійшлася (старі + нові = всі) — дораховуємо лише їх, інакше (змінилась
+    історія, немає Parquet-кешу) — перебудова з нуля. mode: "fresh" / "incremental" / "rebuild".
+    """
+    version = dataset_version(data_dir)
+    cols = ["order_id", "customer_id", ORDERS_SORT_KEY]
+    state = _read_state(data_dir)
+    months_path = os.path.join(data_dir, MONTHS_FILE)
+    if state and os.path.exists(months_path) and state.get("dataset_version") == version:
+        return pd.read_parquet(months_path), {"mode": "fresh", "new_orders": 0}
+
+    pq_path = os.path.join(data_dir, CSV_FILES["orders"].replace(".csv", ".parquet"))
+    if os.access(data_dir, os.W_OK):
+        _ensure_tables(data_dir, ["orders"])
+    ts = pc.field(ORDERS_SORT_KEY)
+    if os.path.exists(pq_path):
+        dataset = ds.dataset(pq_path, format="parquet")
+        rows_valid = dataset.count_rows(filter=ts.is_valid())
+    else:
+        dataset, rows_valid = None, None
+
+    watermark = pd.Timestamp(state["watermark"]) if state.get("watermark") else None
+    incremental = (dataset is not None and watermark is not None and os.path.exists(months_path)
+                   and state.get("rows_valid") is not None)
+    if incremental:
+        n_new = dataset.count_rows(filter=ts > watermark)
+        incremental = state["rows_valid"] + n_new == rows_valid
+
+    if incremental:
+        new_orders = _maybe_read(data_dir, "orders", usecols=cols, filter=ts > watermark)
+        months = _merge_months(pd.read_parquet(months_path), _orders_to_months(data_dir, new_orders, sliced=True))
+        stats = {"mode": "incremental", "new_orders": len(new_orders)}
+    else:
+        orders = _maybe_read(data_dir, "orders", usecols=cols)
+        orders = orders[orders[ORDERS_SORT_KEY].notna()] if not orders.empty else orders
+        months = _orders_to_months(data_dir, orders, sliced=False)
+        stats = {"mode": "rebuild", "new_orders": len(orders)}
+        if rows_valid is None:
+            rows_valid = len(orders)
+
+    last = months["last_purchase"].max() if not months.empty else None
+    _save(data_dir, months, {
+        "months_version": MONTHS_VERSION,
+        "dataset_version": version,
+        "watermark": last.isoformat() if last is not None and pd.notna(last) else None,
+        "rows_valid": int(rows_valid) if dataset is not None else None,
+        "rows": int(len(months)),
+    })
+    return months, stats
+
+
+class CustomerMonths:
+    """Місячні агрегати в пам'яті для складання вікон: масиви, відсортовані за (місяць, клієнт).
+
+    Клієнт — цілий код (pd.factorize з sort=True: порядок кодів = порядок id, як у groupby по рядках),
+    штат — код у states; тож вікно — це зріз за місяцями + стабільне сортування кодів і reduceat,
+    без groupby по рядкових id.
+    """
+
+    def __init__(self, months: pd.DataFrame, stats: dict | None = None):
+        codes, ids = pd.factorize(months["customer_unique_id"].astype(str), sort=True)
+        month = months["month"].to_numpy(dtype="datetime64[ns]")
+        order = np.lexsort((codes, month))
+        self.ids = pd.Index(ids, dtype="str")
+        self.month = month[order]
+        self.cust = codes[order].astype(np.int64)
+        self.first = months["first_purchase"].to_numpy(dtype="datetime64[ns]")[order]
+        self.last = months["last_purchase"].to_numpy(dtype="datetime64[ns]")[order]
+        self.orders = months["orders"].to_numpy(dtype=np.int64)[order]
+        self.revenue = months["revenue"].to_numpy(dtype=np.float64)[order]
+        state_codes, self.states = pd.factorize(months["last_state"].astype(str))
+        self.states = pd.Index(self.states, dtype="str")
+        self.state = state_codes.astype(np.int16)[order]
+        self.stats = stats or {}
+        # замовлень за всю історію по кожному клієнту (для «Замовлень за весь час» у ТОП-таблиці RFM)
+        self.lifetime = np.bincount(self.cust, weights=self.orders, minlength=len(self.ids)).astype(np.int64)
+
+    def span(self, lo, hi) -> tuple[int, int]:
+        """Позиції рядків з місяцем у [lo, hi)."""
+        return int(self.month.searchsorted(lo, "left")), int(self.month.searchsorted(hi, "left"))
+
+
+def load_customer_months(data_dir: str = DATA_DIR) -> CustomerMonths:
+    """Місячні агрегати клієнтів: одні на версію датасету в кеші процесу (src.cache; лише читати)."""
+    key = os.path.abspath(data_dir)
+    version = dataset_version(data_dir)
+    with _MONTHS_LOCK:
+        cached = CACHE.get("customer_months", key, lambda c: c[0] == version)
+        if cached is not None:
+            return cached[1]
+        months, stats = update_customer_months(data_dir)
+        entry = CustomerMonths(months, stats)
+        CACHE.put("customer_months", key, (version, entry))
+        return entry
+
+
+def lifetime_orders(customer_ids, data_dir: str = DATA_DIR) -> pd.Series:
+    """Замовлень за всю історію для кожного з customer_ids (невідомий клієнт → 0)."""
+    months = load_customer_months(data_dir)
+    ids = pd.Index(pd.Series(customer_ids).astype(str))
+    codes = months.ids.get_indexer(ids)
+    counts = np.zeros(len(ids), dtype=np.int64)
+    counts[codes >= 0] = months.lifetime[codes[codes >= 0]]
+    return pd.Series(counts, index=ids, name="lifetime_orders")
+
+
+def _window_rows(view: pd.DataFrame) -> pd.DataFrame:
+    """Рядки facts → по рядку на замовлення (customer_unique_id, ts, revenue, customer_state)."""
+    rows = view.loc[~view["order_id"].duplicated(), ["customer_unique_id", "purchase_dt", "gross_revenue", "customer_state"]]
+    rows = rows.rename(columns={"purchase_dt": "ts", "gross_revenue": "revenue"})
+    rows["customer_unique_id"] = rows["customer_unique_id"].astype(str)
+    rows["customer_state"] = rows["customer_state"].astype(object)
+    rows["revenue"] = rows["revenue"].astype(np.float64)
+    return rows
+
+
+def _aggregate(df: pd.DataFrame) -> pd.DataFrame:
+    """Рядки (customer_unique_id, ts, revenue, customer_state) → агрегати клієнтів; штат — з найсвіжішого рядка."""
+    df = df.sort_values("ts", kind="stable")
+    g = df.groupby("customer_unique_id", sort=True)
+    return pd.DataFrame({
+        "first_purchase": g["ts"].min(),
+        "last_purchase":  g["ts"].max(),
+        "orders":         g["ts"].size().astype(np.int64),
+        "revenue":        g["revenue"].sum(),
+        "last_state":     g["customer_state"].last(),
+    }).reset_index()[DIM_COLUMNS]
+
+
+def _orders_in(view: pd.DataFrame) -> int:
+    """К-сть замовлень у зрізі facts (рядки одного замовлення йдуть підряд — рахуємо зміни order_id)."""
+    if view.empty:
+        return 0
+    oid = view["order_id"]
+    return int(oid.ne(oid.shift()).sum())
+
+
+def _window_from_months(view: pd.DataFrame, months: CustomerMonths, lo, hi) -> pd.DataFrame | None:
+    """Вікно = повні місяці [lo, hi) з агрегатів + рядки facts до lo і від hi. None — якщо агрегати не про цей view."""
+    values = view["purchase_dt"].to_numpy()
+    i, j = values.searchsorted(lo, "left"), values.searchsorted(hi, "left")
+    a, b = months.span(lo, hi)
+    # view у повних місяцях має містити ВСІ замовлення цих місяців (зріз спільних facts, а не фільтр по штату тощо)
+    if _orders_in(view.iloc[i:j]) != int(months.orders[a:b].sum()):
+        return None
+    head, tail = _window_rows(view.iloc[:i]), _window_rows(view.iloc[j:])
+    edge_codes = [months.ids.get_indexer(part["customer_unique_id"]) for part in (head, tail)]
+    edge_states = [months.states.get_indexer(part["customer_state"].astype(str)) for part in (head, tail)]
+    if any((c < 0).any() for c in edge_codes + edge_states):
+        return None  # клієнт чи штат, якого агрегати не знають (інша версія даних)
+    # у порядку часу: голова, повні місяці (по кожному клієнту — за зростанням місяця), хвіст.
+    # Тож у межах клієнта рядки вже за часом, і стабільного сортування за кодом досить:
+    # останній рядок групи — найсвіжіший (при рівних часах — як у рядках facts)
+    cust = np.concatenate([edge_codes[0], months.cust[a:b], edge_codes[1]])
+    first = np.concatenate([head["ts"].to_numpy("datetime64[ns]"), months.first[a:b], tail["ts"].to_numpy("datetime64[ns]")])
+    last = np.concatenate([head["ts"].to_numpy("datetime64[ns]"), months.last[a:b], tail["ts"].to_numpy("datetime64[ns]")])
+    orders = np.concatenate([np.ones(len(head), np.int64), months.orders[a:b], np.ones(len(tail), np.int64)])
+    revenue = np.concatenate([head["revenue"].to_numpy(), months.revenue[a:b], tail["revenue"].to_numpy()])
+    state = np.concatenate([edge_states[0], months.state[a:b], edge_states[1]])
+    if len(cust) == 0:
+        return _empty_dim()
+    order = np.argsort(cust, kind="stable")
+    cust, first, last = cust[order], first[order], last[order]
+    starts = np.flatnonzero(np.r_[True, cust[1:] != cust[:-1]])
+    ends = np.r_[starts[1:], len(cust)] - 1
+    return pd.DataFrame({
+        "customer_unique_id": months.ids.take(cust[starts]),
+        "first_purchase": np.minimum.reduceat(first, starts),
+        "last_purchase": last[ends],
+        "orders": np.add.reduceat(orders[order], starts),
+        "revenue": np.add.reduceat(revenue[order], starts),
+        "last_state": months.states.take(state[order][ends]),
+    })[DIM_COLUMNS]
+
+
+@profiled()
+def window_customers(view: pd.DataFrame, data_dir: str | None = None) -> pd.DataFrame:
+    """Агрегати клієнтів (колонки DIM_COLUMNS) для рядків facts у вибраному вікні.
+
+    З data_dir і хоча б одним повним місяцем усередині вікна — повні місяці беремо з місячних агрегатів
+    (load_customer_months), а по рядках рахуємо лише два крайні місяці. Інакше (коротке вікно, сурогатні
+    клієнти) — все по рядках вікна, і агрегати навіть не завантажуються.
+    Одне замовлення = один раз, навіть якщо в facts кілька рядків-відгуків.
+    """
+    if view.empty:
+        return _empty_dim()
+    if data_dir is not None and not view.attrs.get("customer_id_surrogate"):
+        ts = view["purchase_dt"]
+        lo = (np.datetime64(ts.iloc[0], "M") + 1).astype("datetime64[ns]")  # перший повний місяць
+        hi = np.datetime64(ts.iloc[-1], "M").astype("datetime64[ns]")      # місяць останнього рядка — край
+        if lo < hi:
+            out = _window_from_months(view, load_customer_months(data_dir), lo, hi)
+            if out is not None:
+                return out
+    return _aggregate(_window_rows(view))
+
+
+@profiled()
+def customer_rfm(view: pd.DataFrame, data_dir: str | None = None) -> pd.DataFrame:
+    """RFM по customer_unique_id у вікні: Recency, Frequency (замовлення), Monetary, R/F/M, RFM, Segment."""
+    agg = window_customers(view, data_dir).rename(columns={"orders": "Frequency", "revenue": "Monetary"})
+    rfm = rfm_score(agg)
+    return rfm[["customer_unique_id", "Recency", "Frequency", "Monetary", "R", "F", "M", "RFM", "Segment",
+                "first_purchase", "last_state"]]
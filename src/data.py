@@ -1,8 +1,23 @@
 # src/data.py
 from __future__ import annotations
 import os
+import csv
+import codecs
+import hashlib
+import json
+import threading
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.cache import CACHE, cache_stats, count_cache, reset_cache_stats  # noqa: F401 (реекспорт для сторінок/бенчів)
+from src.profiling import profiled, span
+
+DATA_DIR = "data"
 # --- функція для завантаження та підготовки даних
 CSV_FILES = {
     "orders":   "olist_orders_dataset.csv",
@@ -13,111 +28,705 @@ CSV_FILES = {
     "products": "olist_products_dataset.csv",
     "sellers":  "olist_sellers_dataset.csv",
 }
-# --- допоміжні функції для читання CSV/Parquet з урахуванням кодування та кешу Parquet     
-def _read_csv(path: str, usecols=None, parse_dates=None) -> pd.DataFrame:
+# --- явна схема таблиць для Parquet-кешу: дати → timestamp, категорії → dictionary, вузькі числа
+# (гроші лишаємо float64 — суми по всій вибірці мають сходитися до копійки)
+_TS = pa.timestamp("ns")
+_CAT = pa.dictionary(pa.int32(), pa.string())
+TABLE_SCHEMAS = {
+    "orders": pa.schema([
+        ("order_id", pa.string()), ("customer_id", pa.string()), ("order_status", _CAT),
+        ("order_purchase_timestamp", _TS), ("order_approved_at", _TS),
+        ("order_delivered_carrier_date", _TS), ("order_delivered_customer_date", _TS),
+        ("order_estimated_delivery_date", _TS),
+    ]),
+    "items": pa.schema([
+        ("order_id", pa.string()), ("order_item_id", pa.int16()), ("product_id", pa.string()),
+        ("seller_id", pa.string()), ("shipping_limit_date", _TS),
+        ("price", pa.float64()), ("freight_value", pa.float64()),
+    ]),
+    "payments": pa.schema([
+        ("order_id", pa.string()), ("payment_sequential", pa.int16()), ("payment_type", _CAT),
+        ("payment_installments", pa.int8()), ("payment_value", pa.float64()),
+    ]),
+    "customers": pa.schema([
+        ("customer_id", pa.string()), ("customer_unique_id", pa.string()),
+        ("customer_zip_code_prefix", pa.int32()), ("customer_city", _CAT), ("customer_state", _CAT),
+    ]),
+    "reviews": pa.schema([
+        ("review_id", pa.string()), ("order_id", pa.string()), ("review_score", pa.int8()),
+        ("review_comment_title", pa.string()), ("review_comment_message", pa.string()),
+        ("review_creation_date", _TS), ("review_answer_timestamp", _TS),
+    ]),
+    "products": pa.schema([
+        ("product_id", pa.string()), ("product_category_name", _CAT),
+        ("product_name_lenght", pa.float32()), ("product_description_lenght", pa.float32()),
+        ("product_photos_qty", pa.float32()), ("product_weight_g", pa.float32()),
+        ("product_length_cm", pa.float32()), ("product_height_cm", pa.float32()),
+        ("product_width_cm", pa.float32()),
+    ]),
+    "sellers": pa.schema([
+        ("seller_id", pa.string()), ("seller_zip_code_prefix", pa.int32()),
+        ("seller_city", _CAT), ("seller_state", _CAT),
+    ]),
+}
+# версія схеми: змінили TABLE_SCHEMAS → піднімаємо номер, і весь кеш перебудується
+PARQUET_SCHEMA_VERSION = 2
+MANIFEST_FILE = "_parquet_manifest.json"
+# orders зберігаємо відсортованими за часом покупки невеликими row group-ами:
+# тоді фільтри по даті/«найсвіжіші N» читають лише потрібні групи (статистика min/max)
+ORDERS_SORT_KEY = "order_purchase_timestamp"
+ORDERS_ROW_GROUP = 16_384
+
+
+def _coerce_to_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Приводить колонки до типів TABLE_SCHEMAS (погані значення → NaT/NaN). Колонки поза схемою не чіпаємо."""
+    schema = TABLE_SCHEMAS.get(name)
+    if schema is None:
+        return df
+    for field in schema:
+        if field.name not in df.columns:
+            continue
+        s = df[field.name]
+        if pa.types.is_timestamp(field.type):
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                df[field.name] = pd.to_datetime(s, errors="coerce")
+        elif pa.types.is_dictionary(field.type):
+            if not isinstance(s.dtype, pd.CategoricalDtype):
+                df[field.name] = s.astype("category")
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            if not pd.api.types.is_numeric_dtype(s):
+                df[field.name] = pd.to_numeric(s, errors="coerce")
+    return df
+
+
+def _to_arrow(df: pd.DataFrame, name: str) -> pa.Table:
+    """pandas → Arrow з явною схемою таблиці (невідомі колонки — з автоматичним типом)."""
+    df = _coerce_to_schema(df, name)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    known = {f.name: f.type for f in TABLE_SCHEMAS.get(name, [])}
+    target = pa.schema([(f.name, known.get(f.name, f.type)) for f in table.schema])
+    return table.cast(target)
+
+
+# --- допоміжні функції для читання CSV/Parquet з урахуванням кодування та кешу Parquet
+# CSV читає pyarrow.csv: багатопотоково і з типами колонок з TABLE_SCHEMAS.
+# Кодування визначаємо один раз за вибіркою файлу. Якщо в utf-8 трапляються «биті» байти
+# (latin1 посеред файлу), вони декодуються як latin1 прямо під час читання, без другого проходу.
+CSV_SAMPLE_BYTES = 1 << 20   # початок файлу, за яким визначаємо кодування
+_CSV_SAMPLE_WINDOWS = 16     # + стільки рівномірно розкиданих «вікон» по 64 КБ далі у файлі
+MIXED_ENCODING = "olist-utf8-latin1"
+
+
+def _latin1_fallback(exc: UnicodeError):
+    if isinstance(exc, UnicodeDecodeError):
+        return exc.object[exc.start:exc.end].decode("latin1"), exc.end
+    raise exc
+
+
+codecs.register_error("olist-latin1", _latin1_fallback)
+
+
+class _Utf8Latin1Decoder(codecs.BufferedIncrementalDecoder):
+    """utf-8, а байти, що не є валідним utf-8, — як latin1 (для transcoding-потоку Arrow)."""
+    def _buffer_decode(self, data, errors, final):
+        return codecs.utf_8_decode(data, "olist-latin1", final)
+
+
+def _codec_search(name: str):
+    if name == MIXED_ENCODING.replace("-", "_"):
+        return codecs.CodecInfo(codecs.utf_8_encode,
+                                lambda data, errors="strict": codecs.utf_8_decode(data, "olist-latin1", True),
+                                incrementaldecoder=_Utf8Latin1Decoder, name=MIXED_ENCODING)
+    return None
+
+
+codecs.register(_codec_search)
+
+
+def _is_utf8(chunk: bytes, final: bool) -> bool:
     try:
-        return pd.read_csv(path, usecols=usecols, parse_dates=parse_dates,
-                           encoding="utf-8", low_memory=False)
-    except Exception:
-        return pd.read_csv(path, usecols=usecols, parse_dates=parse_dates,
-                           encoding="latin1", low_memory=False)
+        codecs.getincrementaldecoder("utf-8")().decode(chunk, final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_encoding(path: str, sample_bytes: int = CSV_SAMPLE_BYTES) -> str:
+    """"utf8", якщо вибірка файлу — валідний UTF-8, інакше MIXED_ENCODING.
+
+    Вибірка = перші sample_bytes + _CSV_SAMPLE_WINDOWS вікон по 64 КБ (кілька seek-ів, а не весь файл).
+    """
+    size = os.path.getsize(path)
+    window = 1 << 16
+    with open(path, "rb") as fh:
+        if not _is_utf8(fh.read(sample_bytes), final=size <= sample_bytes):
+            return MIXED_ENCODING
+        if size <= sample_bytes:
+            return "utf8"
+        for off in np.linspace(sample_bytes, max(size - window, sample_bytes), _CSV_SAMPLE_WINDOWS):
+            fh.seek(int(off))
+            chunk = fh.read(window)
+            # вікно може початися посеред символу: пропускаємо до 3 байтів продовження (10xxxxxx)
+            skip = 0
+            while skip < 3 and skip < len(chunk) and 0x80 <= chunk[skip] < 0xC0:
+                skip += 1
+            if not _is_utf8(chunk[skip:], final=int(off) + window >= size):
+                return MIXED_ENCODING
+    return "utf8"
+
+
+def _csv_options(path: str, name: str | None, encoding: str, usecols=None, typed: bool = True,
+                 block_size: int | None = None) -> dict:
+    """kwargs для pyarrow.csv (read_options, convert_options): колонки з usecols, що є в заголовку; типи — з TABLE_SCHEMAS (typed) або всі рядки."""
+    with open(path, encoding=encoding, newline="") as fh:
+        header = next(csv.reader(fh), [])
+    cols = [c for c in header if usecols is None or c in usecols]
+    if typed:
+        known = {f.name: f.type for f in TABLE_SCHEMAS.get(name, [])}
+        types = {c: known[c] for c in cols if c in known}  # решта — автоматичний тип Arrow
+    else:
+        types = {c: pa.string() for c in cols}
+    read_opts = pacsv.ReadOptions(encoding=encoding, use_threads=True,
+                                  **({"block_size": block_size} if block_size else {}))
+    conv_opts = pacsv.ConvertOptions(column_types=types, include_columns=cols,
+                                     strings_can_be_null=True)  # "", "NA", "null"… → NaN, як у pandas
+    return {"read_options": read_opts, "convert_options": conv_opts}
+
+
+def _read_csv(path: str, name: str | None = None, usecols=None) -> pd.DataFrame:
+    """CSV → DataFrame через pyarrow.csv; колонки з usecols, яких немає у файлі, пропускаємо.
+
+    Якщо якесь значення не парситься в оголошений тип (або utf-8 «зламався» поза вибіркою) —
+    перечитуємо рядками й приводимо як раніше (_coerce_to_schema: погані значення → NaT/NaN).
+    """
+    usecols = set(usecols) if usecols is not None else None
+    try:
+        table = pacsv.read_csv(path, **_csv_options(path, name, detect_encoding(path), usecols))
+    except pa.ArrowInvalid:
+        table = pacsv.read_csv(path, **_csv_options(path, name, MIXED_ENCODING, usecols, typed=False))
+    df = table.to_pandas()
+    return _coerce_to_schema(df, name) if name else df
+
+
+# --- маніфест кешу: розмір, mtime і sha256 кожного CSV, з якого зібрано Parquet
+def _file_sha256(path: str, chunk: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_manifest(data_dir: str) -> dict:
+    try:
+        with open(os.path.join(data_dir, MANIFEST_FILE), encoding="utf-8") as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return {"schema_version": PARQUET_SCHEMA_VERSION, "tables": {}}
+    if manifest.get("schema_version") != PARQUET_SCHEMA_VERSION:
+        return {"schema_version": PARQUET_SCHEMA_VERSION, "tables": {}}
+    return manifest
+
+
+def _save_manifest(data_dir: str, manifest: dict) -> None:
+    tmp = os.path.join(data_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, os.path.join(data_dir, MANIFEST_FILE))
+
+
+def _table_is_fresh(csv_path: str, pq_path: str, entry: dict | None) -> tuple[bool, dict | None]:
+    """(свіжий?, оновлений запис). Хеш рахуємо лише тоді, коли змінились розмір або mtime."""
+    if entry is None or not os.path.exists(pq_path):
+        return False, None
+    st = os.stat(csv_path)
+    if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+        return True, entry
+    if entry.get("size") == st.st_size and entry.get("sha256") == _file_sha256(csv_path):
+        # файл «торкнули», але вміст той самий — лише оновлюємо mtime
+        return True, {**entry, "mtime_ns": st.st_mtime_ns}
+    return False, None
+
+
+def write_table_parquet(table: pa.Table, pq_path: str, name: str) -> None:
+    """Пише Arrow-таблицю у кеш за правилами таблиці name (orders — відсортовані за часом покупки)."""
+    tmp = pq_path + ".tmp"
+    if name == "orders" and ORDERS_SORT_KEY in table.column_names:
+        table = table.sort_by(ORDERS_SORT_KEY)
+        pq.write_table(table, tmp, row_group_size=ORDERS_ROW_GROUP)
+    else:
+        pq.write_table(table, tmp)
+    os.replace(tmp, pq_path)  # атомарна заміна: читачі не бачать напівзаписаний файл
+
+
+# --- потокова конвертація CSV → Parquet: record batch-ами, пам'ять не залежить від розміру файлу
+CSV_BLOCK_SIZE = 1 << 20        # байт CSV на один batch (парсер Arrow бере ~20× блоку пам'яті)
+SORT_BUDGET_ROWS = 250_000      # максимум рядків orders у пам'яті під час сортування
+_SORT_BINS = 1024
+
+
+def _write_csv_parquet(csv_path: str, path: str, name: str, block_size: int, typed: bool) -> int:
+    """CSV → Parquet потоком: typed — типи парсить Arrow; інакше блок читається рядками й типізується _to_arrow."""
+    encoding = detect_encoding(csv_path) if typed else MIXED_ENCODING
+    opts = _csv_options(csv_path, name, encoding, typed=typed, block_size=block_size)
+    known = {f.name: f.type for f in TABLE_SCHEMAS.get(name, [])}
+    rows = 0
+    with pacsv.open_csv(csv_path, **opts) as reader:
+        schema = (reader.schema if typed
+                  else pa.schema([(f.name, known.get(f.name, pa.string())) for f in reader.schema]))
+        with pq.ParquetWriter(path, schema) as writer:
+            for batch in reader:
+                table = (pa.Table.from_batches([batch]) if typed
+                         else _to_arrow(batch.to_pandas(), name).cast(schema))
+                writer.write_table(table)
+                rows += table.num_rows
+    return rows
+
+
+def _sort_parquet(src: str, dst: str, key: str, budget_rows: int = SORT_BUDGET_ROWS) -> None:
+    """Сортує Parquet за key з обмеженою пам'яттю і пише row group-ами по ORDERS_ROW_GROUP.
+
+    Поміщається в budget_rows — сортуємо в пам'яті. Інакше: гістограма ключа → межі кошиків
+    по ≈ budget_rows рядків → один прохід розкладає рядки у тимчасові файли кошиків → кожен
+    кошик сортуємо окремо і дописуємо по черзі. Порожні ключі — в кінці (як у sort_by).
+    """
+    f = pq.ParquetFile(src)
+    if f.metadata.num_rows <= budget_rows:
+        pq.write_table(f.read().sort_by(key), dst, row_group_size=ORDERS_ROW_GROUP)
+        return
+    schema = f.schema_arrow
+
+    def keys():
+        for batch in f.iter_batches(columns=[key]):
+            yield batch.column(0)
+
+    mins, maxs = [], []
+    for col in keys():
+        mm = pc.min_max(col.cast(pa.int64()))
+        if mm["min"].is_valid:
+            mins.append(mm["min"].as_py())
+            maxs.append(mm["max"].as_py())
+    cuts = np.array([], dtype=np.int64)
+    if mins and max(maxs) > min(mins):
+        lo, hi = min(mins), max(maxs)
+        edges = np.linspace(lo, hi, _SORT_BINS + 1)
+        counts = np.zeros(_SORT_BINS, dtype=np.int64)
+        for col in keys():
+            v = col.drop_null().cast(pa.int64()).to_numpy()
+            counts += np.histogram(v.astype(np.float64), bins=edges)[0]
+        # жадібно: новий кошик, коли наступний бін переповнив би бюджет
+        # (один бін > бюджету — рідкість, лишається одним кошиком)
+        bounds, acc = [], 0
+        for j, c in enumerate(counts):
+            if acc and acc + c > budget_rows:
+                bounds.append(int(edges[j]))
+                acc = 0
+            acc += c
+        cuts = np.array(bounds, dtype=np.int64)
+    n_buckets = len(cuts) + 2  # останній — рядки без ключа
+
+    parts = [f"{dst}.part{b}" for b in range(n_buckets)]
+    writers = {}
+    try:
+        for batch in f.iter_batches(batch_size=ORDERS_ROW_GROUP):
+            col = batch.column(schema.get_field_index(key))
+            v = pc.fill_null(col.cast(pa.int64()), 0).to_numpy()
+            bucket = np.where(col.is_valid().to_numpy(zero_copy_only=False),
+                              np.searchsorted(cuts, v, side="right"), n_buckets - 1)
+            for b in np.unique(bucket):
+                if b not in writers:
+                    writers[b] = pq.ParquetWriter(parts[b], schema)
+                # write_table, а не write_batch: той буферизує рядки до 1M на row group
+                writers[b].write_table(pa.Table.from_batches([batch.filter(pa.array(bucket == b))]))
+        for w in writers.values():
+            w.close()
+        with pq.ParquetWriter(dst, schema) as out:
+            for b in sorted(writers):
+                if b == n_buckets - 1:
+                    for batch in pq.ParquetFile(parts[b]).iter_batches(batch_size=ORDERS_ROW_GROUP):
+                        out.write_table(pa.Table.from_batches([batch]))
+                else:
+                    out.write_table(pq.read_table(parts[b]).sort_by(key), row_group_size=ORDERS_ROW_GROUP)
+    finally:
+        for w in writers.values():
+            w.close()
+        for p in parts:
+            if os.path.exists(p):
+                os.remove(p)
+
+
+def csv_to_parquet(csv_path: str, pq_path: str, name: str, block_size: int = CSV_BLOCK_SIZE) -> int:
+    """Конвертує CSV у Parquet-кеш потоком record batch-ів (у пам'яті — один блок). Повертає к-сть рядків.
+
+    orders після запису сортуються за часом покупки (_sort_parquet, теж з обмеженою пам'яттю).
+    Кодування і запасний шлях для «поганих» значень — як у _read_csv.
+    """
+    part = pq_path + ".part"
+    try:
+        try:
+            rows = _write_csv_parquet(csv_path, part, name, block_size, typed=True)
+        except pa.ArrowInvalid:
+            rows = _write_csv_parquet(csv_path, part, name, block_size, typed=False)
+        if name == "orders" and ORDERS_SORT_KEY in pq.read_schema(part).names:
+            _sort_parquet(part, pq_path + ".tmp", ORDERS_SORT_KEY)
+        else:
+            os.replace(part, pq_path + ".tmp")
+        os.replace(pq_path + ".tmp", pq_path)  # атомарна заміна: читачі не бачать напівзаписаний файл
+    finally:
+        for p in (part, pq_path + ".tmp"):
+            if os.path.exists(p):
+                os.remove(p)
+    return rows
+
+
+def _build_parquet(data_dir: str, name: str) -> dict:
+    fn = CSV_FILES[name]
+    csv_path = os.path.join(data_dir, fn)
+    pq_path = os.path.join(data_dir, fn.replace(".csv", ".parquet"))
+    st = os.stat(csv_path)
+    rows = csv_to_parquet(csv_path, pq_path, name)
+    return {"csv": fn, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "sha256": _file_sha256(csv_path), "rows": rows}
+
+
+_CACHE_LOCK = threading.Lock()
+
+
+def _ensure_tables(data_dir: str, names) -> list[str]:
+    """Перебудовує застарілі Parquet-таблиці з names. Повертає список перебудованих."""
+    rebuilt = []
+    with _CACHE_LOCK:
+        manifest = _load_manifest(data_dir)
+        changed = False
+        for name in names:
+            csv_path = os.path.join(data_dir, CSV_FILES[name])
+            pq_path = os.path.join(data_dir, CSV_FILES[name].replace(".csv", ".parquet"))
+            if not os.path.exists(csv_path):
+                continue  # немає CSV — працюємо з тим Parquet, що є (або без нього)
+            fresh, entry = _table_is_fresh(csv_path, pq_path, manifest["tables"].get(name))
+            if not fresh:
+                entry = _build_parquet(data_dir, name)
+                rebuilt.append(name)
+            if entry != manifest["tables"].get(name):
+                manifest["tables"][name] = entry
+                changed = True
+        if changed:
+            _save_manifest(data_dir, manifest)
+    return rebuilt
+
+
+def mark_parquet_fresh(data_dir: str, entries: dict[str, dict]) -> None:
+    """Записує в маніфест готові пари CSV + Parquet (запис як у _build_parquet), щоб їх не перебудовувати.
+
+    Для тих, хто пише обидва файли сам (напр. генератор src/synth.py).
+    """
+    with _CACHE_LOCK:
+        manifest = _load_manifest(data_dir)
+        manifest["tables"].update(entries)
+        _save_manifest(data_dir, manifest)
+
+
 # --- функція для створення Parquet-кешу (прискорює читання)
-def ensure_parquet_cache(data_dir: str = "data") -> None:
+def ensure_parquet_cache(data_dir: str = "data") -> list[str]:
+    """Оновлює Parquet-кеш: перебудовує лише ті таблиці, чиї CSV змінились (за маніфестом)."""
     os.makedirs(data_dir, exist_ok=True)
-    for _, fn in CSV_FILES.items():
-        csv_path = os.path.join(data_dir, fn)
-        pq_path  = os.path.join(data_dir, fn.replace(".csv", ".parquet"))
-        if os.path.exists(csv_path) and not os.path.exists(pq_path):
-            _read_csv(csv_path).to_parquet(pq_path, index=False)
+    return _ensure_tables(data_dir, CSV_FILES)
+
+
 # --- функція для читання CSV або Parquet (Parquet має пріоритет)
-def _maybe_read(data_dir: str, name: str, usecols=None, parse_dates=None) -> pd.DataFrame:
+def _maybe_read(data_dir: str, name: str, usecols=None, filter=None, semi_join=None) -> pd.DataFrame:
+    """Читає таблицю name з Parquet-кешу (або CSV).
+
+    filter — pyarrow-вираз, який проштовхується у скан Parquet (row group-и відкидаються за статистикою);
+    semi_join=(колонка, ключі) — лишає тільки рядки з ключем у ключах ще до переходу в pandas.
+    """
+    with span(f"read {name}"):
+        return _read_table(data_dir, name, usecols, filter, semi_join)
+
+
+def _read_table(data_dir: str, name: str, usecols, filter, semi_join) -> pd.DataFrame:
     csv_path = os.path.join(data_dir, CSV_FILES[name])
     pq_path  = os.path.join(data_dir, CSV_FILES[name].replace(".csv", ".parquet"))
 
+    # застарілий кеш не віддаємо: якщо CSV змінився — перебудовуємо цю таблицю
+    if os.path.exists(csv_path) and os.access(data_dir, os.W_OK):
+        _ensure_tables(data_dir, [name])
+
+    if semi_join is not None:
+        key, values = semi_join
+        expr = pc.field(key).isin(pa.array(values))
+        filter = expr if filter is None else (filter & expr)
+
     if os.path.exists(pq_path):
+        if filter is not None:
+            dataset = ds.dataset(pq_path, format="parquet")
+            cols = [c for c in usecols if c in dataset.schema.names] if usecols is not None else None
+            df = dataset.to_table(columns=cols, filter=filter).to_pandas()
+            return _coerce_to_schema(df, name)
         try:
-            return pd.read_parquet(pq_path, columns=usecols)
+            df = pd.read_parquet(pq_path, columns=usecols)
         except Exception:
             df = pd.read_parquet(pq_path)
-            return df[usecols] if usecols is not None else df
+            df = df[[c for c in usecols if c in df.columns]] if usecols is not None else df
+        return _coerce_to_schema(df, name)  # для типізованого кешу — no-op
 
     if os.path.exists(csv_path):
-        return _read_csv(csv_path, usecols=usecols, parse_dates=parse_dates)
+        df = _read_csv(csv_path, name, usecols=usecols)
+        if filter is not None and not df.empty:
+            # без Parquet фільтр застосовуємо вже після читання (через Arrow, щоб вираз був той самий)
+            df = pa.Table.from_pandas(df, preserve_index=False).filter(filter).to_pandas()
+        return df
 
     return pd.DataFrame()
+
+
+# --- «найсвіжіші N» без читання всієї історії: межа по часу зі статистики row group-ів
+def _orders_cutoff(data_dir: str, max_orders: int, lower=None, upper=None):
+    """Мінімальний час покупки, починаючи з якого в [lower, upper) гарантовано є ≥ max_orders замовлень.
+
+    Ходимо по row group-ах відсортованого orders.parquet з кінця й рахуємо лише групи,
+    що цілком лежать у вікні. None — межу знайти не вдалось (читаємо все вікно).
+    """
+    pq_path = os.path.join(data_dir, CSV_FILES["orders"].replace(".csv", ".parquet"))
+    if not os.path.exists(pq_path):
+        return None
+    pf = pq.ParquetFile(pq_path)
+    idx = pf.schema_arrow.get_field_index(ORDERS_SORT_KEY)
+    if idx < 0:
+        return None
+    seen = 0
+    for rg in reversed(range(pf.metadata.num_row_groups)):
+        meta = pf.metadata.row_group(rg)
+        stats = meta.column(idx).statistics
+        if stats is None or not stats.has_min_max:
+            return None
+        gmin, gmax = pd.Timestamp(stats.min), pd.Timestamp(stats.max)
+        if upper is not None and gmin >= upper:
+            continue  # група цілком після вікна
+        if lower is not None and gmax < lower:
+            return None  # дійшли до початку вікна
+        if (lower is None or gmin >= lower) and (upper is None or gmax < upper):
+            seen += meta.num_rows - (stats.null_count or 0)
+        if seen >= max_orders:
+            return gmin
+    return None
+
+
+def _read_orders(data_dir: str, usecols, year_filter=None, max_orders=None) -> pd.DataFrame:
+    """orders з фільтром по року та лімітом «найсвіжіших» — фільтри проштовхуються в Parquet."""
+    ts = pc.field(ORDERS_SORT_KEY)
+    lower = upper = None
+    expr = None
+    if year_filter:
+        lower, upper = pd.Timestamp(year=int(year_filter), month=1, day=1), pd.Timestamp(year=int(year_filter) + 1, month=1, day=1)
+        expr = (ts >= lower) & (ts < upper)
+    if isinstance(max_orders, (int, np.integer)):
+        cutoff = _orders_cutoff(data_dir, int(max_orders), lower, upper)
+        if cutoff is not None:
+            expr = (ts >= cutoff) if expr is None else (expr & (ts >= cutoff))
+    orders = _maybe_read(data_dir, "orders", usecols=usecols, filter=expr)
+    if orders.empty:
+        return orders
+
+    # якщо max_orders задано — беремо НАЙСВІЖІШІ max_orders; якщо None — всі дані
+    if isinstance(max_orders, (int, np.integer)) and len(orders) > max_orders:
+        orders = orders.sort_values(ORDERS_SORT_KEY).tail(max_orders)
+    return orders
 # --- допоміжна функція для перетворення у числовий тип з обробкою помилок 
 def _to_num(s: pd.Series, fill=0.0) -> pd.Series:
     return pd.to_numeric(s, errors="coerce").fillna(fill)
+# --- категорія з заповненням пропусків (fill додаємо до категорій, якщо його там ще нема)
+def _to_cat(s: pd.Series | None, fill: str, index=None) -> pd.Series:
+    if s is None:
+        return pd.Series(fill, index=index, dtype="category")
+    s = s.astype("category")
+    if fill not in s.cat.categories:
+        s = s.cat.add_categories([fill])
+    return s.fillna(fill)
 # --- основна функція для отримання фактів (orders + агрегати по items/payments/reviews/customers) 
+FACTS_ENGINES = ("pandas", "duckdb")
+# рушій для спільного сховища facts (можна перемкнути змінною середовища)
+FACTS_ENGINE = os.environ.get("OLIST_FACTS_ENGINE", "pandas")
+_ORDERS_COLS = [
+    "order_id","customer_id","order_status",
+    "order_purchase_timestamp",
+    "order_approved_at","order_delivered_carrier_date",
+    "order_delivered_customer_date","order_estimated_delivery_date",
+]
+
+
+@profiled()
 def get_facts(
     data_dir: str = "data",
     year_filter: int | None = None,
     max_orders: int | None = None,  # None = БЕЗ ЛІМІТУ
+    engine: str = "pandas",          # "duckdb" — один багатопотоковий запит по Parquet-кешу
+    compact: bool = False,           # True — компактні типи (див. compact_facts)
 ) -> pd.DataFrame:
-    orders = _maybe_read(
-        data_dir, "orders",
-        usecols=[
-            "order_id","customer_id","order_status",
-            "order_purchase_timestamp",
-            "order_approved_at","order_delivered_carrier_date",
-            "order_delivered_customer_date","order_estimated_delivery_date",
-        ],
-        parse_dates=[
-            "order_purchase_timestamp","order_approved_at",
-            "order_delivered_carrier_date","order_delivered_customer_date",
-            "order_estimated_delivery_date",
-        ],
-    )
+    if engine not in FACTS_ENGINES:
+        raise ValueError(f"Невідомий engine: {engine!r} (доступні: {', '.join(FACTS_ENGINES)})")
+    df = _facts_duckdb(data_dir, year_filter, max_orders) if engine == "duckdb" else None
+    if df is None:  # pandas-рушій (або немає Parquet-кешу для DuckDB)
+        df = _facts_pandas(data_dir, year_filter, max_orders)
+    if df.empty:
+        return df
+    # день покупки — нативний datetime64 (не Python date): фільтри й groupby без об'єктних порівнянь
+    df["purchase_date"] = df["purchase_dt"].dt.normalize()
+    with span("facts finalize"):
+        df = _finalize_facts(df)
+    return compact_facts(df) if compact else df
+
+
+def _facts_pandas(data_dir: str, year_filter=None, max_orders=None) -> pd.DataFrame:
+    # orders: фільтр по року та ліміт «найсвіжіших» проштовхуються в Parquet;
+    # дати вже типізовані схемою — без повторного парсингу
+    orders = _read_orders(data_dir, usecols=_ORDERS_COLS,
+                          year_filter=year_filter, max_orders=max_orders)
+    if orders.empty:
+        return pd.DataFrame()
+
+    # дочірні таблиці: якщо вибірка обрізана — semi-join по її order_id/customer_id ще до агрегацій
+    sliced = bool(year_filter) or isinstance(max_orders, (int, np.integer))
+    by_order = ("order_id", orders["order_id"].to_numpy()) if sliced else None
+    by_customer = ("customer_id", orders["customer_id"].dropna().to_numpy()) if sliced else None
     items = _maybe_read(data_dir, "items",
-        usecols=["order_id","product_id","price","freight_value","seller_id"])
+        usecols=["order_id","product_id","price","freight_value","seller_id"], semi_join=by_order)
     payments = _maybe_read(data_dir, "payments",
-        usecols=["order_id","payment_type","payment_installments","payment_value"])
+        usecols=["order_id","payment_type","payment_installments","payment_value"], semi_join=by_order)
     reviews = _maybe_read(data_dir, "reviews",
-        usecols=["order_id","review_score"])
+        usecols=["order_id","review_score"], semi_join=by_order)
     customers = _maybe_read(data_dir, "customers",
-        usecols=["customer_id","customer_state"])
-
-    # дати та (опційно) фільтр по року замовлення 
-    orders["order_purchase_timestamp"] = pd.to_datetime(
-        orders.get("order_purchase_timestamp"), errors="coerce"
-    )
-    if year_filter:
-        orders = orders[orders["order_purchase_timestamp"].dt.year.eq(year_filter)]
-
-    # якщо max_orders задано — беремо НАЙСВІЖІШІ max_orders; якщо None — всі дані 
-    if isinstance(max_orders, (int, np.integer)) and len(orders) > max_orders:
-        orders = orders.sort_values("order_purchase_timestamp").tail(max_orders)
+        usecols=["customer_id","customer_unique_id","customer_state"], semi_join=by_customer)
 
     # агрегати по товарах та оплатах 
-    oi = (items.groupby("order_id", as_index=False)
-          .agg(items_cnt=("product_id","count"),
-               gross_revenue=("price","sum"),
-               freight=("freight_value","sum")))
-    pay = (payments.groupby("order_id", as_index=False)
-           .agg(payment_type=("payment_type","first"),
-                installments=("payment_installments","max"),
-                paid_value=("payment_value","sum")))
+    with span("facts groupby items/payments"):
+        oi = (items.groupby("order_id", as_index=False)
+              .agg(items_cnt=("product_id","count"),
+                   gross_revenue=("price","sum"),
+                   freight=("freight_value","sum")))
+        pay = (payments.groupby("order_id", as_index=False)
+               .agg(payment_type=("payment_type","first"),
+                    installments=("payment_installments","max"),
+                    paid_value=("payment_value","sum")))
 
     # join усіх даних в один датафрейм  
-    df = (orders.merge(oi, on="order_id", how="left")
-                 .merge(pay, on="order_id", how="left")
-                 .merge(reviews, on="order_id", how="left")
-                 .merge(customers, on="customer_id", how="left"))
+    with span("facts merge"):
+        df = (orders.merge(oi, on="order_id", how="left")
+                     .merge(pay, on="order_id", how="left")
+                     .merge(reviews, on="order_id", how="left")
+                     .merge(customers, on="customer_id", how="left"))
 
     # зручні поля для аналізу
-    # дати/часи (помилки в датах → NaT) 
-    ts = pd.to_datetime(df["order_purchase_timestamp"], errors="coerce")
+    # дати/часи (помилки в датах → NaT уже на етапі читання)
+    ts = df["order_purchase_timestamp"]
     df["purchase_dt"] = ts
-    df["purchase_date"] = ts.dt.date
     df["ym"] = ts.dt.to_period("M").astype(str)
 
-    delivered = pd.to_datetime(df["order_delivered_customer_date"], errors="coerce")
-    promised  = pd.to_datetime(df["order_estimated_delivery_date"], errors="coerce")
+    delivered = df["order_delivered_customer_date"]
+    promised  = df["order_estimated_delivery_date"]
 
     df["on_time"] = (delivered <= promised)
     df["delivery_time_h"] = (delivered - ts).dt.total_seconds() / 3600.0
     df["delay_h"] = ((delivered - promised).dt.total_seconds() / 3600.0).clip(lower=0)
+    return df
 
+
+# --- той самий facts одним SQL-запитом DuckDB прямо по Parquet-кешу (усі ядра)
+_FACTS_SQL = """
+WITH o AS (
+    SELECT {orders_cols}
+    FROM read_parquet($orders)
+    {where}
+    {limit}
+),
+oi AS (
+    SELECT order_id,
+           count(product_id)  AS items_cnt,
+           sum(price)         AS gross_revenue,
+           sum(freight_value) AS freight
+    FROM read_parquet($items)
+    WHERE order_id IN (SELECT order_id FROM o)
+    GROUP BY order_id
+),
+pay AS (
+    SELECT order_id,
+           {first_payment}             AS payment_type,
+           max(payment_installments)   AS installments,
+           sum(payment_value)          AS paid_value
+    FROM read_parquet($payments)
+    WHERE order_id IN (SELECT order_id FROM o)
+    GROUP BY order_id
+),
+r AS (
+    SELECT order_id, review_score FROM read_parquet($reviews)
+    WHERE order_id IN (SELECT order_id FROM o)
+),
+c AS (
+    SELECT customer_id, {customer_unique_id} AS customer_unique_id, customer_state FROM read_parquet($customers)
+    WHERE customer_id IN (SELECT customer_id FROM o)
+)
+SELECT o.*,
+       oi.items_cnt, oi.gross_revenue, oi.freight,
+       pay.payment_type, pay.installments, pay.paid_value,
+       r.review_score, c.customer_unique_id, c.customer_state,
+       o.order_purchase_timestamp AS purchase_dt,
+       strftime(o.order_purchase_timestamp, '%Y-%m') AS ym,
+       coalesce(o.order_delivered_customer_date <= o.order_estimated_delivery_date, false) AS on_time,
+       epoch(o.order_delivered_customer_date - o.order_purchase_timestamp) / 3600.0 AS delivery_time_h,
+       CASE WHEN epoch(o.order_delivered_customer_date - o.order_estimated_delivery_date) < 0 THEN 0.0
+            ELSE epoch(o.order_delivered_customer_date - o.order_estimated_delivery_date) / 3600.0
+       END AS delay_h
+FROM o
+LEFT JOIN oi  USING (order_id)
+LEFT JOIN pay USING (order_id)
+LEFT JOIN r   USING (order_id)
+LEFT JOIN c   USING (customer_id)
+ORDER BY o.order_purchase_timestamp
+"""
+
+
+def _facts_duckdb(data_dir: str, year_filter=None, max_orders=None) -> pd.DataFrame | None:
+    """DuckDB-рушій для get_facts. None — якщо Parquet-кешу немає (тоді працює pandas-рушій)."""
+    import duckdb
+
+    names = ["orders", "items", "payments", "reviews", "customers"]
+    if os.access(data_dir, os.W_OK):
+        _ensure_tables(data_dir, names)
+    paths = {n: os.path.join(data_dir, CSV_FILES[n].replace(".csv", ".parquet")) for n in names}
+    if not all(os.path.exists(p) for p in paths.values()):
+        return None
+
+    # перший тип оплати — за payment_sequential (як у CSV), якщо така колонка є
+    pay_cols = pq.read_schema(paths["payments"]).names
+    first_payment = ("first(payment_type ORDER BY payment_sequential)"
+                     if "payment_sequential" in pay_cols else "first(payment_type)")
+    # customer_unique_id є не в кожному наборі — тоді NULL (далі підставиться customer_id)
+    cust_cols = pq.read_schema(paths["customers"]).names
+    customer_unique_id = "customer_unique_id" if "customer_unique_id" in cust_cols else "NULL::VARCHAR"
+    where, limit = "", ""
+    params = dict(paths)
+    if year_filter:
+        where = "WHERE year(order_purchase_timestamp) = $year"
+        params["year"] = int(year_filter)
+    if isinstance(max_orders, (int, np.integer)):
+        limit = "ORDER BY order_purchase_timestamp DESC LIMIT $limit"
+        params["limit"] = int(max_orders)
+    sql = _FACTS_SQL.format(orders_cols=", ".join(_ORDERS_COLS), where=where,
+                            limit=limit, first_payment=first_payment,
+                            customer_unique_id=customer_unique_id)
+    con = duckdb.connect()
+    try:
+        with span("facts duckdb"):
+            df = con.execute(sql, params).df()
+    finally:
+        con.close()
+    if df.empty:
+        return pd.DataFrame()
+    return df
+
+
+def _finalize_facts(df: pd.DataFrame) -> pd.DataFrame:
+    """Спільне для обох рушіїв: типи, заповнення пропусків і порядок колонок."""
     # числові поля (помилки → NaN або 0)    
     df["gross_revenue"] = _to_num(df.get("gross_revenue"), fill=0.0)
     df["paid_value"]    = _to_num(df.get("paid_value"), fill=0.0)
@@ -125,8 +734,302 @@ def get_facts(
     df["review_score"]  = _to_num(df.get("review_score"), fill=np.nan)
 
     # категоріальні поля (помилки → "unknown" або "NA" + економія пам'яті) 
-    df["payment_type"]   = df.get("payment_type", "unknown").fillna("unknown").astype("category")
-    df["customer_state"] = df.get("customer_state", "NA").fillna("NA").astype("category")
-    df["order_status"]   = df.get("order_status", "unknown").fillna("unknown").astype("category")
+    df["payment_type"]   = _to_cat(df.get("payment_type"), fill="unknown", index=df.index)
+    df["customer_state"] = _to_cat(df.get("customer_state"), fill="NA", index=df.index)
+    df["order_status"]   = _to_cat(df.get("order_status"), fill="unknown", index=df.index)
+
+    # справжній id клієнта (customer_id в Olist видається на кожне замовлення); немає — беремо customer_id
+    uid = df.get("customer_unique_id")
+    df["customer_unique_id"] = df["customer_id"] if uid is None else uid.fillna(df["customer_id"])
+
+    return df[_FACTS_COLUMNS]
+
+
+_FACTS_COLUMNS = _ORDERS_COLS + [
+    "items_cnt", "gross_revenue", "freight", "payment_type", "installments", "paid_value",
+    "review_score", "customer_state", "customer_unique_id", "purchase_dt", "purchase_date", "ym",
+    "on_time", "delivery_time_h", "delay_h",
+]
+
+
+# --- компактний режим facts: та сама таблиця, але в рази менше пам'яті на сесію
+# вмикається змінною середовища (для всього процесу) або compact=True у get_facts/load_facts
+FACTS_COMPACT = os.environ.get("OLIST_FACTS_COMPACT", "").lower() in ("1", "true", "yes")
+# сирі таймстемпи, яких сторінки не читають: purchase_dt — це той самий order_purchase_timestamp,
+# а з решти вже пораховані on_time / delivery_time_h / delay_h (за потреби — _read_orders з Parquet)
+COMPACT_DROP = ["order_purchase_timestamp", "order_approved_at", "order_delivered_carrier_date",
+                "order_delivered_customer_date", "order_estimated_delivery_date"]
+# гроші лишаємо float64: KPI — це суми по мільйонах рядків, float32 там уже губить долари
+# id → category (int32-коди + словник рядків у .cat.categories), але лише якщо це справді менше:
+# унікальний id на кожен рядок словник не стискає — тоді лишаємо рядок як є
+COMPACT_TYPES = {
+    "order_id":        "category",
+    "customer_id":     "category",
+    "customer_unique_id": "category",
+    "ym":              "category",
+    "delivery_time_h": "float32",
+    "delay_h":         "float32",
+    "items_cnt":       "float32",
+    "review_score":    "Int8",       # 1..5 або <NA>
+    "installments":    "int8",
+}
+
+
+@profiled()
+def compact_facts(df: pd.DataFrame) -> pd.DataFrame:
+    """Компактна копія facts: id/ym → category, години → float32, оцінка/розстрочки → int8, без сирих дат."""
+    if df.empty:
+        return df
+    out = df.drop(columns=[c for c in COMPACT_DROP if c in df.columns])
+    for col, dtype in COMPACT_TYPES.items():
+        if col not in out.columns or str(out[col].dtype) == dtype:
+            continue
+        if dtype == "Int8":
+            out[col] = pd.to_numeric(out[col], errors="coerce").round().astype("Int8")
+        elif dtype == "category":
+            cat = out[col].astype("category")
+            if cat.memory_usage(index=False, deep=True) < out[col].memory_usage(index=False, deep=True):
+                out[col] = cat
+        else:
+            out[col] = out[col].astype(dtype)
+    return out
 
+
+def _column_bytes(df: pd.DataFrame) -> pd.DataFrame:
+    """Байти й тип кожної колонки (deep=True — разом із самими рядками в object-колонках)."""
+    return pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": df.memory_usage(index=False, deep=True),
+    })
+
+
+# --- схема facts: дефолти для колонок, яких може не бути в кастомних наборах
+# (раніше кожна сторінка мала власні «страховки» — тепер вони застосовуються один раз у сховищі)
+FACTS_DEFAULTS = {
+    "gross_revenue":   0.0,
+    "paid_value":      0.0,
+    "installments":    1,
+    "payment_type":    "unknown",
+    "customer_state":  "NA",
+    "on_time":         np.nan,
+    "delivery_time_h": np.nan,
+    "delay_h":         np.nan,
+    "review_score":    np.nan,
+}
+# колонки, які приводимо до числа (помилки → NaN, потім дефолт якщо він числовий)
+FACTS_NUMERIC = ["gross_revenue", "paid_value", "delivery_time_h", "delay_h", "review_score"]
+
+
+def apply_schema_defaults(df: pd.DataFrame) -> pd.DataFrame:
+    """Доповнює facts відсутніми полями за FACTS_DEFAULTS (in-place, повертає той самий df)."""
+    if df.empty:
+        return df
+    if "purchase_dt" not in df.columns and "order_purchase_timestamp" in df.columns:
+        df["purchase_dt"] = pd.to_datetime(df["order_purchase_timestamp"], errors="coerce")
+    if "purchase_date" not in df.columns:
+        df["purchase_date"] = pd.to_datetime(df["purchase_dt"]).dt.normalize()
+    if "ym" not in df.columns:
+        df["ym"] = pd.to_datetime(df["purchase_dt"]).dt.to_period("M").astype(str)
+    for col, default in FACTS_DEFAULTS.items():
+        if col not in df.columns:
+            df[col] = default
+    for col in FACTS_NUMERIC:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+        if not pd.isna(FACTS_DEFAULTS[col]):
+            df[col] = df[col].fillna(FACTS_DEFAULTS[col])
+    # якщо немає customer_id — використовуємо order_id як сурогат (демо)
+    if "customer_id" not in df.columns or df["customer_id"].isna().all():
+        df["customer_id"] = df["order_id"]
+        df.attrs["customer_id_surrogate"] = True
+    if "customer_unique_id" not in df.columns or df["customer_unique_id"].isna().all():
+        df["customer_unique_id"] = df["customer_id"]
     return df
+
+
+# --- версія датасету: розмір + mtime усіх CSV (змінився файл → нова версія)
+# Parquet — похідний від CSV, тож враховуємо його лише тоді, коли CSV немає.
+def dataset_version(data_dir: str = DATA_DIR) -> str:
+    parts = []
+    for fn in CSV_FILES.values():
+        for path in (os.path.join(data_dir, fn), os.path.join(data_dir, fn.replace(".csv", ".parquet"))):
+            if os.path.exists(path):
+                st = os.stat(path)
+                parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+                break
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+# --- сховище facts на весь процес: одна таблиця на версію датасету
+# Зберігаємо найбільшу вже зібрану вибірку (None = всі замовлення): менший ліміт — це її «хвіст»,
+# більший — збирається заново з pushdown у Parquet і витісняє попередню.
+# Сторінки отримують зрізи (shallow-копії) і лише читають їх — ніяких .copy() всієї таблиці.
+# Запис у CACHE (сховище "facts", ключ — папка даних): (версія, ліміт, compact, facts, starts, байти по колонках
+# ДО компактизації). Розмір у бюджеті — байти колонок таблиці, яку реально тримаємо.
+_FACTS_LOCK = threading.Lock()  # будуємо facts один раз, навіть якщо кілька сесій прийшли одночасно
+
+
+def _covers(cached_limit: int | None, max_orders: int | None) -> bool:
+    return cached_limit is None or (max_orders is not None and max_orders <= cached_limit)
+
+
+def _canonical_facts(data_dir: str, max_orders: int | None,
+                     compact: bool = False) -> tuple[pd.DataFrame, np.ndarray]:
+    """Facts, відсортовані за purchase_dt, що покривають max_orders + позиції першого рядка кожного замовлення."""
+    key = os.path.abspath(data_dir)
+    version = dataset_version(data_dir)
+    with _FACTS_LOCK:
+        cached = CACHE.get("facts", key, lambda c: c[0] == version and c[2] == compact and _covers(c[1], max_orders))
+        if cached is not None:
+            return cached[3], cached[4]
+        df = get_facts(data_dir, max_orders=max_orders, engine=FACTS_ENGINE)
+        if not df.empty:
+            df = df.sort_values("purchase_dt", kind="stable").reset_index(drop=True)
+        df = apply_schema_defaults(df)
+        # рядки одного замовлення (кілька відгуків) йдуть підряд — запам'ятовуємо, де починається кожне
+        starts = (np.flatnonzero(~df["order_id"].duplicated().to_numpy())
+                  if not df.empty else np.array([], dtype=np.int64))
+        before = _column_bytes(df)
+        if compact:
+            df = compact_facts(df)
+        # попередня (менша, стара або в іншому режимі) вибірка замінюється
+        size = int((before["bytes"].sum() if not compact else _column_bytes(df)["bytes"].sum()) + starts.nbytes)
+        CACHE.put("facts", key, (version, max_orders, compact, df, starts, before), size=size)
+        return df, starts
+
+
+# --- фільтр періоду через відсортований час: O(log n) і без копіювання даних
+def period_bounds(d1, d2) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """[d1, d2] включно (дати з st.date_input) → напівінтервал [початок d1, початок дня після d2)."""
+    return pd.Timestamp(d1).normalize(), pd.Timestamp(d2).normalize() + pd.Timedelta(days=1)
+
+
+def slice_period(df: pd.DataFrame, d1, d2, col: str = "purchase_dt") -> pd.DataFrame:
+    """Рядки df з col у [d1, d2] (включно). df має бути відсортований за col — як facts зі сховища.
+
+    Межі шукаємо бінарним пошуком (searchsorted) і повертаємо iloc-зріз — view, а не копію.
+    """
+    lo, hi = period_bounds(d1, d2)
+    values = df[col].to_numpy()
+    i = values.searchsorted(lo.to_datetime64(), side="left")
+    j = values.searchsorted(hi.to_datetime64(), side="left")
+    return df.iloc[i:j]
+
+
+@profiled()
+def load_facts(data_dir: str = DATA_DIR, max_orders: int | None = None,
+               compact: bool | None = None) -> pd.DataFrame:
+    """Facts для сторінок: НАЙСВІЖІШІ max_orders замовлень (None = всі) зі спільного сховища.
+
+    Повертає shallow-копію зрізу спільної таблиці: дані не копіюються, тож сторінки
+    мають лише читати їх (нові колонки додавати можна, змінювати наявні — ні).
+    compact=None — режим процесу (FACTS_COMPACT).
+    """
+    if not isinstance(max_orders, (int, np.integer)) or max_orders <= 0:
+        max_orders = None
+    compact = FACTS_COMPACT if compact is None else bool(compact)
+    df, starts = _canonical_facts(data_dir, max_orders, compact)
+    if max_orders is not None and max_orders < len(starts):
+        df = df.iloc[starts[-max_orders]:]
+    return df.copy(deep=False)
+
+
+def memory_report(data_dir: str = DATA_DIR) -> pd.DataFrame:
+    """Пам'ять facts у сховищі по колонках: звичайні типи vs компактні (у байтах).
+
+    Якщо сховище в звичайному режимі — «після» рахується на тимчасовій компактній копії.
+    """
+    cached = CACHE.peek("facts", os.path.abspath(data_dir))
+    if cached is None:
+        return pd.DataFrame(columns=["column", "dtype_before", "bytes_before",
+                                     "dtype_after", "bytes_after", "saved_%"])
+    _, _, compact, df, _, before = cached
+    after = _column_bytes(df if compact else compact_facts(df))
+    rep = before.join(after, lsuffix="_before", rsuffix="_after", how="left")
+    rep["bytes_after"] = rep["bytes_after"].fillna(0).astype(np.int64)  # викинуті колонки → 0 байт
+    rep["dtype_after"] = rep["dtype_after"].fillna("—")
+    total = pd.DataFrame({"dtype_before": "", "bytes_before": rep["bytes_before"].sum(),
+                          "dtype_after": "", "bytes_after": rep["bytes_after"].sum()}, index=["TOTAL"])
+    rep = pd.concat([rep, total])
+    rep["saved_%"] = (1 - rep["bytes_after"] / rep["bytes_before"].where(rep["bytes_before"] > 0)) * 100
+    return rep.rename_axis("column").reset_index()
+
+
+# --- rollup-куб: адитивні міри по днях × вимірах (сторінкам не треба сканувати всі замовлення)
+ROLLUP_DIMS = ("purchase_date", "payment_type", "installments", "customer_state", "review_score", "order_status")
+# виміри, яких немає у facts, але їх легко вивести з purchase_dt
+_ROLLUP_DERIVED = {
+    "hour": lambda f: f["purchase_dt"].dt.hour,
+}
+ROLLUP_MEASURES = ("orders", "revenue", "late_revenue", "on_time_cnt",
+                   "delivered_cnt", "delivery_h_sum", "delay_cnt", "delay_h_sum")
+
+
+@profiled()
+def build_rollup(facts: pd.DataFrame, dims=ROLLUP_DIMS) -> pd.DataFrame:
+    """Матеріалізує куб: один рядок на комбінацію dims, міри — суми/кількості (їх можна додавати)."""
+    dims = list(dims)
+    if facts.empty:
+        return pd.DataFrame(columns=dims + list(ROLLUP_MEASURES))
+    on_time = facts["on_time"].fillna(False).astype(bool)
+    src = pd.DataFrame({
+        "orders":         1,
+        "revenue":        facts["gross_revenue"],
+        "late_revenue":   facts["gross_revenue"].where(~on_time, 0.0),
+        "on_time_cnt":    on_time.astype(np.int64),
+        "delivered_cnt":  facts["delivery_time_h"].notna().astype(np.int64),
+        # суми рахуємо у float64, навіть якщо facts компактний (float32)
+        "delivery_h_sum": facts["delivery_time_h"].fillna(0.0).astype(np.float64),
+        "delay_cnt":      facts["delay_h"].notna().astype(np.int64),
+        "delay_h_sum":    facts["delay_h"].fillna(0.0).astype(np.float64),
+    }, index=facts.index)
+    for d in dims:
+        src[d] = _ROLLUP_DERIVED[d](facts) if d in _ROLLUP_DERIVED else facts[d]
+    cube = (src.groupby(dims, observed=True, dropna=False, sort=True)[list(ROLLUP_MEASURES)]
+               .sum()
+               .reset_index())
+    return cube
+
+
+@profiled()
+def rollup_summary(cube: pd.DataFrame, by=None) -> pd.DataFrame:
+    """Згортає куб до by (None — один рядок «разом») і додає похідні: on_time, середні часи, AOV.
+
+    on_time — частка on-time серед УСІХ замовлень (як mean по bool-колонці facts),
+    delivery_time_h / delay_h — середні серед замовлень, де час відомий.
+    """
+    measures = list(ROLLUP_MEASURES)
+    if by is None:
+        out = cube[measures].sum().to_frame().T
+    else:
+        by = [by] if isinstance(by, str) else list(by)
+        out = cube.groupby(by, observed=True, dropna=False, sort=True)[measures].sum().reset_index()
+    orders = out["orders"].where(out["orders"] > 0)
+    out["on_time"] = out["on_time_cnt"] / orders
+    out["delivery_time_h"] = out["delivery_h_sum"] / out["delivered_cnt"].where(out["delivered_cnt"] > 0)
+    out["delay_h"] = out["delay_h_sum"] / out["delay_cnt"].where(out["delay_cnt"] > 0)
+    out["AOV"] = out["revenue"] / orders
+    return out
+
+
+@profiled()
+def rollup_period(cube: pd.DataFrame, d1, d2) -> pd.DataFrame:
+    """Рядки куба за період [d1, d2] (включно). Куб з purchase_date першим виміром уже відсортований."""
+    if cube["purchase_date"].is_monotonic_increasing:
+        return slice_period(cube, d1, d2, col="purchase_date")
+    lo, hi = period_bounds(d1, d2)
+    return cube[(cube["purchase_date"] >= lo) & (cube["purchase_date"] < hi)]
+
+
+def load_rollup(data_dir: str = DATA_DIR, max_orders: int | None = None, dims=ROLLUP_DIMS) -> pd.DataFrame:
+    """Куб для тієї ж вибірки, що й load_facts(data_dir, max_orders); будується один раз на версію датасету."""
+    version = dataset_version(data_dir)
+    key = (os.path.abspath(data_dir), max_orders if isinstance(max_orders, (int, np.integer)) and max_orders > 0 else None,
+           tuple(dims))
+    cached = CACHE.get("rollup", key, lambda c: c[0] == version)
+    if cached is not None:
+        return cached[1]
+    cube = build_rollup(load_facts(data_dir, max_orders), dims)
+    # кубів старих версій не тримаємо; кубів інших лімітів — скільки влізе в бюджет CACHE
+    CACHE.discard("rollup", lambda k, v: k[0] == key[0] and v[0] != version)
+    CACHE.put("rollup", key, (version, cube))
+    return cube
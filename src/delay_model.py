@@ -0,0 +1,285 @@
+# src/delay_model.py
+# модель ризику прострочки: пайплайн + реєстр навчених моделей на диску (joblib)
+# ключ моделі = відбиток навчальної таблиці + гіперпараметри → однакові дані не перенавчаються
+from __future__ import annotations
+import os
+import hashlib
+import json
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+
+from src.cache import CACHE
+from src.data import DATA_DIR, CSV_FILES, _maybe_read, _ensure_tables, dataset_version
+from src.features import model_feature_table
+from src.profiling import profiled, span
+
+# --- ознаки моделі (відомі на момент покупки, до доставки)
+TRAIN_COLS_NUM = ["weekday", "hour", "promised_days", "items_cnt",
+                  "freight_value", "total_weight_kg", "total_volume_dm3",
+                  "payment_installments", "same_state"]
+TRAIN_COLS_CAT = ["payment_type", "customer_state", "seller_state"]
+TARGET = "late"
+
+# --- гіперпараметри за замовчуванням (split теж входить у ключ: інший split → інші тестові ймовірності)
+DEFAULT_PARAMS = {
+    "C": 1.0,
+    "max_iter": 1000,
+    "class_weight": "balanced",
+    "test_size": 0.2,
+    "random_state": 42,
+}
+MODELS_SUBDIR = "models"
+# версія формату запису в реєстрі (змінили вміст — старі файли просто ігноруються)
+REGISTRY_VERSION = 2
+
+# моделі в пам'яті процесу — у спільному кеші (src.cache, сховище "model"), щоб не читати joblib на кожен rerun;
+# витіснена модель повернеться з реєстру на диску
+_MODELS_LOCK = threading.Lock()
+
+
+def build_pipeline(params: dict | None = None) -> Pipeline:
+    """One-Hot для категорій + логістична регресія (sparse матриця, solver='saga')."""
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    pre = ColumnTransformer(
+        transformers=[("cat", OneHotEncoder(handle_unknown="ignore"), TRAIN_COLS_CAT)],
+        remainder="passthrough"
+    )
+    clf = LogisticRegression(
+        solver="saga",        # підтримує sparse, добре працює з OHE
+        C=p["C"],
+        max_iter=p["max_iter"],
+        class_weight=p["class_weight"],
+    )
+    return Pipeline([("pre", pre), ("clf", clf)])
+
+
+def data_fingerprint(data: pd.DataFrame) -> str:
+    """Відбиток навчальної таблиці: хеш значень усіх рядків + назви/типи колонок."""
+    cols = TRAIN_COLS_NUM + TRAIN_COLS_CAT + [TARGET]
+    h = hashlib.sha1()
+    h.update(json.dumps([(c, str(data[c].dtype)) for c in cols]).encode())
+    h.update(pd.util.hash_pandas_object(data[cols], index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def training_fingerprint(data: pd.DataFrame, data_dir: str = DATA_DIR, max_orders: int | None = None) -> str:
+    """Відбиток training_table(data_dir, max_orders) — хешуємо таблицю раз на версію датасету, далі з кешу.
+
+    data має бути саме цією таблицею (ознаки будуються детерміновано, тож версія + ліміт її визначають);
+    без цього кожен rerun Delay Risk (навіть лише зміна порога) хешував би всі рядки заново.
+    """
+    if not isinstance(max_orders, (int, np.integer)) or max_orders <= 0:
+        max_orders = None
+    version = dataset_version(data_dir)
+    key = (os.path.abspath(data_dir), max_orders)
+    cached = CACHE.get("model_fingerprint", key, lambda c: c[0] == version)
+    if cached is not None:
+        return cached[1]
+    fingerprint = data_fingerprint(data)
+    CACHE.put("model_fingerprint", key, (version, fingerprint))
+    return fingerprint
+
+
+def model_key(fingerprint: str, params: dict | None = None) -> str:
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    raw = json.dumps({"data": fingerprint, "params": p, "v": REGISTRY_VERSION}, sort_keys=True)
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def _model_path(data_dir: str, key: str) -> str:
+    return os.path.join(data_dir, MODELS_SUBDIR, f"delay_risk_{key}.joblib")
+
+
+@profiled()
+def train_model(data: pd.DataFrame, params: dict | None = None) -> dict:
+    """Навчає пайплайн і повертає запис реєстру: модель + тестові ймовірності (для порогів/метрик)."""
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    X = data[TRAIN_COLS_NUM + TRAIN_COLS_CAT]
+    y = data[TARGET].astype(int)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=p["test_size"], stratify=y, random_state=p["random_state"]
+    )
+    pipe = build_pipeline(p)
+    t0 = time.perf_counter()
+    pipe.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - t0
+    # середні ознаки навчальної вибірки (після OHE) — база для «головного фактора» при скорингу
+    means = np.asarray(pipe.named_steps["pre"].transform(X_train).mean(axis=0)).ravel()
+    return {
+        "pipe": pipe,
+        "params": p,
+        "feature_means": means,
+        "proba": pipe.predict_proba(X_test)[:, 1],
+        "y_test": y_test.to_numpy(),
+        "n_train": len(X_train),
+        "fit_seconds": fit_seconds,
+        "trained_at": time.time(),
+    }
+
+
+def get_model(data: pd.DataFrame, params: dict | None = None,
+              data_dir: str = DATA_DIR, fingerprint: str | None = None) -> tuple[dict, str]:
+    """Модель з реєстру (пам'ять → диск) або навчена заново й збережена.
+
+    fingerprint — готовий відбиток data (training_fingerprint); None — рахуємо тут (хеш усіх рядків).
+    Повертає (запис, джерело), де джерело — "memory", "disk" або "trained".
+    """
+    key = model_key(fingerprint or data_fingerprint(data), params)
+    with _MODELS_LOCK:
+        entry = CACHE.get("model", key)  # диск чи навчання — все одно промах пам'яті процесу
+        if entry is not None:
+            return entry, "memory"
+        path = _model_path(data_dir, key)
+        if os.path.exists(path):
+            try:
+                with span("model load"):
+                    entry = joblib.load(path)
+                CACHE.put("model", key, entry)
+                return entry, "disk"
+            except Exception:
+                pass  # битий файл (або інша версія sklearn) — просто перенавчимо
+        entry = train_model(data, params)
+        entry["key"] = key
+        # зберігаємо атомарно: спершу .tmp, потім os.replace (якщо data/ лише для читання — тільки пам'ять)
+        if os.access(data_dir, os.W_OK):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            joblib.dump(entry, path + ".tmp")
+            os.replace(path + ".tmp", path)
+        CACHE.put("model", key, entry)
+        return entry, "trained"
+
+
+def _feature_names(pipe: Pipeline) -> list[str]:
+    """Імена колонок після препроцесингу: one-hot фічі з навченого OHE + числові."""
+    ohe: OneHotEncoder = pipe.named_steps["pre"].named_transformers_["cat"]
+    cat_feature_names = []
+    for col, cats in zip(TRAIN_COLS_CAT, ohe.categories_):
+        cat_feature_names.extend([f"{col}={c}" for c in cats])
+    return cat_feature_names + TRAIN_COLS_NUM
+
+
+@profiled()
+def feature_importance(pipe: Pipeline, top: int = 20) -> pd.DataFrame:
+    """Топ-ознаки за модулем коефіцієнта (імена one-hot фіч беремо з навченого OHE)."""
+    feature_names = _feature_names(pipe)
+    coefs = pipe.named_steps["clf"].coef_[0]
+    # на випадок, якщо довжини раптом не співпадуть (різні версії sklearn) — обрізаємо до мінімальної
+    n = min(len(feature_names), len(coefs))
+    return (pd.DataFrame({"feature": feature_names[:n], "coef": coefs[:n]})
+            .assign(abscoef=lambda d: d["coef"].abs())
+            .sort_values("abscoef", ascending=False)
+            .head(top))
+
+
+def confusion_at(y_test: np.ndarray, proba: np.ndarray, th: float) -> np.ndarray:
+    """Матриця помилок для порогу th — лише перерахунок по збережених ймовірностях."""
+    pred = proba >= th
+    y = np.asarray(y_test).astype(bool)
+    return np.array([[np.sum(~y & ~pred), np.sum(~y & pred)],
+                     [np.sum(y & ~pred),  np.sum(y & pred)]])
+
+
+# --- пакетний скоринг відкритих замовлень: чанками, з записом у Parquet (пам'ять не росте з беклогом)
+OPEN_STATUSES = ("shipped", "processing", "invoiced")
+SCORE_CHUNK = 50_000
+SCORES_SUBDIR = "scores"
+_SCORE_ORDER_COLS = ["order_id", "customer_id", "order_status", "order_purchase_timestamp",
+                     "order_estimated_delivery_date"]
+SCORES_SCHEMA = pa.schema([("order_id", pa.string()), ("p_late", pa.float32()), ("top_factor", pa.string())])
+
+
+def scores_path(data_dir: str, key: str) -> str:
+    return os.path.join(data_dir, SCORES_SUBDIR, f"open_orders_{key}.parquet")
+
+
+def _iter_open_orders(data_dir: str, statuses, chunk_size: int):
+    """Відкриті замовлення чанками по chunk_size: з Parquet — потоком record batch-ів, інакше — з CSV."""
+    pq_path = os.path.join(data_dir, CSV_FILES["orders"].replace(".csv", ".parquet"))
+    flt = ds.field("order_status").isin(pa.array(list(statuses)))
+    if os.access(data_dir, os.W_OK):
+        _ensure_tables(data_dir, ["orders"])  # застарілий кеш не скоримо
+    if os.path.exists(pq_path):
+        dataset = ds.dataset(pq_path, format="parquet")
+        cols = [c for c in _SCORE_ORDER_COLS if c in dataset.schema.names]
+        # row group-и приходять шматками ≤ chunk_size; збираємо їх до чанка (< 2 × chunk_size рядків)
+        buf, n = [], 0
+        for batch in dataset.to_batches(columns=cols, filter=flt, batch_size=chunk_size):
+            buf.append(batch)
+            n += batch.num_rows
+            if n >= chunk_size:
+                yield pa.Table.from_batches(buf).to_pandas()
+                buf, n = [], 0
+        if n:
+            yield pa.Table.from_batches(buf).to_pandas()
+        return
+    orders = _maybe_read(data_dir, "orders", usecols=_SCORE_ORDER_COLS, filter=flt)
+    for i in range(0, len(orders), chunk_size):
+        yield orders.iloc[i:i + chunk_size]
+
+
+def _top_factors(entry: dict, X: pd.DataFrame) -> np.ndarray:
+    """Ознака, що найбільше підняла ризик відносно середнього замовлення: max(coef · (x − середнє))."""
+    pipe = entry["pipe"]
+    Xt = pipe.named_steps["pre"].transform(X)
+    Xt = Xt.toarray() if hasattr(Xt, "toarray") else np.asarray(Xt)
+    contrib = (Xt - entry["feature_means"]) * pipe.named_steps["clf"].coef_[0]
+    names = np.asarray(_feature_names(pipe), dtype=object)
+    return names[contrib.argmax(axis=1)]
+
+
+@profiled()
+def score_open_orders(entry: dict, data_dir: str = DATA_DIR, statuses=OPEN_STATUSES,
+                      chunk_size: int = SCORE_CHUNK, out_path: str | None = None) -> dict:
+    """Проганяє відкриті замовлення через модель чанками й пише order_id, p_late, top_factor у Parquet.
+
+    У пам'яті одночасно лише один чанк (ознаки товарів теж рахуються по чанку).
+    Повертає статистику: rows, chunks, seconds, rows_per_sec, path.
+    """
+    out_path = out_path or scores_path(data_dir, entry["key"])
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp = out_path + ".tmp"
+    rows = chunks = 0
+    t0 = time.perf_counter()
+    try:
+        with pq.ParquetWriter(tmp, SCORES_SCHEMA) as writer:
+            for orders in _iter_open_orders(data_dir, statuses, chunk_size):
+                X = model_feature_table(orders, data_dir, per_chunk=True)[TRAIN_COLS_NUM + TRAIN_COLS_CAT]
+                p_late = entry["pipe"].predict_proba(X)[:, 1]
+                writer.write_table(pa.table({
+                    "order_id": pa.array(orders["order_id"].astype(str).to_numpy(), pa.string()),
+                    "p_late": pa.array(p_late, pa.float32()),
+                    "top_factor": pa.array(_top_factors(entry, X), pa.string()),
+                }, schema=SCORES_SCHEMA))
+                rows += len(orders)
+                chunks += 1
+        os.replace(tmp, out_path)
+    except BaseException:
+        # чанк упав (чи скоринг перервали) — недописаний файл не лишаємо; попередня черга out_path не чіпається
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    seconds = time.perf_counter() - t0
+    return {"rows": rows, "chunks": chunks, "seconds": seconds,
+            "rows_per_sec": rows / seconds if seconds > 0 else float("nan"), "path": out_path}
+
+
+def load_scores(data_dir: str, key: str) -> pd.DataFrame:
+    """Збережена черга ризику для моделі key (порожньо, якщо скоринг ще не запускали)."""
+    path = scores_path(data_dir, key)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=SCORES_SCHEMA.names)
+    return pd.read_parquet(path)
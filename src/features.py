@@ -0,0 +1,198 @@
+# src/features.py
+# ознаки на рівні замовлення (товари, продавці, обіцяний строк) — спільні для Delay Risk і Geo-SLA
+# читаємо з Parquet-кешу через src.data, усе векторно (без lambda на кожне замовлення)
+from __future__ import annotations
+import os
+import numpy as np
+import pandas as pd
+
+from src.cache import CACHE
+from src.data import DATA_DIR, _maybe_read, _read_orders, dataset_version, load_facts
+from src.profiling import span
+
+# --- ознаки замовлення, які рахуються з товарів/продавців (одна строка на order_id)
+ORDER_FEATURES = ["items_cnt", "freight_value", "total_weight_kg", "total_volume_dm3", "seller_state"]
+# --- ознаки моделі ризику (відомі на момент покупки, до доставки) + мітка
+MODEL_FEATURES = ["weekday", "hour", "promised_days", "items_cnt",
+                  "freight_value", "total_weight_kg", "total_volume_dm3",
+                  "payment_type", "payment_installments",
+                  "customer_state", "seller_state", "same_state"]
+TARGET = "late"
+
+def _cached(key: tuple, data_dir: str, build):
+    """Один результат на версію датасету в спільному кеші процесу (src.cache; старі версії прибираємо)."""
+    version = dataset_version(data_dir)
+    store = f"features.{key[1]}"
+    cached = CACHE.get(store, key, lambda c: c[0] == version)
+    if cached is not None:
+        return cached[1]
+    with span(f"features {key[1]}"):
+        df = build()
+    CACHE.discard(store, lambda k, v: k[:2] == key[:2] and v[0] != version)
+    CACHE.put(store, key, (version, df))
+    return df
+
+
+def seller_state_mode(items: pd.DataFrame, sellers: pd.DataFrame) -> pd.DataFrame:
+    """Найчастіший штат продавця в кожному замовленні (як Series.mode: при рівності — перший за алфавітом).
+
+    Замість groupby(...).agg(lambda s: s.mode()...) — value_counts по парах (order_id, штат)
+    і idxmax по лічильниках. Замовлення без відомого штату в результат не потрапляють.
+    """
+    if items.empty or sellers.empty:
+        return pd.DataFrame(columns=["order_id", "seller_state"])
+    pairs = items[["order_id", "seller_id"]].merge(sellers[["seller_id", "seller_state"]],
+                                                   on="seller_id", how="left")
+    # спершу прибираємо невідомі штати (і продавців, яких нема в довіднику): після astype(str)
+    # на pandas 2.x NaN стає рядком "nan" і dropna його вже не бачить
+    pairs = pairs.dropna(subset=["seller_state"])
+    # категорію → рядок: value_counts по категорії рахує і невживані штати
+    pairs["seller_state"] = pairs["seller_state"].astype(str)
+    cnt = (pairs.value_counts(["order_id", "seller_state"], sort=False)
+                .reset_index(name="n")
+                .sort_values(["order_id", "seller_state"], kind="stable")
+                .reset_index(drop=True))
+    best = cnt.groupby("order_id", sort=False)["n"].idxmax()
+    return cnt.loc[best.to_numpy(), ["order_id", "seller_state"]].reset_index(drop=True)
+
+
+def _build_order_features(data_dir: str, order_ids=None) -> pd.DataFrame:
+    semi_join = ("order_id", np.asarray(order_ids)) if order_ids is not None else None
+    items = _maybe_read(data_dir, "items", usecols=["order_id", "product_id", "seller_id", "freight_value"],
+                        semi_join=semi_join)
+    if items.empty:
+        return pd.DataFrame(columns=["order_id"] + ORDER_FEATURES)
+    # для пакета замовлень — лише товари й продавці з його items (не весь довідник на кожен чанк)
+    by_product = by_seller = None
+    if order_ids is not None:
+        by_product = ("product_id", items["product_id"].dropna().unique())
+        by_seller = ("seller_id", items["seller_id"].dropna().unique())
+    products = _maybe_read(data_dir, "products",
+                           usecols=["product_id", "product_weight_g", "product_length_cm",
+                                    "product_height_cm", "product_width_cm"],
+                           semi_join=by_product)
+    sellers = _maybe_read(data_dir, "sellers", usecols=["seller_id", "seller_state"], semi_join=by_seller)
+
+    # вага/об'єм кожного товару (немає товару в довіднику → 0)
+    if not products.empty:
+        items = items.merge(products, on="product_id", how="left")
+    dims = {c: (items[c] if c in items.columns else pd.Series(np.nan, index=items.index))
+                .astype(np.float64).fillna(0.0)
+            for c in ["product_weight_g", "product_length_cm", "product_height_cm", "product_width_cm"]}
+    items["weight_kg"] = dims["product_weight_g"] / 1000.0
+    # см^3 → дм^3
+    items["volume_dm3"] = dims["product_length_cm"] * dims["product_height_cm"] * dims["product_width_cm"] / 1000.0
+
+    feats = (items.groupby("order_id", sort=False)
+                  .agg(items_cnt=("product_id", "count"),
+                       freight_value=("freight_value", "sum"),
+                       total_weight_kg=("weight_kg", "sum"),
+                       total_volume_dm3=("volume_dm3", "sum"))
+                  .reset_index())
+    feats = feats.merge(seller_state_mode(items, sellers), on="order_id", how="left")
+    return feats[["order_id"] + ORDER_FEATURES]
+
+
+def order_features(data_dir: str = DATA_DIR, order_ids=None) -> pd.DataFrame:
+    """Ознаки по товарах для кожного замовлення: items_cnt, freight_value, вага, об'єм, seller_state (mode).
+
+    Без order_ids — по всіх замовленнях, один раз на версію датасету (результат спільний — лише читати).
+    З order_ids — лише для цих замовлень (semi-join у скані items, а за ними products і sellers), без кешу:
+    для пакетної обробки.
+    """
+    if order_ids is not None:
+        return _build_order_features(data_dir, order_ids)
+    return _cached((os.path.abspath(data_dir), "order_features"), data_dir,
+                   lambda: _build_order_features(data_dir))
+
+
+def model_feature_table(orders: pd.DataFrame, data_dir: str = DATA_DIR, per_chunk: bool = False) -> pd.DataFrame:
+    """orders (order_id, customer_id, дати) → ознаки моделі ризику (MODEL_FEATURES) по рядку на замовлення.
+
+    per_chunk=True — ознаки товарів рахуються лише для цих orders (обмежена пам'ять при пакетному скорингу).
+    """
+    df = orders.copy()
+    ts = df["order_purchase_timestamp"]
+    df["weekday"] = ts.dt.weekday
+    df["hour"] = ts.dt.hour
+    # «обіцяні» дні на доставку (для порівняння з реальною доставкою)
+    df["promised_days"] = (df["order_estimated_delivery_date"] - ts).dt.total_seconds() / 86400.0
+
+    by_order = ("order_id", df["order_id"].to_numpy())
+    customers = _maybe_read(data_dir, "customers", usecols=["customer_id", "customer_state"],
+                            semi_join=("customer_id", df["customer_id"].dropna().to_numpy()))
+    payments = _maybe_read(data_dir, "payments",
+                           usecols=["order_id", "payment_sequential", "payment_type", "payment_installments"],
+                           semi_join=by_order)
+    # одна строка на замовлення: перший тип оплати (за payment_sequential) і максимум розстрочок
+    if not payments.empty:
+        if "payment_sequential" in payments.columns:
+            payments = payments.sort_values(["order_id", "payment_sequential"], kind="stable")
+        payments = (payments.groupby("order_id", as_index=False, sort=False)
+                            .agg(payment_type=("payment_type", "first"),
+                                 payment_installments=("payment_installments", "max")))
+    else:
+        payments = pd.DataFrame(columns=["order_id", "payment_type", "payment_installments"])
+    if customers.empty:
+        customers = pd.DataFrame(columns=["customer_id", "customer_state"])
+
+    df = (df.merge(customers, on="customer_id", how="left")
+            .merge(payments, on="order_id", how="left")
+            .merge(order_features(data_dir, by_order[1] if per_chunk else None), on="order_id", how="left"))
+
+    # заповнення пропусків і приведення типів (категорії → рядки: OHE не любить змішані типи)
+    for col in ["payment_type", "customer_state", "seller_state"]:
+        df[col] = df[col].astype(object)
+    df["same_state"] = (df["customer_state"] == df["seller_state"]).astype(int)
+    df["items_cnt"] = pd.to_numeric(df["items_cnt"], errors="coerce").fillna(1)
+    for col in ["freight_value", "total_weight_kg", "total_volume_dm3"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0.0)
+    df["payment_installments"] = pd.to_numeric(df["payment_installments"], errors="coerce").fillna(1)
+    return df
+
+
+def _build_training_table(data_dir: str, max_orders: int | None) -> pd.DataFrame:
+    cols = ["order_id", "customer_id", "order_status", "order_purchase_timestamp",
+            "order_delivered_customer_date", "order_estimated_delivery_date"]
+    orders = _read_orders(data_dir, usecols=cols)
+    if orders.empty:
+        return pd.DataFrame(columns=MODEL_FEATURES + [TARGET])
+    # беремо тільки доставлені замовлення
+    orders = orders[orders["order_status"] == "delivered"]
+    # опційний ліміт: тільки з головної (для хмари), інакше — всі
+    if max_orders and len(orders) > max_orders:
+        orders = orders.sort_values("order_purchase_timestamp", kind="stable").head(max_orders)
+    orders = orders.assign(late=(orders["order_delivered_customer_date"] >
+                                 orders["order_estimated_delivery_date"]).astype(int))
+    df = model_feature_table(orders, data_dir)
+    return df[MODEL_FEATURES + [TARGET]].reset_index(drop=True)
+
+
+def training_table(data_dir: str = DATA_DIR, max_orders: int | None = None) -> pd.DataFrame:
+    """Навчальна таблиця Delay Risk: доставлені замовлення (перші max_orders за часом), ознаки + late."""
+    if not isinstance(max_orders, (int, np.integer)) or max_orders <= 0:
+        max_orders = None
+    return _cached((os.path.abspath(data_dir), "training", max_orders), data_dir,
+                   lambda: _build_training_table(data_dir, max_orders))
+
+
+def _build_seller_states(data_dir: str, max_orders: int | None) -> pd.Series:
+    order_ids = load_facts(data_dir, max_orders)["order_id"].unique()
+    # лише items/sellers цих замовлень (semi-join у скані items) — без ваги/об'єму з products
+    items = _maybe_read(data_dir, "items", usecols=["order_id", "seller_id"], semi_join=("order_id", order_ids))
+    sellers = _maybe_read(data_dir, "sellers", usecols=["seller_id", "seller_state"])
+    modes = seller_state_mode(items, sellers)
+    return pd.Series(modes["seller_state"].to_numpy(), index=pd.Index(modes["order_id"], name="order_id"),
+                     name="seller_state")
+
+
+def seller_states(data_dir: str = DATA_DIR, max_orders: int | None = None) -> pd.Series:
+    """order_id → seller_state (найчастіший штат продавця в замовленні) для замовлень load_facts(data_dir, max_orders).
+
+    Для Geo-SLA: сторінка мапить це на зріз періоду (view["order_id"].map(...)), а не merge-ить усі facts.
+    Замовлення без відомого штату в індекс не потрапляють. Результат спільний — лише читати.
+    """
+    if not isinstance(max_orders, (int, np.integer)) or max_orders <= 0:
+        max_orders = None
+    return _cached((os.path.abspath(data_dir), "seller_states", max_orders), data_dir,
+                   lambda: _build_seller_states(data_dir, max_orders))
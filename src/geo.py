@@ -0,0 +1,41 @@
+# src/geo.py
+# Geo-SLA: агрегація доставки по штатах (customer_state / seller_state) + координати для карти
+# без streamlit — сторінка pages/8_Geo_SLA.py лише малює, бенч (bench/suite.py) міряє цю ж функцію.
+from __future__ import annotations
+import pandas as pd
+
+from src.profiling import profiled
+
+# Координати столиць штатів Бразилії (приблизні)
+BR_STATE_CENTERS = {
+    "AC": (-9.975, -67.824), "AL": (-9.649, -35.708), "AP": (0.035, -51.070),
+    "AM": (-3.118, -60.021), "BA": (-12.971, -38.501), "CE": (-3.732, -38.526),
+    "DF": (-15.793, -47.882), "ES": (-20.315, -40.312), "GO": (-16.686, -49.264),
+    "MA": (-2.530, -44.306), "MT": (-15.601, -56.097), "MS": (-20.469, -54.620),
+    "MG": (-19.916, -43.934), "PA": (-1.456, -48.503), "PB": (-7.115, -34.861),
+    "PR": (-25.428, -49.273), "PE": (-8.047, -34.877), "PI": (-5.094, -42.804),
+    "RJ": (-22.906, -43.172), "RN": (-5.794, -35.199), "RS": (-30.034, -51.230),
+    "RO": (-8.761, -63.903), "RR": (2.823, -60.675), "SC": (-27.595, -48.548),
+    "SP": (-23.550, -46.633), "SE": (-10.911, -37.071), "TO": (-10.184, -48.333)
+}
+
+
+@profiled()
+def state_sla(view: pd.DataFrame, group_col: str = "customer_state") -> pd.DataFrame:
+    """Штат → orders, on_time_rate, avg_delivery_days, avg_delay_days, lat, lon (лише геокодовані штати).
+
+    Середні рахуємо в годинах і ділимо на 24 вже по штатах — без двох нових колонок на кожне замовлення.
+    """
+    agg = (view.groupby(group_col, dropna=False, observed=True)
+           .agg(orders=("order_id", "count"),
+                on_time_rate=("on_time", "mean"),
+                avg_delivery_days=("delivery_time_h", "mean"),
+                avg_delay_days=("delay_h", "mean"))
+           .reset_index()
+           .rename(columns={group_col: "state"}))
+    agg["avg_delivery_days"] /= 24.0
+    agg["avg_delay_days"] /= 24.0
+    centers = agg["state"].astype(object).map(BR_STATE_CENTERS)
+    agg["lat"] = centers.str[0]
+    agg["lon"] = centers.str[1]
+    return agg.dropna(subset=["lat", "lon"]).reset_index(drop=True)
@@ -0,0 +1,92 @@
+# src/ingest.py
+# холодний старт: завантаження датасету з Release з обмеженою пам'яттю
+# ZIP качаємо потоком на диск → розпаковуємо лише CSV з CSV_FILES → CSV → Parquet record batch-ами.
+# Нічого з цього не тримає весь архів/таблицю в пам'яті, тож пік RSS не залежить від розміру датасету.
+from __future__ import annotations
+import os
+import sys
+import shutil
+import time
+import zipfile
+import requests
+
+from src.data import DATA_DIR, CSV_FILES, ensure_parquet_cache
+
+DOWNLOAD_CHUNK = 1 << 20  # байт на один шматок завантаження/розпаковки
+ZIP_PART = "_release.zip.part"
+
+
+def peak_rss_mb() -> float | None:
+    """Пік RSS процесу в МБ (None там, де немає ні /proc, ні модуля resource, напр. Windows).
+
+    На Linux беремо VmHWM з /proc: ru_maxrss успадковується від батьківського процесу через fork/exec.
+    """
+    try:
+        with open("/proc/self/status", encoding="ascii") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux віддає КБ, macOS — байти
+    return rss / (1 << 20) if sys.platform == "darwin" else rss / 1024
+
+
+def download_file(url: str, dest: str, timeout: int = 60, chunk_size: int = DOWNLOAD_CHUNK) -> int:
+    """Качає url у файл dest шматками по chunk_size (відповідь не збирається в пам'яті). Повертає байти."""
+    size = 0
+    with requests.get(url, stream=True, allow_redirects=True, timeout=timeout) as r:
+        r.raise_for_status()
+        with open(dest + ".tmp", "wb") as fh:
+            for block in r.iter_content(chunk_size=chunk_size):
+                fh.write(block)
+                size += len(block)
+    os.replace(dest + ".tmp", dest)
+    return size
+
+
+def extract_csvs(zip_path: str, data_dir: str = DATA_DIR, chunk_size: int = DOWNLOAD_CHUNK) -> list[str]:
+    """Розпаковує з архіву лише файли з CSV_FILES (за іменем, без урахування папок у ZIP).
+
+    Решту членів архіву пропускаємо; шляхи з архіву не використовуємо (лише basename),
+    тож «../» у ZIP нічого не запише поза data_dir. Повертає список розпакованих імен.
+    """
+    wanted = set(CSV_FILES.values())
+    done = []
+    with zipfile.ZipFile(zip_path) as z:
+        for info in z.infolist():
+            fn = os.path.basename(info.filename)
+            if info.is_dir() or fn not in wanted or fn in done:
+                continue
+            dest = os.path.join(data_dir, fn)
+            with z.open(info) as src, open(dest + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst, chunk_size)
+            os.replace(dest + ".tmp", dest)
+            done.append(fn)
+    return done
+
+
+def ingest_release(url: str, data_dir: str = DATA_DIR, timeout: int = 60) -> dict:
+    """Завантаження з Release «під ключ»: ZIP на диск → потрібні CSV → Parquet-кеш. ZIP потім видаляємо.
+
+    Помилки мережі/архіву (requests.RequestException, zipfile.BadZipFile) не ловимо — їх показує UI.
+    Повертає статистику: bytes, csv, parquet, seconds, peak_rss_mb.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    zip_path = os.path.join(data_dir, ZIP_PART)
+    t0 = time.perf_counter()
+    try:
+        size = download_file(url, zip_path, timeout=timeout)
+        extracted = extract_csvs(zip_path, data_dir)
+    finally:
+        for p in (zip_path, zip_path + ".tmp"):
+            if os.path.exists(p):
+                os.remove(p)
+    rebuilt = ensure_parquet_cache(data_dir)  # CSV → Parquet потоком (src/data.py: csv_to_parquet)
+    return {"bytes": size, "csv": extracted, "parquet": rebuilt,
+            "seconds": time.perf_counter() - t0, "peak_rss_mb": peak_rss_mb()}
@@ -0,0 +1,214 @@
+# src/llm.py
+# відповіді LLM для сторінки агента: потоком (по токенах), з дисковим кешем і змінним бекендом
+# Бекенд — будь-що з методом stream(messages) → ітератор шматків тексту:
+#   OpenAIBackend — справжній OpenAI (або сумісний сервер через base_url), пакет openai потрібен лише йому;
+#   StubBackend   — локальний детермінований сервер (src/llm_stub.py): без мережі й ключа, для тестів і бенчів.
+# Кеш: ключ = бекенд + модель + промпт + період + версія датасету; запис живе LLM_CACHE_TTL_S секунд.
+from __future__ import annotations
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+import requests
+
+from src.data import DATA_DIR
+
+LLM_CACHE_DIR = os.environ.get("OLIST_LLM_CACHE_DIR", os.path.join(DATA_DIR, "_llm_cache"))
+LLM_CACHE_TTL_S = float(os.environ.get("OLIST_LLM_CACHE_TTL", str(24 * 3600)))  # добу відповідь вважаємо свіжою
+LLM_MODEL = "gpt-4o-mini"
+
+SYSTEM_PROMPT = (
+    "You are a business analytics copilot for an e-commerce dataset (Olist). "
+    "Be concise. When user asks for specific metrics or slices, pick the best tool: "
+    "kpis, trend, payments_breakdown, reviews_summary, rfm, roi_reduce_late. "
+    "Always include a practical recommendation (process optimization / marketing / SLA)."
+)
+
+
+def chat_messages(prompt: str) -> list[dict]:
+    return [{"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}]
+
+
+# --- бекенди
+class LLMBackend(ABC):
+    """Інтерфейс бекенду: name і model (для ключа кешу) і stream(messages) → шматки відповіді по мірі генерації.
+
+    Абстрактний: бекенд без stream не створиться взагалі (TypeError), а не впаде посеред відповіді.
+    """
+    name: str
+    model: str = ""
+
+    @abstractmethod
+    def stream(self, messages: list[dict]) -> Iterator[str]:
+        """Шматки тексту відповіді на messages (формат chat completions) по мірі генерації."""
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = LLM_MODEL, base_url: str | None = None,
+                 temperature: float = 0.3):
+        from openai import OpenAI  # опційна залежність — імпортуємо лише коли бекенд справді потрібен
+        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.model = model
+        self.temperature = temperature
+
+    def stream(self, messages: list[dict]) -> Iterator[str]:
+        resp = self.client.chat.completions.create(model=self.model, messages=messages,
+                                                   temperature=self.temperature, stream=True)
+        for chunk in resp:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class StubBackend(LLMBackend):
+    """Клієнт до локального stub-сервера (той самий SSE-формат /v1/chat/completions, що й в OpenAI)."""
+    name = "stub"
+
+    def __init__(self, base_url: str, model: str = "stub", timeout: int = 30):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+
+    def stream(self, messages: list[dict]) -> Iterator[str]:
+        with requests.post(f"{self.base_url}/v1/chat/completions", stream=True, timeout=self.timeout,
+                           json={"model": self.model, "messages": messages, "stream": True}) as r:
+            r.raise_for_status()
+            r.encoding = "utf-8"  # SSE завжди utf-8; без charset у заголовку requests вгадав би latin1
+            for line in r.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                data = line[len("data: "):]
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
+
+
+def make_backend(kind: str | None = None, api_key: str | None = None,
+                 stub_url: str | None = None) -> LLMBackend | None:
+    """Бекенд за налаштуваннями: kind "stub" / "openai" (None — OLIST_LLM_BACKEND або openai, якщо є ключ).
+
+    Для stub без адреси піднімаємо сервер у цьому ж процесі (src/llm_stub.py). None — LLM немає.
+    """
+    kind = (kind or os.environ.get("OLIST_LLM_BACKEND") or ("openai" if api_key else "")).lower()
+    if kind == "stub":
+        stub_url = stub_url or os.environ.get("OLIST_LLM_STUB_URL")
+        if not stub_url:
+            from src.llm_stub import shared_stub
+            stub_url = shared_stub()
+        return StubBackend(stub_url)
+    if kind == "openai" and api_key:
+        try:
+            return OpenAIBackend(api_key)
+        except ImportError:
+            return None
+    return None
+
+
+# --- дисковий кеш відповідей: один JSON на ключ, прострочені записи видаляються
+class LLMCache:
+    def __init__(self, cache_dir: str = LLM_CACHE_DIR, ttl_s: float = LLM_CACHE_TTL_S):
+        self.cache_dir = cache_dir
+        self.ttl_s = ttl_s
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(backend: LLMBackend, prompt: str, d1=None, d2=None, version: str = "") -> str:
+        raw = json.dumps([backend.name, backend.model, SYSTEM_PROMPT, prompt.strip(),
+                          str(d1) if d1 is not None else None, str(d2) if d2 is not None else None, version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                rec = json.load(fh)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if time.time() - rec.get("created", 0) > self.ttl_s:
+            self._remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return rec["text"]
+
+    def put(self, key: str, text: str) -> None:
+        """Запис відповіді. Кожен запис — у свій тимчасовий файл (дві сесії з тим самим питанням не заважають
+        одна одній); помилка запису лише лишає відповідь без кешу — як і в get/_remove."""
+        path = self._path(key)
+        tmp = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=f"{key}.", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"created": time.time(), "text": text}, fh, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            if tmp is not None:
+                self._remove(tmp)
+            return
+        self.evict_expired()  # записів мало (по одному на питання), тож прибираємо при кожному записі
+
+    def evict_expired(self) -> int:
+        """Видаляє всі записи, старші за TTL. Повертає, скільки видалено."""
+        now, removed = time.time(), 0
+        for path in glob.glob(os.path.join(self.cache_dir, "*.json")):
+            try:
+                if now - os.path.getmtime(path) > self.ttl_s:
+                    self._remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_CACHES: dict[str, LLMCache] = {}
+
+
+def shared_cache(cache_dir: str = LLM_CACHE_DIR) -> LLMCache:
+    """Один LLMCache на папку на весь процес (щоб лічильники hits/misses не скидались на кожен rerun)."""
+    return _CACHES.setdefault(os.path.abspath(cache_dir), LLMCache(cache_dir))
+
+
+def stream_answer(backend: LLMBackend, prompt: str, cache: LLMCache | None = None,
+                  d1=None, d2=None, version: str = "") -> Iterator[str]:
+    """Відповідь на prompt шматками: з кешу — одразу цілком, інакше — потоком з бекенду.
+
+    У кеш потрапляє лише повна відповідь; помилку бекенду віддаємо текстом «(LLM недоступний) …»
+    (як раніше llm_answer) і не кешуємо.
+    """
+    key = LLMCache.key(backend, prompt, d1, d2, version) if cache is not None else None
+    if cache is not None:
+        text = cache.get(key)
+        if text is not None:
+            yield text
+            return
+    parts = []
+    try:
+        for piece in backend.stream(chat_messages(prompt)):
+            parts.append(piece)
+            yield piece
+    except Exception as e:
+        yield f"(LLM недоступний) {e}"
+        return
+    if cache is not None and parts:
+        cache.put(key, "".join(parts).strip())
@@ -0,0 +1,122 @@
+# src/llm_stub.py
+# локальний детермінований «LLM»: HTTP-сервер з OpenAI-сумісним /v1/chat/completions (SSE-потік)
+# Відповідь залежить лише від тексту запиту (sha256), токени йдуть із затримкою — як у справжнього API.
+# Потрібен для тестів і бенчів без мережі й ключа:
+#   python -m src.llm_stub --port 8765 --delay 0.02      → OLIST_LLM_BACKEND=stub OLIST_LLM_STUB_URL=http://127.0.0.1:8765
+from __future__ import annotations
+import argparse
+import hashlib
+import http.server
+import json
+import threading
+import time
+
+STUB_TOKEN_DELAY_S = 0.02   # пауза між токенами
+STUB_FIRST_TOKEN_S = 0.3    # «думання» до першого токена
+
+_OPENERS = [
+    "Коротко: у вибраному періоді {topic} — головний важіль.",
+    "Якщо дивитись на {topic}, картина стабільна, але є резерв.",
+    "Найбільший ефект зараз дасть робота з {topic}.",
+]
+_TOPICS = ["доставкою (SLA)", "типами оплати", "повторними покупками", "відгуками клієнтів", "регіонами"]
+_ACTIONS = [
+    "Порада: перевірте штати з найгіршим on-time і домовтесь з перевізником про пріоритет.",
+    "Порада: запустіть кампанію для сегмента «At Risk» з RFM.",
+    "Порада: заохочуйте оплату карткою з розстрочкою — у неї вищий AOV.",
+    "Порада: відповідайте на оцінки 1–2 протягом доби, це знижує відтік.",
+]
+
+
+def stub_answer(prompt: str) -> str:
+    """Детермінована відповідь: однаковий prompt → однаковий текст."""
+    h = hashlib.sha256(prompt.encode("utf-8")).digest()
+    opener = _OPENERS[h[0] % len(_OPENERS)].format(topic=_TOPICS[h[1] % len(_TOPICS)])
+    return f"{opener} {_ACTIONS[h[2] % len(_ACTIONS)]} (stub, запит #{h[3]:03d})"
+
+
+def _tokens(text: str) -> list[str]:
+    words = text.split(" ")
+    return [w + " " for w in words[:-1]] + words[-1:]
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    token_delay = STUB_TOKEN_DELAY_S
+    first_token = STUB_FIRST_TOKEN_S
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        text = stub_answer(prompt)
+        time.sleep(self.first_token)
+        if not body.get("stream"):
+            time.sleep(self.token_delay * len(_tokens(text)))
+            data = json.dumps({"object": "chat.completion", "model": body.get("model", "stub"),
+                               "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                            "finish_reason": "stop"}]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for tok in _tokens(text):
+            chunk = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": tok}}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def serve_stub(port: int = 0, token_delay: float = STUB_TOKEN_DELAY_S,
+               first_token: float = STUB_FIRST_TOKEN_S) -> tuple[http.server.ThreadingHTTPServer, str]:
+    """Запускає stub у фоновому потоці (port=0 — випадковий вільний). Повертає (сервер, base_url)."""
+    handler = type("StubHandler", (_StubHandler,), {"token_delay": token_delay, "first_token": first_token})
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+_SHARED: tuple[http.server.ThreadingHTTPServer, str] | None = None
+_SHARED_LOCK = threading.Lock()
+
+
+def shared_stub() -> str:
+    """base_url одного stub-сервера на весь процес (піднімається при першому виклику)."""
+    global _SHARED
+    with _SHARED_LOCK:
+        if _SHARED is None:
+            _SHARED = serve_stub()
+        return _SHARED[1]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="deterministic OpenAI-compatible stub server")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--delay", type=float, default=STUB_TOKEN_DELAY_S, help="seconds between tokens")
+    ap.add_argument("--first-token", type=float, default=STUB_FIRST_TOKEN_S)
+    args = ap.parse_args()
+    httpd, url = serve_stub(args.port, args.delay, args.first_token)
+    print(f"stub LLM on {url}  (OLIST_LLM_BACKEND=stub OLIST_LLM_STUB_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# src/profiling.py
+# профілювання rerun сторінки: де пішов час і пам'ять — читання Parquet, merge у get_facts, groupby,
+# побудова Plotly-фігур, серіалізація st.dataframe / st.plotly_chart.
+#   with span("groupby payment_type"): ...        # будь-який блок
+#   @profiled("rfm")                               # уся функція
+# Спани пишуться лише коли профіль увімкнено для цього rerun (перемикач у сайдбарі або OLIST_PROFILE=1);
+# інакше span/profiled — одна перевірка ContextVar, без таймерів і читання /proc.
+# Кожен профільований rerun дописується в JSONL (OLIST_PROFILE_LOG): рядок на спан + рядок "(rerun)".
+from __future__ import annotations
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+
+PROFILE_ON = os.environ.get("OLIST_PROFILE", "").lower() in ("1", "true", "yes")  # за замовчуванням вимкнено: вмикає OLIST_PROFILE=1 або перемикач у сайдбарі
+# data/ — як src.data.DATA_DIR (імпортувати його не можна: src.data сам імпортує цей модуль)
+PROFILE_LOG = os.environ.get("OLIST_PROFILE_LOG", os.path.join("data", "_profile.jsonl"))
+PROFILE_LOG_MAX_BYTES = 50 * 2**20   # більший лог → перейменовуємо в .1 і починаємо новий
+
+# профіль поточного rerun; у кожного потоку/сесії Streamlit свій (ContextVar), у бенчах і src — None
+_ACTIVE: ContextVar["Profile | None"] = ContextVar("olist_profile", default=None)
+_LOG_LOCK = threading.Lock()
+_PAGE_SIZE_MB = os.sysconf("SC_PAGE_SIZE") / 2**20 if hasattr(os, "sysconf") else 0.0
+
+
+def rss_mb() -> float | None:
+    """Поточний RSS процесу (Linux, /proc/self/statm); None — якщо недоступно."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE_MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Profile:
+    """Спани одного rerun сторінки: (назва, глибина, старт від початку, секунди, ΔRSS МБ)."""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.run_id = uuid.uuid4().hex[:12]
+        self.ts = time.time()
+        self.t0 = time.perf_counter()
+        self.rss0 = rss_mb()
+        self.spans: list[dict] = []
+        self.depth = 0
+        self.total_s = None
+        self.rss_end = None
+        self.stopped = False
+        self.panel = None   # місце в сайдбарі (page_profile)
+
+    def finish(self, stopped: bool = False, log_path: str | None = PROFILE_LOG) -> "Profile":
+        """Закриває профіль (stopped — rerun обірвався на st.stop/rerun) і дописує його в JSONL."""
+        if self.total_s is None:
+            self.total_s = time.perf_counter() - self.t0
+            self.rss_end = rss_mb()
+            self.stopped = stopped
+            if log_path:
+                write_log(self, log_path)
+        return self
+
+    def rows(self) -> list[dict]:
+        """Спани + «решта» (час поза спанами верхнього рівня) — для панелі й логу."""
+        total = self.total_s or (time.perf_counter() - self.t0)
+        done = [s for s in self.spans if s.get("seconds") is not None]
+        top = sum(s["seconds"] for s in done if s["depth"] == 0)
+        return done + [{"name": "(поза спанами)", "depth": 0, "start_s": None,
+                        "seconds": max(total - top, 0.0), "rss_mb": None}]
+
+
+class span:
+    """with span("назва"): ... — час і ΔRSS блоку в профіль поточного rerun (якщо він є)."""
+    __slots__ = ("name", "prof", "rec", "t0", "rss0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.prof = prof = _ACTIVE.get()
+        if prof is None:
+            return self
+        self.rec = {"name": self.name, "depth": prof.depth, "start_s": None, "seconds": None, "rss_mb": None}
+        prof.spans.append(self.rec)   # місце в списку — за стартом: батько перед дітьми
+        prof.depth += 1
+        self.rss0 = rss_mb()
+        self.t0 = time.perf_counter()
+        self.rec["start_s"] = self.t0 - prof.t0
+        return self
+
+    def __exit__(self, *exc):
+        prof = self.prof
+        if prof is None:
+            return False
+        self.rec["seconds"] = time.perf_counter() - self.t0
+        rss = rss_mb()
+        if rss is not None and self.rss0 is not None:
+            self.rec["rss_mb"] = rss - self.rss0
+        prof.depth -= 1
+        return False
+
+
+def profiled(name: str | None = None):
+    """Декоратор: уся функція — один спан (назва за замовчуванням — ім'я функції)."""
+    def deco(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE.get() is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def start(page: str) -> Profile:
+    """Починає профіль у поточному контексті (потоці rerun)."""
+    prof = Profile(page)
+    _ACTIVE.set(prof)
+    return prof
+
+
+def stop() -> None:
+    _ACTIVE.set(None)
+
+
+def active() -> Profile | None:
+    return _ACTIVE.get()
+
+
+def write_log(prof: Profile, path: str = PROFILE_LOG) -> None:
+    """Дописує профіль у JSONL: рядок на спан + підсумковий рядок "(rerun)". Помилки запису ігноруємо."""
+    base = {"run": prof.run_id, "page": prof.page, "ts": round(prof.ts, 3)}
+    lines = [json.dumps({**base, **s}, ensure_ascii=False) for s in prof.rows()]
+    lines.append(json.dumps({**base, "name": "(rerun)", "depth": -1, "start_s": 0.0, "seconds": prof.total_s,
+                             "rss_mb": (prof.rss_end - prof.rss0) if prof.rss_end and prof.rss0 else None,
+                             "rss_end_mb": prof.rss_end, "stopped": prof.stopped}, ensure_ascii=False))
+    try:
+        with _LOG_LOCK:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            if os.path.exists(path) and os.path.getsize(path) > PROFILE_LOG_MAX_BYTES:
+                os.replace(path, path + ".1")
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write("\n".join(lines) + "\n")
+    except OSError:
+        pass  # data/ лише для читання — профіль лишається тільки в панелі
+
+
+def read_log(path: str = PROFILE_LOG):
+    """JSONL-лог → DataFrame (для офлайн-аналізу: groupby по page/name, перцентилі тощо)."""
+    import pandas as pd
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_json(path, lines=True)
+
+
+# --- Streamlit: серіалізація віджетів і Plotly Express як спани (ставимо один раз, коли профіль уперше увімкнули)
+_ST_CALLS = ("dataframe", "plotly_chart")
+_PX_CALLS = ("bar", "line", "pie", "histogram", "density_heatmap", "scatter", "scatter_geo", "box", "area")
+_INSTALLED = False
+
+
+def _install_streamlit_spans() -> None:
+    """Обгортає st.dataframe / st.plotly_chart і px.* у спани. Без активного профілю обгортка — прямий виклик."""
+    global _INSTALLED
+    if _INSTALLED:
+        return
+    import plotly.express as px
+    import streamlit as st
+    for mod, names, prefix in ((st, _ST_CALLS, "st."), (px, _PX_CALLS, "px.")):
+        for n in names:
+            fn = getattr(mod, n, None)
+            if fn is not None and not getattr(fn, "_olist_span", False):  # __wrapped__ у streamlit вже свій
+                wrapped = profiled(prefix + n)(fn)
+                wrapped._olist_span = True
+                setattr(mod, n, wrapped)
+    _INSTALLED = True
+
+
+def page_profile(page_file: str) -> Profile | None:
+    """На початку сторінки: перемикач «Профілювання» в сайдбарі; якщо увімкнено — профіль цього rerun.
+
+    Профіль попереднього rerun, який не дійшов до finish_page (st.stop, новий rerun), закривається тут.
+    """
+    import streamlit as st
+    prev = st.session_state.pop("_profile", None)
+    if prev is not None:
+        prev.finish(stopped=True)
+    stop()
+    if not st.sidebar.toggle("⏱ Профілювання", value=PROFILE_ON, key="profile_on",
+                             help="Час і пам'ять по етапах цього rerun; також пишеться в JSONL-лог."):
+        return None
+    _install_streamlit_spans()
+    prof = start(os.path.splitext(os.path.basename(page_file))[0])
+    prof.panel = st.sidebar.empty()
+    st.session_state["_profile"] = prof
+    return prof
+
+
+def finish_page(prof: Profile | None) -> None:
+    """В кінці сторінки: закриває профіль, пише лог і показує розклад у сайдбарі."""
+    if prof is None:
+        return
+    import pandas as pd
+    import streamlit as st
+    stop()  # панель нижче — вже не частина профілю
+    st.session_state.pop("_profile", None)
+    prof.finish()
+    rows = pd.DataFrame(prof.rows())
+    rows["етап"] = ["  " * d + n for d, n in zip(rows["depth"], rows["name"])]
+    rows["%"] = 100 * rows["seconds"] / max(prof.total_s, 1e-9)
+    with prof.panel.container():
+        rss = f" · RSS {prof.rss_end:,.0f} MB" if prof.rss_end else ""
+        st.caption(f"Rerun {prof.total_s:.3f} с{rss}")
+        st.dataframe(rows[["етап", "seconds", "%", "rss_mb"]]
+                     .rename(columns={"seconds": "с", "rss_mb": "ΔRSS, MB"}),
+                     hide_index=True, use_container_width=True,
+                     column_config={"с": st.column_config.NumberColumn(format="%.3f"),
+                                    "%": st.column_config.NumberColumn(format="%.0f"),
+                                    "ΔRSS, MB": st.column_config.NumberColumn(format="%.1f")})
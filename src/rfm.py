@@ -0,0 +1,81 @@
+# src/rfm.py
+# RFM-сегментація без Python-циклів: groupby max/count/sum → квінтилі через ранги → сегмент з таблиці
+# спільне для сторінки RFM і AI-агента (tool_rfm)
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from src.profiling import profiled
+
+# --- сегменти (демо-логіка): порядок правил важливий — перше, що спрацювало
+SEGMENTS = ["Champions", "Loyal", "At Risk", "Hibernating", "New", "Others"]
+
+
+def segment_of(r: int, f: int, m: int) -> str:
+    """Проста, зрозуміла рубрикація сегментів (демо-логіка)."""
+    if r >= 4 and f >= 4 and m >= 4:  return "Champions"
+    if r >= 4 and f >= 3:             return "Loyal"
+    if r <= 2 and f >= 3:             return "At Risk"
+    if r <= 2 and f <= 2 and m <= 2:  return "Hibernating"
+    if r >= 4 and f <= 2:             return "New"
+    return "Others"
+
+
+# таблиця на всі 125 комбінацій (R, F, M): індекс = (R-1)*25 + (F-1)*5 + (M-1) → код сегмента
+SEGMENT_LUT = np.array([SEGMENTS.index(segment_of(r, f, m))
+                        for r in range(1, 6) for f in range(1, 6) for m in range(1, 6)], dtype=np.int8)
+
+
+def quintile_score(values, higher_is_better: bool = True) -> np.ndarray:
+    """Квінтильний бал 1..5 — те саме, що pd.qcut(series.rank(method="first"), 5), але цілочисельно.
+
+    Ранг r = 1..n (рівні значення — у порядку появи), кошик = ceil((r-1)·5/(n-1)), мінімум 1.
+    NaN вважаємо найгіршими. Якщо значення одне — бал 3 (квінтилів немає).
+    """
+    v = np.asarray(values, dtype=np.float64)
+    n = len(v)
+    if n < 2:
+        return np.full(n, 3, dtype=np.int8)
+    key = np.where(np.isnan(v), -np.inf if higher_is_better else np.inf, v)
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.argsort(key, kind="stable")] = np.arange(n, dtype=np.int64)  # 0-based ранг
+    bin_ = np.maximum(-((-rank * 5) // (n - 1)), 1)  # ceil без float-похибок
+    return (bin_ if higher_is_better else 6 - bin_).astype(np.int8)
+
+
+def rfm_aggregate(df: pd.DataFrame, customer_col: str = "customer_id",
+                  ts_col: str = "purchase_dt", value_col: str = "gross_revenue") -> pd.DataFrame:
+    """Рядки замовлень → клієнти: last_purchase (max), Frequency (count), Monetary (sum)."""
+    g = df.groupby(customer_col, observed=True, sort=True)  # sort=True — порядок рівних рангів як раніше
+    out = pd.DataFrame({
+        "last_purchase": g[ts_col].max(),
+        "Frequency":     g[ts_col].size(),
+        "Monetary":      g[value_col].sum(),
+    })
+    return out.rename_axis(customer_col).reset_index()
+
+
+def rfm_score(agg: pd.DataFrame, snapshot=None) -> pd.DataFrame:
+    """Додає Recency (дні до snapshot), бали R/F/M, RFM-суму і Segment до агрегатів по клієнтах.
+
+    snapshot за замовчуванням — наступний день після останньої покупки.
+    """
+    out = agg.copy()
+    last = pd.to_datetime(out["last_purchase"])
+    if snapshot is None:
+        snapshot = last.max() + pd.Timedelta(days=1)
+    out["Recency"] = (pd.Timestamp(snapshot) - last).dt.days
+    out["R"] = quintile_score(out["Recency"].to_numpy(dtype=np.float64), higher_is_better=False)
+    out["F"] = quintile_score(out["Frequency"].to_numpy(dtype=np.float64))
+    out["M"] = quintile_score(out["Monetary"].to_numpy(dtype=np.float64))
+    out["RFM"] = out["R"].astype(np.int16) + out["F"] + out["M"]
+    idx = (out["R"].to_numpy(np.int16) - 1) * 25 + (out["F"].to_numpy(np.int16) - 1) * 5 + (out["M"].to_numpy(np.int16) - 1)
+    out["Segment"] = pd.Categorical.from_codes(SEGMENT_LUT[idx], categories=SEGMENTS)
+    return out
+
+
+@profiled()
+def compute_rfm(df: pd.DataFrame, customer_col: str = "customer_id", snapshot=None) -> pd.DataFrame:
+    """RFM по рядках facts: customer_col, Recency, Frequency, Monetary, R, F, M, RFM, Segment."""
+    rfm = rfm_score(rfm_aggregate(df, customer_col), snapshot)
+    return rfm[[customer_col, "Recency", "Frequency", "Monetary", "R", "F", "M", "RFM", "Segment"]]
@@ -0,0 +1,329 @@
+# src/sql_session.py
+# довгоживуча DuckDB-сесія для SQL агента: facts реєструється один раз (Arrow-таблиця, DuckDB читає її напряму),
+# період і ліміт вибірки — параметри (змінні d_lo/d_hi/pos_lo у view facts), результати — у LRU-кеші сесії.
+# Сесія одна на версію датасету й лежить у спільному кеші процесу (src.cache) з розміром Arrow-таблиці
+# плюс закешованих результатів (розмір оновлюється після кожного нового результату);
+# нова версія датасету чи витіснення через бюджет → сесія закривається.
+# Запити «під наглядом»: лише один SELECT (перевіряє парсер DuckDB), ліміти пам'яті/потоків,
+# таймаут з перериванням, обмеження кількості рядків результату, час і проскановані рядки кожного запиту.
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator
+
+import duckdb
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src.cache import CACHE, count_cache, nbytes
+from src.data import DATA_DIR, FACTS_COMPACT, _canonical_facts, _covers, dataset_version, period_bounds
+from src.profiling import profiled
+
+SQL_CACHE_SIZE = 64  # скільки останніх результатів тримати в кеші сесії
+SQL_CACHE_MB = float(os.environ.get("OLIST_SQL_CACHE_MB", "128"))  # і не більше стількох MB результатів
+SQL_LOG_SIZE = 200   # скільки останніх запитів пам'ятає журнал сесії
+
+# ліміти на всю DuckDB-базу сесії (спільні для всіх курсорів), можна змінити змінними оточення
+SQL_MEMORY_LIMIT = os.environ.get("OLIST_SQL_MEMORY_LIMIT", "1GB")
+SQL_THREADS = int(os.environ.get("OLIST_SQL_THREADS", "2"))
+SQL_TIMEOUT_S = float(os.environ.get("OLIST_SQL_TIMEOUT", "10"))
+SQL_MAX_ROWS = int(os.environ.get("OLIST_SQL_MAX_ROWS", "10000"))
+SQL_WORKERS = int(os.environ.get("OLIST_SQL_WORKERS", "4"))  # скільки запитів автоаналізу виконувати одночасно
+_FETCH_BATCH = 2048  # рядків за раз при читанні результату (щоб зупинитись одразу після ліміту)
+
+# view facts = вся таблиця, обрізана змінними періоду (NULL — без межі) і лімітом вибірки:
+# facts відсортовані за purchase_dt, тож «найсвіжіші N замовлень» — рядки з позиції pos_lo (службова колонка _pos).
+# Фільтри DuckDB проштовхує в Arrow-скан.
+_FACTS_VIEW = ("CREATE TEMP VIEW facts AS SELECT * EXCLUDE (_pos) FROM facts_all "
+               "WHERE _pos >= getvariable('pos_lo') "
+               "AND (getvariable('d_lo') IS NULL OR purchase_dt >= getvariable('d_lo')) "
+               "AND (getvariable('d_hi') IS NULL OR purchase_dt < getvariable('d_hi'))")
+
+_CLOSED = "SQL-сесію вже закрито (витіснена з кешу) — візьміть нову через facts_session()."
+
+_QUOTED = re.compile(r"""('(?:''|[^'])*'|"(?:""|[^"])*")""")
+
+
+def normalize_sql(sql: str) -> str:
+    """Ключ кешу для SQL: без зайвих пробілів і «;» у кінці, нижній регістр поза лапками."""
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p).lower() for i, p in enumerate(parts)).strip()
+
+
+def _rows_scanned(profile: dict) -> int:
+    """Скільки рядків віддали скани таблиць (сума по всіх TABLE_SCAN у плані, після проштовхнутих фільтрів)."""
+    own = profile.get("operator_cardinality", 0) if profile.get("operator_type") == "TABLE_SCAN" else 0
+    return own + sum(_rows_scanned(c) for c in profile.get("children", []))
+
+
+class FactsSession:
+    """DuckDB над facts однієї версії датасету (найбільша вибірка, яку вже просили; менші — її «хвіст»).
+
+    facts перетворюється в Arrow один раз: pyarrow бере без копії лише частину числових колонок,
+    рядки й категорії отримують власні буфери — тож сесія це ще одна копія facts у пам'яті
+    (розмір — nbytes). Результати запитів теж живуть у пам'яті процесу (result_bytes), тож у бюджеті
+    src.cache сесія важить nbytes + result_bytes.
+    Кожен запит іде через курсор з пулу: курсор — окреме з'єднання до тієї ж бази, на якому
+    Arrow-таблиця реєструється один раз, а період і ліміт задаються змінними перед запитом.
+
+    Ліміти memory_limit/threads стоять на всій базі; доступ до файлів і мережі вимкнено
+    (read_csv('/etc/...'), ATTACH тощо не спрацюють, навіть якщо пройдуть перевірку).
+    """
+
+    def __init__(self, facts: pd.DataFrame, version: str, starts: np.ndarray | None = None,
+                 limit: int | None = None, memory_limit: str = SQL_MEMORY_LIMIT, threads: int = SQL_THREADS,
+                 timeout_s: float = SQL_TIMEOUT_S, max_rows: int = SQL_MAX_ROWS):
+        self.version = version
+        self.limit = limit   # ліміт вибірки, з якої зібрано facts (None — всі замовлення)
+        self.rows = len(facts)
+        self.timeout_s = timeout_s
+        self.max_rows = max_rows
+        # позиції першого рядка кожного замовлення (facts відсортовані за часом) — для max_orders
+        self.starts = (starts if starts is not None
+                       else np.flatnonzero(~facts["order_id"].duplicated().to_numpy()))
+        self._arrow = pa.Table.from_pandas(facts, preserve_index=False)
+        self._arrow = self._arrow.append_column("_pos", pa.array(np.arange(len(facts), dtype=np.int64)))
+        self.nbytes = self._arrow.nbytes
+        self._con = duckdb.connect(config={"memory_limit": memory_limit, "threads": threads,
+                                           "enable_external_access": False})
+        self._pool: list[duckdb.DuckDBPyConnection] = []
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()  # ключ → (результат, байти)
+        self.result_bytes = 0
+        self.cache_key = None  # ключ у CACHE (ставить facts_session) — щоб оновлювати там розмір сесії
+        self.hits = self.misses = 0
+        self.log: deque[dict] = deque(maxlen=SQL_LOG_SIZE)
+        # close() під час запиту (витіснення з кешу в іншій сесії Streamlit) чекає, доки курсори повернуться
+        self._busy = 0
+        self._closing = self._closed = False
+
+    def covers(self, max_orders: int | None) -> bool:
+        return _covers(self.limit, max_orders)
+
+    def first_row(self, max_orders: int | None) -> int:
+        """Позиція першого рядка найсвіжіших max_orders замовлень (0 — усі рядки сесії)."""
+        if max_orders is None or max_orders >= len(self.starts):
+            return 0
+        return int(self.starts[-max_orders])
+
+    def _acquire(self) -> duckdb.DuckDBPyConnection:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(_CLOSED)
+            self._busy += 1
+            if self._pool:
+                return self._pool.pop()
+            cur = self._con.cursor()
+        cur.register("facts_all", self._arrow)
+        cur.execute(_FACTS_VIEW)
+        cur.execute("PRAGMA enable_profiling = 'no_output'")  # профіль потрібен лише для rows_scanned
+        return cur
+
+    def _release(self, cur: duckdb.DuckDBPyConnection) -> None:
+        with self._lock:
+            self._pool.append(cur)
+            self._busy -= 1
+            if self._closing and self._busy == 0:
+                self._close_locked()
+
+    def check(self, sql: str) -> str:
+        """Перевірка до виконання: рівно один SELECT (WITH/VALUES/FROM-first теж SELECT). Інакше — ValueError."""
+        try:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError(_CLOSED)
+                stmts = self._con.extract_statements(sql)
+        except duckdb.Error as e:
+            raise ValueError(f"SQL не розібрано: {e}") from e
+        if len(stmts) != 1:
+            raise ValueError(f"Потрібен рівно один SQL-запит, отримано {len(stmts)}.")
+        if stmts[0].type != duckdb.StatementType.SELECT:
+            raise ValueError(f"Дозволені лише SELECT-запити (це {stmts[0].type.name}).")
+        return sql.strip().rstrip(";")
+
+    def _run(self, cur: duckdb.DuckDBPyConnection, sql: str) -> tuple[pd.DataFrame, bool]:
+        """Виконує sql з таймаутом: сторожовий таймер перериває запит (cur.interrupt) після timeout_s.
+
+        Результат читаємо батчами й зупиняємось на max_rows + 1 рядку — решту DuckDB не віддає.
+        """
+        state = {"done": False, "timed_out": False}
+        guard = threading.Lock()
+
+        def _stop():
+            with guard:
+                if not state["done"]:  # запит уже закінчився — курсор не чіпаємо, він піде в пул
+                    state["timed_out"] = True
+                    cur.interrupt()
+
+        timer = threading.Timer(self.timeout_s, _stop)
+        timer.daemon = True
+        timer.start()
+        try:
+            reader = cur.execute(sql).to_arrow_reader(_FETCH_BATCH)
+            batches, n = [], 0
+            for b in reader:
+                batches.append(b)
+                n += b.num_rows
+                if n > self.max_rows:
+                    break
+            reader.close()
+        except duckdb.InterruptException as e:
+            if state["timed_out"]:
+                raise TimeoutError(f"Запит перервано: довше за {self.timeout_s:g} с.") from e
+            raise
+        except duckdb.OutOfMemoryException as e:
+            raise MemoryError(f"Запит перевищив ліміт пам'яті SQL-сесії: {e}") from e
+        finally:
+            with guard:
+                state["done"] = True
+            timer.cancel()
+        table = pa.Table.from_batches(batches, schema=reader.schema)
+        return table.slice(0, self.max_rows).to_pandas(), n > self.max_rows
+
+    @profiled("sql query")
+    def query(self, sql: str, d1=None, d2=None, max_orders: int | None = None) -> pd.DataFrame:
+        """Результат SQL по facts за період [d1, d2] (None — без фільтра) серед найсвіжіших max_orders замовлень
+        (None — вся сесія). З кешу — той самий DataFrame (лише читати).
+
+        Не більше max_rows рядків; у df.attrs: truncated (обрізано), seconds, rows_scanned.
+        Помилки: ValueError — не один SELECT, TimeoutError — довше timeout_s, MemoryError — понад memory_limit.
+        """
+        sql = self.check(sql)
+        lo, hi = period_bounds(d1, d2) if d1 is not None and d2 is not None else (None, None)
+        if not isinstance(max_orders, (int, np.integer)) or max_orders <= 0:
+            max_orders = None
+        if not self.covers(max_orders):
+            raise ValueError(f"Сесія зібрана з {self.limit:,} замовлень, а просять {max_orders or 'всі'}.")
+        pos_lo = self.first_row(max_orders)
+        key = (normalize_sql(sql), lo, hi, pos_lo)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                count_cache("sql", True)
+                out = self._cache[key][0]
+                self.log.append({**out.attrs, "sql": sql, "rows": len(out), "cached": True})
+                return out
+            self.misses += 1
+            count_cache("sql", False)
+        cur = self._acquire()
+        t0 = time.perf_counter()
+        try:
+            cur.execute("SET VARIABLE pos_lo = ?::BIGINT", [pos_lo])
+            cur.execute("SET VARIABLE d_lo = ?::TIMESTAMP", [lo])
+            cur.execute("SET VARIABLE d_hi = ?::TIMESTAMP", [hi])
+            out, truncated = self._run(cur, sql)
+            scanned = _rows_scanned(json.loads(cur.get_profiling_information(format="json")))
+        except Exception as e:
+            with self._lock:
+                self.log.append({"sql": sql, "seconds": time.perf_counter() - t0, "error": str(e), "cached": False})
+            raise
+        finally:
+            self._release(cur)
+        out.attrs.update({"truncated": truncated, "seconds": time.perf_counter() - t0, "rows_scanned": scanned})
+        with self._lock:
+            self.log.append({**out.attrs, "sql": sql, "rows": len(out), "cached": False})
+            size = nbytes(out)
+            old = self._cache.pop(key, None)
+            self.result_bytes += size - (old[1] if old is not None else 0)
+            self._cache[key] = (out, size)
+            while len(self._cache) > 1 and (len(self._cache) > SQL_CACHE_SIZE
+                                             or self.result_bytes > SQL_CACHE_MB * 2**20):
+                self.result_bytes -= self._cache.popitem(last=False)[1][1]
+            total = self.nbytes + self.result_bytes
+        if self.cache_key is not None:
+            CACHE.resize("sql_session", self.cache_key, self, total)
+        return out
+
+    def query_many(self, sqls: list[str], d1=None, d2=None, max_orders: int | None = None,
+                   max_workers: int = SQL_WORKERS) -> Iterator[tuple[int, pd.DataFrame | Exception]]:
+        """Кілька запитів одночасно: кожен у своєму потоці й на своєму курсорі з пулу.
+
+        Віддає (номер запиту в sqls, результат або виняток) у порядку завершення — показувати
+        можна одразу, не чекаючи найповільнішого. DuckDB відпускає GIL, тож потоки справді паралельні.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sqls) or 1))) as ex:
+            futures = {ex.submit(self.query, sql, d1, d2, max_orders): i for i, sql in enumerate(sqls)}
+            for fut in as_completed(futures):
+                exc = fut.exception()
+                yield futures[fut], exc if exc is not None else fut.result()
+
+    def cache_info(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "max": SQL_CACHE_SIZE,
+                    "MB": self.result_bytes / 2**20}
+
+    def close(self) -> None:
+        """Закриває DuckDB; якщо якраз виконуються запити — після останнього з них."""
+        with self._lock:
+            self._closing = True
+            if self._busy == 0:
+                self._close_locked()
+
+    def _close_locked(self) -> None:
+        if self._closed:
+            return
+        for cur in self._pool:
+            cur.close()
+        self._pool.clear()
+        self._con.close()
+        self._closed = True
+
+
+_SESSIONS_LOCK = threading.Lock()  # сесію будуємо один раз, навіть якщо кілька сесій Streamlit прийшли одночасно
+
+
+def facts_session(data_dir: str = DATA_DIR, max_orders: int | None = None) -> FactsSession:
+    """Сесія, що покриває load_facts(data_dir, max_orders): одна на версію датасету (у CACHE, сховище "sql_session").
+
+    Менший ліміт — та сама сесія (query(..., max_orders=...) бере «хвіст»), більший — нова, стара закривається.
+    """
+    if not isinstance(max_orders, (int, np.integer)) or max_orders <= 0:
+        max_orders = None
+    version = dataset_version(data_dir)
+    key = os.path.abspath(data_dir)
+    with _SESSIONS_LOCK:
+        session = CACHE.get("sql_session", key, lambda s: s.version == version and s.covers(max_orders))
+        if session is not None:
+            return session
+        facts, starts = _canonical_facts(data_dir, max_orders, FACTS_COMPACT)
+        session = FactsSession(facts, version, starts=starts, limit=max_orders)
+        session.cache_key = key
+        CACHE.put("sql_session", key, session, size=session.nbytes, on_evict=FactsSession.close)
+        return session
+
+
+# --- автоаналіз: іменовані зрізи по facts (назва → SQL); сторінка агента дає вибрати, які запускати
+AUTO_SLICES: dict[str, str] = {
+    "Виручка за типом оплати":
+        "SELECT payment_type, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1 ORDER BY revenue DESC LIMIT 10",
+    "Штати з найгіршим on-time":
+        "SELECT customer_state, AVG(CASE WHEN on_time THEN 1 ELSE 0 END) AS on_time_rate, COUNT(*) AS orders FROM facts GROUP BY 1 HAVING COUNT(*)>100 ORDER BY on_time_rate ASC LIMIT 10",
+    "Помісячна динаміка":
+        "SELECT strftime(purchase_dt, '%Y-%m') AS ym, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1 ORDER BY 1",
+    "Оцінка vs доставка":
+        "SELECT review_score, COUNT(*) AS orders, AVG(delivery_time_h) AS delivery_time_h, AVG(CASE WHEN on_time THEN 1 ELSE 0 END) AS on_time_rate FROM facts WHERE review_score > 0 GROUP BY 1 ORDER BY 1",
+    "Розстрочка: чек і частка":
+        "SELECT installments, COUNT(*) AS orders, AVG(gross_revenue) AS aov, COUNT(*) / SUM(COUNT(*)) OVER () AS share FROM facts GROUP BY 1 ORDER BY 1",
+    "Найбільші запізнення за штатами":
+        "SELECT customer_state, COUNT(*) AS late_orders, AVG(delay_h) AS avg_delay_h FROM facts WHERE delay_h > 0 GROUP BY 1 HAVING COUNT(*) > 20 ORDER BY avg_delay_h DESC LIMIT 10",
+    "Частка доставки в чеку за штатами":
+        "SELECT customer_state, SUM(freight) / NULLIF(SUM(gross_revenue), 0) AS freight_share, COUNT(*) AS orders FROM facts GROUP BY 1 HAVING COUNT(*)>100 ORDER BY freight_share DESC LIMIT 10",
+    "Дні тижня":
+        "SELECT dayname(purchase_dt) AS weekday, COUNT(*) AS orders, SUM(gross_revenue) AS revenue FROM facts GROUP BY 1, isodow(purchase_dt) ORDER BY isodow(purchase_dt)",
+    "Години покупок":
+        "SELECT hour(purchase_dt) AS hour, COUNT(*) AS orders, AVG(gross_revenue) AS aov FROM facts GROUP BY 1 ORDER BY 1",
+    "Розмір кошика":
+        "SELECT items_cnt, COUNT(*) AS orders, AVG(gross_revenue) AS aov, AVG(review_score) AS avg_score FROM facts GROUP BY 1 ORDER BY 1 LIMIT 20",
+    "Статуси замовлень":
+        "SELECT order_status, COUNT(*) AS orders, COUNT(*) / SUM(COUNT(*)) OVER () AS share FROM facts GROUP BY 1 ORDER BY orders DESC",
+    "Повторні покупці":
+        "SELECT orders_per_customer, COUNT(*) AS customers FROM (SELECT customer_unique_id, COUNT(*) AS orders_per_customer FROM facts GROUP BY 1) GROUP BY 1 ORDER BY 1 LIMIT 20",
+}
+AUTO_DEFAULT = list(AUTO_SLICES)[:6]  # що вибрано за замовчуванням
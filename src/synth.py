@@ -0,0 +1,529 @@
+# src/synth.py
+# синтетичний Olist-подібний датасет для навантажувальних тестів (1M–50M замовлень): усі 7 таблиць CSV_FILES
+# Детерміновано: той самий seed і n_orders → байт-у-байт ті самі файли.
+# Векторизовано (numpy + Arrow, без Python-циклів по рядках) і шматками по SYNTH_CHUNK замовлень,
+# тож пам'ять не росте з розміром датасету, а 10M замовлень пишуться за хвилини.
+# Що схоже на Olist:
+#   - обсяг росте з 2016 до 2018, піки в будні й удень, Black Friday 2017;
+#   - штати за реальними частками, місто й zip прив'язані до клієнта, ~3% повторних покупців;
+#   - популярність товарів і продавців — степенева (кілька хітів, довгий хвіст), категорії з різними цінами;
+#   - кілька товарів у замовленні (часто той самий товар), кілька платежів (доплата ваучером), розстрочка;
+#   - доставка довша на північ і в сезон (Black Friday, страйк далекобійників 2018) → частина «late»;
+#   - оцінка відгуку залежить від запізнення, частина відгуків з текстом.
+#   python -m src.synth --orders 1000000 --out data_synth [--seed 42] [--no-csv | --no-parquet]
+from __future__ import annotations
+import argparse
+import hashlib
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from src.data import CSV_FILES, ORDERS_ROW_GROUP, TABLE_SCHEMAS, mark_parquet_fresh
+
+SYNTH_CHUNK = 500_000  # замовлень на шматок; частина «рецепту»: інший розмір шматка — інші дані
+
+START = np.datetime64("2016-09-04T00", "h")
+END = np.datetime64("2018-10-17T00", "h")
+
+# --- довідники: штат, частка клієнтів, діапазон zip-префіксів, типова доставка з SP (днів), міста
+_STATES = [
+    ("SP", .4198, 1000, 19999, 8, ["sao paulo", "campinas", "guarulhos", "sao bernardo do campo", "santo andre",
+                                   "osasco", "santos", "sorocaba", "ribeirao preto", "jundiai"]),
+    ("RJ", .1292, 20000, 28999, 14, ["rio de janeiro", "niteroi", "nova iguacu", "sao goncalo", "duque de caxias",
+                                     "campos dos goytacazes", "petropolis"]),
+    ("MG", .1170, 30000, 39999, 11, ["belo horizonte", "juiz de fora", "contagem", "uberlandia", "betim",
+                                     "montes claros"]),
+    ("RS", .0550, 90000, 99999, 15, ["porto alegre", "caxias do sul", "pelotas", "canoas", "santa maria"]),
+    ("PR", .0507, 80000, 87999, 11, ["curitiba", "londrina", "maringa", "ponta grossa", "cascavel"]),
+    ("SC", .0366, 88000, 89999, 14, ["florianopolis", "joinville", "blumenau", "itajai", "sao jose"]),
+    ("BA", .0340, 40000, 48999, 19, ["salvador", "feira de santana", "vitoria da conquista", "lauro de freitas"]),
+    ("DF", .0215, 70000, 73699, 12, ["brasilia"]),
+    ("ES", .0204, 29000, 29999, 15, ["vila velha", "vitoria", "serra", "cariacica"]),
+    ("GO", .0203, 72800, 76799, 15, ["goiania", "aparecida de goiania", "anapolis"]),
+    ("PE", .0166, 50000, 56999, 18, ["recife", "jaboatao dos guararapes", "olinda", "caruaru"]),
+    ("CE", .0134, 60000, 63999, 21, ["fortaleza", "caucaia", "juazeiro do norte"]),
+    ("PA", .0098, 66000, 68899, 23, ["belem", "ananindeua", "santarem"]),
+    ("MT", .0091, 78000, 78899, 18, ["cuiaba", "varzea grande", "rondonopolis"]),
+    ("MA", .0075, 65000, 65999, 21, ["sao luis", "imperatriz"]),
+    ("MS", .0072, 79000, 79999, 15, ["campo grande", "dourados"]),
+    ("PB", .0054, 58000, 58999, 20, ["joao pessoa", "campina grande"]),
+    ("PI", .0050, 64000, 64999, 19, ["teresina", "parnaiba"]),
+    ("RN", .0049, 59000, 59999, 19, ["natal", "mossoro"]),
+    ("AL", .0041, 57000, 57999, 24, ["maceio", "arapiraca"]),
+    ("SE", .0034, 49000, 49999, 21, ["aracaju"]),
+    ("TO", .0028, 77000, 77999, 17, ["palmas", "araguaina"]),
+    ("RO", .0025, 76800, 76999, 20, ["porto velho", "ji-parana"]),
+    ("AM", .0015, 69000, 69299, 26, ["manaus"]),
+    ("AC", .0008, 69900, 69999, 21, ["rio branco"]),
+    ("AP", .0007, 68900, 68999, 27, ["macapa"]),
+    ("RR", .0005, 69300, 69399, 29, ["boa vista"]),
+]
+# продавці зосереджені на південному сході
+_SELLER_STATES = {"SP": .597, "PR": .113, "MG": .079, "SC": .036, "RJ": .043, "RS": .040, "GO": .013,
+                  "DF": .010, "ES": .007, "BA": .006, "CE": .004, "PE": .003, "MT": .002, "MS": .002,
+                  "RN": .002, "PB": .002, "MA": .001, "PI": .001, "PA": .001}
+# категорія, частка товарів, медіана ціни (R$), медіана ваги (г)
+_CATEGORIES = [
+    ("cama_mesa_banho", .099, 70, 1400), ("beleza_saude", .086, 80, 500), ("esporte_lazer", .077, 80, 900),
+    ("moveis_decoracao", .074, 70, 2200), ("informatica_acessorios", .069, 90, 500),
+    ("utilidades_domesticas", .062, 65, 1500), ("relogios_presentes", .053, 150, 400),
+    ("telefonia", .040, 40, 250), ("ferramentas_jardim", .039, 75, 2000), ("automotivo", .038, 80, 1500),
+    ("brinquedos", .036, 80, 900), ("cool_stuff", .033, 120, 1800), ("perfumaria", .030, 80, 450),
+    ("bebes", .027, 90, 1500), ("eletronicos", .025, 45, 300), ("papelaria", .022, 60, 700),
+    ("fashion_bolsas_e_acessorios", .018, 50, 350), ("pet_shop", .017, 60, 1300),
+    ("moveis_escritorio", .015, 180, 10000), ("consoles_games", .010, 90, 600),
+    ("malas_acessorios", .010, 120, 2000), ("construcao_ferramentas_construcao", .008, 90, 2500),
+    ("eletrodomesticos", .007, 100, 3500), ("instrumentos_musicais", .006, 150, 2500),
+    ("eletroportateis", .006, 170, 4000), ("casa_construcao", .005, 80, 2000),
+    ("livros_interesse_geral", .005, 45, 500), ("alimentos", .004, 40, 800), ("moveis_sala", .004, 120, 8000),
+    ("casa_conforto", .004, 100, 3000), ("outros", .0315, 70, 1000),
+]
+PAYMENT_TYPES = ["credit_card", "boleto", "voucher", "debit_card"]
+_PAYMENT_P = [.739, .190, .056, .015]
+_INSTALLMENTS_P = [.49, .13, .10, .07, .05, .04, .02, .05, .01, .04]  # 1..10 для кредитки
+ORDER_STATUSES = ["delivered", "shipped", "canceled", "unavailable", "invoiced", "processing", "created", "approved"]
+_ITEMS_P = [.901, .076, .012, .005, .002, .002, .002]  # 1..7 товарів у замовленні
+_PAYMENTS_P = [.970, .022, .004, .002, .002]           # 1..5 платежів (2-й і далі — ваучери)
+REPEAT_CUSTOMER_P = .031      # частка замовлень від тих, хто вже купував
+SAME_PRODUCT_P = .55          # 2-й+ товар у замовленні — той самий, що й перший
+PRODUCT_POP_EXP = 2.5         # індекс = n · u^exp: чим більше exp, тим сильніше хіти
+SELLER_POP_EXP = 2.0
+NO_REVIEW_P = .008
+LOST_PARCEL_P = .015          # посилки, що застрягли в дорозі (+~10 днів)
+# розподіл оцінок 1..5: вчасно / із запізненням / не доставлено
+_SCORE_P = np.array([[.070, .025, .075, .200, .630],
+                     [.450, .080, .120, .150, .200],
+                     [.750, .100, .070, .040, .040]])
+_TITLES = {"neg": ["nao recomendo", "pessimo", "produto nao entregue", "ruim", "decepcionado"],
+           "mid": ["regular", "ok", "razoavel"],
+           "pos": ["recomendo", "otimo", "muito bom", "excelente", "super recomendo", "bom"]}
+_MESSAGES = {"neg": ["ainda nao recebi o produto", "produto veio com defeito", "entrega atrasou muito",
+                     "veio diferente do anunciado", "comprei dois e so chegou um"],
+             "mid": ["produto ok, mas a entrega demorou", "qualidade razoavel pelo preco", "chegou no prazo"],
+             "pos": ["chegou antes do prazo, recomendo", "produto de otima qualidade", "tudo certo, obrigado",
+                     "muito bom, entrega rapida", "excelente vendedor"]}
+_MESSAGE_P = [.75, .70, .55, .45, .32]  # частка відгуків з текстом для оцінок 1..5
+
+
+# --- id як у Olist: 32 hex-символи; ключ → два 64-бітні слова через splitmix64 (бієкція, тож без колізій)
+_HEX = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _salt(seed: int, what: str) -> np.uint64:
+    return np.uint64(int.from_bytes(hashlib.sha256(f"{seed}:{what}".encode()).digest()[:8], "little"))
+
+
+def hex_ids(keys: np.ndarray, seed: int, what: str) -> pa.Array:
+    """Рядкові id з 32 hex-символів для цілих ключів (однаковий ключ → однаковий id), без Python-циклу."""
+    k = np.asarray(keys).astype(np.uint64)
+    hi = _mix64(k ^ _salt(seed, what))
+    lo = _mix64(hi ^ _salt(seed, what + "/lo"))
+    words = np.stack([hi, lo], axis=1).astype(">u8").view(np.uint8).reshape(len(k), 16)
+    chars = np.empty((len(k), 32), dtype=np.uint8)
+    chars[:, 0::2] = _HEX[words >> 4]
+    chars[:, 1::2] = _HEX[words & 15]
+    offsets = np.arange(0, 32 * (len(k) + 1), 32, dtype=np.int32)
+    return pa.StringArray.from_buffers(len(k), pa.py_buffer(offsets), pa.py_buffer(chars))
+
+
+def _unit(keys: np.ndarray, seed: int, what: str) -> np.ndarray:
+    """Детермінований «випадковий» float у [0, 1) для кожного ключа (атрибут, що не змінюється між шматками)."""
+    return (_mix64(np.asarray(keys).astype(np.uint64) ^ _salt(seed, what)) >> np.uint64(11)) * 2.0 ** -53
+
+
+def _dict(indices: np.ndarray, vocab: list[str], mask: np.ndarray | None = None) -> pa.DictionaryArray:
+    return pa.DictionaryArray.from_arrays(pa.array(indices.astype(np.int32), mask=mask), pa.array(vocab))
+
+
+def _ts(seconds: np.ndarray, mask: np.ndarray | None = None) -> pa.Array:
+    return pa.array(seconds.astype(np.int64), type=pa.timestamp("s"), mask=mask)
+
+
+def _groups(sizes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Для груп розміру sizes: (номер групи кожного рядка, початок групи, номер рядка в групі з 1)."""
+    first = np.cumsum(sizes) - sizes
+    owner = np.repeat(np.arange(len(sizes)), sizes)
+    return owner, first, np.arange(int(sizes.sum())) - first[owner] + 1
+
+
+# --- «світ» датасету: те, що спільне для всіх шматків (календар, товари, продавці, довідники)
+@dataclass
+class _World:
+    seed: int
+    n_orders: int
+    n_products: int
+    n_sellers: int
+    slot_w: np.ndarray        # вага кожної години від START до END
+    slot_cum: np.ndarray
+    prod_cat: np.ndarray      # категорія товару (-1 — без категорії)
+    prod_price: np.ndarray
+    prod_weight: np.ndarray
+    prod_seller: np.ndarray
+    next_uid: int = 0         # наступний новий customer_unique_id (росте від шматка до шматка)
+
+
+def _calendar() -> np.ndarray:
+    """Вага кожної години: тренд росту × день тижня × година доби × сезонні піки."""
+    hours = np.arange(START, END, dtype="datetime64[h]")
+    days = hours.astype("datetime64[D]")
+    d = (days - np.datetime64("2017-06-01")).astype(np.float64)
+    trend = 0.03 + 1.0 / (1.0 + np.exp(-d / 70.0))                          # повільний старт 2016, плато 2018
+    trend = np.where(days >= np.datetime64("2018-09-01"), trend * 0.05, trend)  # «хвіст» вивантаження
+    weekday = np.array([1.12, 1.10, 1.06, 1.03, 0.97, 0.78, 0.87])[(days.astype(np.int64) + 3) % 7]
+    hour = np.array([.030, .015, .007, .004, .003, .005, .012, .025, .045, .055, .062, .063,
+                     .059, .065, .066, .063, .064, .058, .054, .055, .062, .063, .058, .042])
+    w = trend * weekday * hour[(hours.astype(np.int64) % 24)]
+    w = np.where(days == np.datetime64("2017-11-24"), w * 4.5, w)           # Black Friday
+    w = np.where((days > np.datetime64("2017-11-24")) & (days <= np.datetime64("2017-11-27")), w * 1.6, w)
+    return w
+
+
+def _season(ts: np.ndarray) -> np.ndarray:
+    """Множник тривалості доставки: після Black Friday і під час страйку далекобійників (травень 2018)."""
+    days = ts.astype("datetime64[s]").astype("datetime64[D]")
+    f = np.ones(len(ts))
+    f = np.where((days >= np.datetime64("2017-11-20")) & (days < np.datetime64("2018-01-10")), 1.25, f)
+    f = np.where((days >= np.datetime64("2018-02-15")) & (days < np.datetime64("2018-03-15")), 1.3, f)
+    f = np.where((days >= np.datetime64("2018-05-18")) & (days < np.datetime64("2018-06-08")), 1.4, f)
+    return f
+
+
+def _world(n_orders: int, seed: int) -> _World:
+    rng = np.random.default_rng([seed, 1])
+    n_products = max(1, round(n_orders * 0.33))
+    n_sellers = max(1, round(n_orders * 0.031))
+    cat_p = np.array([c[1] for c in _CATEGORIES])
+    cat = rng.choice(len(_CATEGORIES), n_products, p=cat_p / cat_p.sum()).astype(np.int16)
+    cat = np.where(rng.random(n_products) < .0185, -1, cat).astype(np.int16)  # ~1.85% без категорії
+    med_price = np.array([c[2] for c in _CATEGORIES] + [70.0])[cat]   # -1 → остання («без категорії»)
+    med_weight = np.array([c[3] for c in _CATEGORIES] + [1000.0])[cat]
+    w = _calendar()
+    return _World(
+        seed=seed, n_orders=n_orders, n_products=n_products, n_sellers=n_sellers,
+        slot_w=w, slot_cum=np.cumsum(w), prod_cat=cat,
+        prod_price=(med_price * rng.lognormal(0, .75, n_products)).clip(3, 6700).astype(np.float32),
+        prod_weight=(med_weight * rng.lognormal(0, .9, n_products)).clip(50, 40000).astype(np.float32),
+        prod_seller=(n_sellers * rng.random(n_products) ** SELLER_POP_EXP).astype(np.int32),
+    )
+
+
+_STATE_CODES = [s[0] for s in _STATES]
+_STATE_CUM = np.cumsum([s[1] for s in _STATES]) / sum(s[1] for s in _STATES)
+_ZIP_LO = np.array([s[2] for s in _STATES])
+_ZIP_HI = np.array([s[3] for s in _STATES])
+_TRANSIT = np.array([s[4] for s in _STATES], dtype=np.float64)
+_CITIES = [c for s in _STATES for c in s[5]]
+_CITY_N = np.array([len(s[5]) for s in _STATES])
+_CITY_OFF = np.cumsum(_CITY_N) - _CITY_N
+
+
+def _place(keys: np.ndarray, seed: int, what: str, state: np.ndarray | None = None):
+    """Штат (якщо не заданий), місто й zip-префікс, детерміновані за ключем (клієнт/продавець завжди «там само»)."""
+    if state is None:
+        state = np.searchsorted(_STATE_CUM, _unit(keys, seed, what + "/state"), side="right")
+        state = np.minimum(state, len(_STATES) - 1)
+    city = _CITY_OFF[state] + (_CITY_N[state] * _unit(keys, seed, what + "/city") ** 2).astype(np.int64)
+    zip_ = _ZIP_LO[state] + (_unit(keys, seed, what + "/zip") * (_ZIP_HI[state] - _ZIP_LO[state] + 1)).astype(np.int64)
+    return state, city, zip_
+
+
+def _orders_chunk(w: _World, c: int, g0: int, k: int) -> dict[str, pa.Table]:
+    """Шматок замовлень [g0, g0 + k) з усіма залежними таблицями: orders, customers, items, payments, reviews."""
+    rng = np.random.default_rng([w.seed, 2, c])
+    seed = w.seed
+    gidx = np.arange(g0, g0 + k, dtype=np.int64)
+    day_s = 86400
+
+    # час покупки: стратифікована вибірка з CDF по годинах — i-те замовлення в i-му «кванті», тож
+    # час уже зростає (і між шматками теж): orders відсортовані без окремого сортування
+    pos = (gidx + rng.random(k)) / w.n_orders * w.slot_cum[-1]
+    slot = np.minimum(np.searchsorted(w.slot_cum, pos, side="right"), len(w.slot_w) - 1)
+    frac = ((pos - (w.slot_cum[slot] - w.slot_w[slot])) / w.slot_w[slot]).clip(0, 1 - 1e-9)
+    start_s = START.astype("datetime64[s]").astype(np.int64)
+    ts = start_s + slot * 3600 + (frac * 3600).astype(np.int64)
+
+    # клієнт: новий або (~3%) той, хто вже купував; штат/місто/zip — від customer_unique_id
+    repeat = rng.random(k) < REPEAT_CUSTOMER_P
+    new_cnt = np.cumsum(~repeat)
+    upper = max(w.next_uid + int(new_cnt[-1]), 1)
+    uid = np.where(repeat, rng.integers(0, upper, k), w.next_uid + new_cnt - 1)
+    w.next_uid += int(new_cnt[-1])
+    state, city, zip_ = _place(uid, seed, "customer")
+
+    # статус і дати
+    ptype = rng.choice(len(PAYMENT_TYPES), k, p=_PAYMENT_P)
+    approve_h = np.where(ptype == PAYMENT_TYPES.index("boleto"), rng.gamma(1.6, 20.0, k), rng.exponential(0.6, k))
+    approved = ts + (approve_h * 3600).astype(np.int64)
+    carrier = approved + (rng.gamma(2.0, 1.4, k) * day_s).astype(np.int64)
+    # дорога: типова для штату × розкид × сезон, плюс рідкі «загублені» посилки
+    transit = (rng.gamma(4.0, _TRANSIT[state] / 4.0) * _season(ts)
+               + np.where(rng.random(k) < LOST_PARCEL_P, rng.exponential(10.0, k), 0.0))
+    delivered = carrier + (transit * day_s).astype(np.int64)
+    # обіцяна дата (опівночі): дорога + ~3 дні на відправку + запас; запас однаковий у днях,
+    # тож далекі штати з більшим розкидом частіше запізнюються (~5% SP, ~20% північ)
+    ts_day = ts - ts % day_s
+    promise = 1.1 * _TRANSIT[state] + 3 + rng.normal(10.5, 2.5, k)
+    estimated = ts_day + np.round(promise).clip(5).astype(np.int64) * day_s
+
+    r = rng.random(k)
+    status = np.zeros(k, dtype=np.int64)  # delivered
+    for code, p_lo, p_hi in ((2, 0, .0063), (3, .0063, .0124), (4, .0124, .0156), (5, .0156, .0186),
+                             (6, .0186, .01865), (7, .01865, .01867), (1, .01867, .02967)):
+        status = np.where((r >= p_lo) & (r < p_hi), code, status)
+    end_s = END.astype("datetime64[s]").astype(np.int64)
+    status = np.where((status == 0) & (delivered > end_s), 1, status)  # ще в дорозі на момент вивантаження
+    no_approve = (status == 6) | ((status == 2) & (rng.random(k) < .3))
+    no_carrier = ~np.isin(status, (0, 1))
+    no_deliver = status != 0
+
+    orders = pa.table({
+        "order_id": hex_ids(gidx, seed, "order"), "customer_id": hex_ids(gidx, seed, "customer"),
+        "order_status": _dict(status, ORDER_STATUSES),
+        "order_purchase_timestamp": _ts(ts), "order_approved_at": _ts(approved, no_approve),
+        "order_delivered_carrier_date": _ts(carrier, no_carrier),
+        "order_delivered_customer_date": _ts(delivered, no_deliver),
+        "order_estimated_delivery_date": _ts(estimated),
+    })
+    customers = pa.table({
+        "customer_id": orders["customer_id"],
+        "customer_unique_id": hex_ids(uid, seed, "unique"),
+        "customer_zip_code_prefix": zip_.astype(np.int32),
+        "customer_city": _dict(city, _CITIES), "customer_state": _dict(state, _STATE_CODES),
+    })
+
+    # товари: 1..7 у замовленні; товар — степенева популярність, 2-й+ часто той самий, що й перший
+    nitems = rng.choice(np.arange(1, len(_ITEMS_P) + 1), k, p=np.array(_ITEMS_P) / sum(_ITEMS_P))
+    io, ifirst, item_no = _groups(nitems)
+    m = len(io)
+    prod = (w.n_products * rng.random(m) ** PRODUCT_POP_EXP).astype(np.int64)
+    prod = np.where((item_no > 1) & (rng.random(m) < SAME_PRODUCT_P), prod[ifirst[io]], prod)
+    price = np.round(w.prod_price[prod] * rng.normal(1, .04, m).clip(.8, 1.2), 2).clip(.85)
+    freight = np.round((7 + 1.6 * np.sqrt(w.prod_weight[prod] / 100.0)) * (.6 + _TRANSIT[state[io]] / 20.0)
+                       * rng.lognormal(0, .25, m), 2)
+    base = np.where(no_approve, ts, approved)
+    items = pa.table({
+        "order_id": hex_ids(gidx[io], seed, "order"), "order_item_id": item_no.astype(np.int16),
+        "product_id": hex_ids(prod, seed, "product"), "seller_id": hex_ids(w.prod_seller[prod], seed, "seller"),
+        "shipping_limit_date": _ts(base[io] + 6 * day_s + rng.integers(0, day_s, m)),
+        "price": price, "freight_value": freight,
+    })
+
+    # платежі: сума = товари + доставка; 2-й і далі платежі — ваучери, частки випадкові
+    total = np.add.reduceat(price + freight, ifirst)
+    npay = rng.choice(np.arange(1, len(_PAYMENTS_P) + 1), k, p=np.array(_PAYMENTS_P) / sum(_PAYMENTS_P))
+    po, pfirst, seq = _groups(npay)
+    pw = rng.random(len(po)) + np.where(seq == 1, 1.0, 0.0)   # першому платежу — більша частка
+    cum_w = np.cumsum(pw)
+    group_w = np.add.reduceat(pw, pfirst)
+    cum_frac = (cum_w - (cum_w[pfirst] - pw[pfirst])[po]) / group_w[po]
+    cum_val = np.round(total[po] * np.where(seq == npay[po], 1.0, cum_frac), 2)
+    value = np.round(cum_val - np.where(seq == 1, 0.0, np.roll(cum_val, 1)), 2)
+    pay_type = np.where(seq == 1, ptype[po], PAYMENT_TYPES.index("voucher"))
+    inst = rng.choice(np.arange(1, 11), len(po), p=_INSTALLMENTS_P)
+    inst = np.minimum(inst, np.maximum(1, (total[po] // 20).astype(np.int64)))   # дрібні покупки — без розстрочки
+    inst = np.where(pay_type == PAYMENT_TYPES.index("credit_card"), inst, 1)
+    payments = pa.table({
+        "order_id": hex_ids(gidx[po], seed, "order"), "payment_sequential": seq.astype(np.int16),
+        "payment_type": _dict(pay_type, PAYMENT_TYPES), "payment_installments": inst.astype(np.int8),
+        "payment_value": value,
+    })
+
+    # відгуки: оцінка залежить від того, чи вчасно доставили
+    group = np.where(no_deliver, 2, np.where(delivered > estimated, 1, 0))
+    score = (rng.random(k)[:, None] > np.cumsum(_SCORE_P, axis=1)[group]).sum(axis=1) + 1
+    score = np.minimum(score, 5)
+    created = np.where(no_deliver, estimated, delivered)
+    created = created - created % day_s + day_s
+    answered = created + (rng.exponential(2.5, k) * day_s).astype(np.int64)
+    mood = np.where(score <= 2, 0, np.where(score == 3, 1, 2))
+    title, title_vocab = _texts(rng, mood, _TITLES, rng.random(k) >= .12)
+    msg, msg_vocab = _texts(rng, mood, _MESSAGES, rng.random(k) >= np.array(_MESSAGE_P)[score - 1])
+    has = rng.random(k) >= NO_REVIEW_P
+    reviews = pa.table({
+        "review_id": hex_ids(gidx, seed, "review"), "order_id": orders["order_id"],
+        "review_score": score.astype(np.int8),
+        "review_comment_title": _dict(title, title_vocab, title < 0).dictionary_decode(),
+        "review_comment_message": _dict(msg, msg_vocab, msg < 0).dictionary_decode(),
+        "review_creation_date": _ts(created), "review_answer_timestamp": _ts(answered),
+    }).filter(pa.array(has))
+    return {"orders": orders, "customers": customers, "items": items, "payments": payments, "reviews": reviews}
+
+
+def _texts(rng, mood: np.ndarray, by_mood: dict[str, list[str]], missing: np.ndarray):
+    """Індекс тексту у словнику за настроєм відгуку (0/1/2 = neg/mid/pos); -1 — тексту немає."""
+    vocab, off, n = [], [], []
+    for key in ("neg", "mid", "pos"):
+        off.append(len(vocab))
+        n.append(len(by_mood[key]))
+        vocab += by_mood[key]
+    idx = np.array(off)[mood] + (rng.random(len(mood)) * np.array(n)[mood]).astype(np.int64)
+    return np.where(missing, -1, idx), vocab
+
+
+def _products_chunk(w: _World, c: int, p0: int, p1: int) -> pa.Table:
+    rng = np.random.default_rng([w.seed, 3, c])
+    k = p1 - p0
+    cat = w.prod_cat[p0:p1]
+    no_cat = cat < 0
+    weight = w.prod_weight[p0:p1].astype(np.float64)
+    side = np.cbrt(weight * 5.0)  # см: густина ~0.2 г/см³, «кубик» з розкидом по сторонах
+    dims = {f"product_{d}_cm": np.round(side * rng.lognormal(0, .3, k)).clip(lo, hi).astype(np.float32)
+            for d, lo, hi in (("length", 7, 105), ("height", 2, 105), ("width", 6, 118))}
+    return pa.table({
+        "product_id": hex_ids(np.arange(p0, p1), w.seed, "product"),
+        "product_category_name": _dict(np.maximum(cat, 0), [c[0] for c in _CATEGORIES], no_cat),
+        "product_name_lenght": pa.array(np.round(rng.normal(48, 10, k)).clip(5, 76).astype(np.float32), mask=no_cat),
+        "product_description_lenght": pa.array(np.round(rng.lognormal(6.4, .65, k)).clip(4, 3992).astype(np.float32),
+                                               mask=no_cat),
+        "product_photos_qty": pa.array(rng.choice(np.arange(1, 9), k, p=[.50, .19, .11, .08, .05, .04, .02, .01])
+                                       .astype(np.float32), mask=no_cat),
+        "product_weight_g": np.round(weight).astype(np.float32),
+        "product_length_cm": dims["product_length_cm"], "product_height_cm": dims["product_height_cm"],
+        "product_width_cm": dims["product_width_cm"],
+    })
+
+
+def _sellers_chunk(w: _World, c: int, s0: int, s1: int) -> pa.Table:
+    keys = np.arange(s0, s1)
+    codes, p = zip(*_SELLER_STATES.items())
+    cum = np.cumsum(p) / sum(p)
+    state = np.array([_STATE_CODES.index(s) for s in codes])[
+        np.minimum(np.searchsorted(cum, _unit(keys, w.seed, "seller/state"), side="right"), len(codes) - 1)]
+    state, city, zip_ = _place(keys, w.seed, "seller", state)
+    return pa.table({
+        "seller_id": hex_ids(keys, w.seed, "seller"), "seller_zip_code_prefix": zip_.astype(np.int32),
+        "seller_city": _dict(city, _CITIES), "seller_state": _dict(state, _STATE_CODES),
+    })
+
+
+# --- запис: кожна таблиця — Parquet (типи з TABLE_SCHEMAS) і/або CSV, шматок за шматком
+class _HashingFile:
+    """Файл, що рахує sha256 того, що в нього пишуть (для маніфесту Parquet-кешу без повторного читання CSV)."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.sha = hashlib.sha256()
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.sha.update(data)
+        return self.fh.write(data)
+
+    def writable(self) -> bool:
+        return True
+
+    def flush(self) -> None:
+        self.fh.flush()
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _Sink:
+    def __init__(self, out_dir: str, name: str, csv: bool, parquet: bool):
+        self.name = name
+        self.schema = TABLE_SCHEMAS[name]
+        self.csv_path = os.path.join(out_dir, CSV_FILES[name]) if csv else None
+        self.pq_path = os.path.join(out_dir, CSV_FILES[name].replace(".csv", ".parquet")) if parquet else None
+        self.rows = 0
+        self._pq = pq.ParquetWriter(self.pq_path + ".tmp", self.schema) if parquet else None
+        self._csv_fh = open(self.csv_path + ".tmp", "wb") if csv else None
+        self._hash = _HashingFile(self._csv_fh) if csv else None
+        self._csv = None
+
+    def write(self, table: pa.Table) -> None:
+        table = table.select(self.schema.names)
+        self.rows += table.num_rows
+        if self._pq is not None:
+            # orders — дрібними row group-ами, як у write_table_parquet (фільтри по даті читають менше)
+            self._pq.write_table(table.cast(self.schema),
+                                 row_group_size=ORDERS_ROW_GROUP if self.name == "orders" else None)
+        if self._hash is not None:
+            if self._csv is None:
+                self._csv = pacsv.CSVWriter(self._hash, table.schema)
+            self._csv.write_table(table)  # дати — з точністю до секунди, як у CSV Olist
+
+    def close(self) -> dict | None:
+        """Закриває файли й атомарно перейменовує їх. Повертає запис маніфесту (якщо писали і CSV, і Parquet)."""
+        if self._pq is not None:
+            self._pq.close()
+            os.replace(self.pq_path + ".tmp", self.pq_path)
+        if self._hash is None:
+            return None
+        if self._csv is not None:
+            self._csv.close()
+        self._csv_fh.close()
+        os.replace(self.csv_path + ".tmp", self.csv_path)
+        if self.pq_path is None:
+            return None
+        st = os.stat(self.csv_path)
+        return {"csv": CSV_FILES[self.name], "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "sha256": self._hash.sha.hexdigest(), "rows": self.rows}
+
+
+def generate(n_orders: int, out_dir: str, seed: int = 42, csv: bool = True, parquet: bool = True,
+             progress=None) -> dict[str, int]:
+    """Пише всі таблиці CSV_FILES у out_dir (CSV і/або Parquet-кеш). Повертає кількість рядків по таблицях.
+
+    Якщо пишемо і CSV, і Parquet — додаємо їх у маніфест кешу, щоб додаток не перебудовував Parquet.
+    progress(таблиця, зроблено, всього) — необов'язковий колбек після кожного шматка.
+    """
+    if not (csv or parquet):
+        raise ValueError("Потрібен хоча б один формат: csv або parquet.")
+    os.makedirs(out_dir, exist_ok=True)
+    n = int(n_orders)
+    w = _world(n, seed)
+    sinks = {name: _Sink(out_dir, name, csv, parquet) for name in CSV_FILES}
+    try:
+        for c, g0 in enumerate(range(0, n, SYNTH_CHUNK)):
+            for name, table in _orders_chunk(w, c, g0, min(SYNTH_CHUNK, n - g0)).items():
+                sinks[name].write(table)
+            if progress:
+                progress("orders", min(g0 + SYNTH_CHUNK, n), n)
+        for name, total, make in (("products", w.n_products, _products_chunk), ("sellers", w.n_sellers, _sellers_chunk)):
+            for c, p0 in enumerate(range(0, total, SYNTH_CHUNK)):
+                sinks[name].write(make(w, c, p0, min(p0 + SYNTH_CHUNK, total)))
+                if progress:
+                    progress(name, min(p0 + SYNTH_CHUNK, total), total)
+        entries = {name: sink.close() for name, sink in sinks.items()}
+    except BaseException:
+        for sink in sinks.values():
+            for path in (sink.pq_path, sink.csv_path):
+                if path and os.path.exists(path + ".tmp"):
+                    os.remove(path + ".tmp")
+        raise
+    entries = {name: e for name, e in entries.items() if e is not None}
+    if entries:
+        mark_parquet_fresh(out_dir, entries)
+    return {name: sink.rows for name, sink in sinks.items()}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="synthetic Olist-shaped dataset (all CSV_FILES tables)")
+    ap.add_argument("--orders", type=int, default=1_000_000)
+    ap.add_argument("--out", default="data_synth")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-csv", action="store_true", help="only the Parquet cache")
+    ap.add_argument("--no-parquet", action="store_true", help="only CSV")
+    args = ap.parse_args()
+    t0 = time.perf_counter()
+    rows = generate(args.orders, args.out, args.seed, csv=not args.no_csv, parquet=not args.no_parquet,
+                    progress=lambda t, done, total: print(f"\r{t}: {done:,}/{total:,}", end="", flush=True))
+    print(f"\n{args.out}: " + ", ".join(f"{k} {v:,}" for k, v in rows.items())
+          + f" за {time.perf_counter() - t0:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
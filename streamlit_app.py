@@ -3,13 +3,18 @@
 # пишу просто і по-студентськи: що робимо і навіщо
 
 import streamlit as st
-import os, io, zipfile, requests
-from src.data import get_facts, ensure_parquet_cache
+import os, zipfile, requests
+from src.cache import CACHE
+from src.data import load_facts, ensure_parquet_cache, memory_report, DATA_DIR
+from src.ingest import ingest_release
+from src.synth import generate as generate_synthetic
+from src.profiling import page_profile, finish_page
 
 st.set_page_config(page_title="Магістерський проєкт — Olist BI", layout="wide")
 
 # --- Титулка
 st.title("Магістерський проєкт")
+prof = page_profile(__file__)  # ⏱ у сайдбарі: час/пам'ять по етапах rerun (src/profiling.py)
 st.subheader("Інтелектуальний аналіз даних для оптимізації бізнес-процесів (e-commerce Olist)")
 st.markdown("""
 **Автор:** Пантя Максим • **Факультет:** Економічний • **Рік:** 2025
@@ -19,7 +24,7 @@ st.markdown("""
 
 # --- Налаштування джерела даних
 RELEASE_ZIP = st.secrets.get("DATA_RELEASE_ZIP", "") 
-DATA_DIR = "data"
+DEMO_ORDERS = 100_000  # скільки синтетичних замовлень генерувати, якщо даних немає зовсім
 
 def ensure_data():
     """Скачую zip із Release лише якщо в папці data/ немає CSV.
@@ -32,19 +37,24 @@ def ensure_data():
         return
 
     if not RELEASE_ZIP:
-        st.warning("Дані не знайдено і DATA_RELEASE_ZIP не задано в Secrets.")
+        # ні CSV, ні Release — генеруємо синтетичний Olist-подібний датасет (src/synth.py), щоб усе працювало
+        with st.spinner("Дані не знайдено і DATA_RELEASE_ZIP не задано — генерую синтетичні дані…"):
+            generate_synthetic(DEMO_ORDERS, DATA_DIR)
+        st.info(f"Працюємо на синтетичних даних ({DEMO_ORDERS:,} замовлень). "
+                "Щоб взяти справжні, покладіть CSV Olist у data/ або задайте DATA_RELEASE_ZIP.")
         return
 
     if not (RELEASE_ZIP.startswith("http://") or RELEASE_ZIP.startswith("https://")):
         st.warning("DATA_RELEASE_ZIP виглядає не як URL. Перевір значення в Secrets.")
         return
 
+    # ZIP качаємо потоком на диск (не в пам'ять), беремо з нього лише CSV з CSV_FILES
+    # і одразу конвертуємо в Parquet шматками — пам'ять не росте з розміром датасету (src/ingest.py)
     with st.spinner("Завантажую Olist dataset з Release…"):
         try:
-            r = requests.get(RELEASE_ZIP, allow_redirects=True, timeout=60)
-            r.raise_for_status()
-            with zipfile.ZipFile(io.BytesIO(r.content)) as z:
-                z.extractall(DATA_DIR)
+            stats = ingest_release(RELEASE_ZIP, DATA_DIR)
+            st.caption(f"Завантажено {stats['bytes'] / 1e6:,.1f} МБ, CSV: {len(stats['csv'])}, "
+                       f"{stats['seconds']:.1f} с")
         except (requests.RequestException, zipfile.BadZipFile) as e:
             st.warning(f"Не вдалося завантажити/розпакувати дані з Release: {e}")
 
@@ -70,14 +80,10 @@ max_rows = st.number_input(
 )
 st.session_state["max_orders"] = int(max_rows)
 
-# --- Кешована функція завантаження фактів (швидше при повторних відкриттях)
-@st.cache_data(show_spinner=False)
-def load_facts_cached(data_dir: str, max_orders: int | None):
-    # якщо max_orders=None -> get_facts повертає всі дані з джерела (це важливо!)
-    return get_facts(data_dir, max_orders=max_orders)
-
 # --- Міні-діагностика щоб бачити, що дані працюють з обраним лімітом
-facts = load_facts_cached(DATA_DIR, st.session_state.get("max_orders"))
+# load_facts — спільне сховище facts для всіх сторінок (одна таблиця на версію датасету, кеш на весь процес)
+# якщо max_orders=None -> беруться всі дані з джерела (це важливо!)
+facts = load_facts(DATA_DIR, st.session_state.get("max_orders"))
 
 if facts.empty:
     st.error("Дані не знайдені. Перевір, чи є CSV у папці `data/` або чи правильно вказано DATA_RELEASE_ZIP у Secrets.")
@@ -88,6 +94,24 @@ else:
     c3.metric("Виручка (BrL)", f"{facts['gross_revenue'].sum():,.0f}")
     st.caption(f"Використаний ліміт: {st.session_state['max_orders']:,} записів.")
 
+    # --- скільки пам'яті займає спільна таблиця facts (звичайні vs компактні типи)
+    # компактний режим для всього процесу: OLIST_FACTS_COMPACT=1
+    with st.expander("Пам'ять facts (по колонках)"):
+        if st.checkbox("Порахувати звіт пам'яті", value=False):
+            rep = memory_report(DATA_DIR)
+            tot = rep[rep["column"] == "TOTAL"].iloc[0]
+            st.caption(f"Разом: {tot['bytes_before'] / 2**20:,.1f} MB → {tot['bytes_after'] / 2**20:,.1f} MB "
+                       f"у компактному режимі ({tot['saved_%']:,.0f}% менше).")
+            st.dataframe(rep, use_container_width=True, hide_index=True)
+
+    # --- кеші процесу (facts, куби, ознаки, моделі) під спільним бюджетом OLIST_CACHE_MB
+    with st.expander("Кеші процесу"):
+        budget = f"{CACHE.budget / 2**20:,.0f} MB" if CACHE.budget else "без ліміту"
+        st.caption(f"Зайнято {CACHE.bytes / 2**20:,.1f} MB із {budget}. "
+                   "Кожен новий ліміт вибірки — окремі куб і навчальна таблиця; найдавніші витісняються.")
+        st.dataframe(CACHE.info(), use_container_width=True, hide_index=True,
+                     column_config={"MB": st.column_config.NumberColumn(format="%.1f")})
+
 # --- Кнопки-навігація
 st.markdown("### Перейдіть до сторінок аналізу")
 
@@ -111,5 +135,5 @@ with cols[2]:
     page_if_exists("pages/7_ROI.py", label="💵 ROI / Unit Economics")
     page_if_exists("pages/8_Geo_SLA.py", label="🌎 Geo-SLA")
     page_if_exists("pages/9_Delay_Risk.py", label="⚠️ Ризик прострочки", disabled=False)
-    
-    
+
+finish_page(prof)